@@ -60,6 +60,64 @@ CREATE TABLE IF NOT EXISTS payments (
     FOREIGN KEY(employee_id) REFERENCES employees(tg_id)
 );
 
+CREATE TABLE IF NOT EXISTS sheet_row_index (
+    sheet_name VARCHAR(100) NOT NULL,
+    record_id VARCHAR(64) NOT NULL,
+    row_number INT NOT NULL,
+
+    PRIMARY KEY(sheet_name, record_id)
+);
+
+CREATE TABLE IF NOT EXISTS sheet_row_hashes (
+    sheet_name VARCHAR(100) NOT NULL,
+    record_id VARCHAR(64) NOT NULL,
+    row_hash VARCHAR(64) NOT NULL,
+
+    PRIMARY KEY(sheet_name, record_id)
+);
+
+CREATE TABLE IF NOT EXISTS sheet_block_checksums (
+    sheet_name VARCHAR(100) NOT NULL,
+    block INT NOT NULL,
+    sheet_checksum REAL NOT NULL,
+    db_hash VARCHAR(64) NOT NULL,
+
+    PRIMARY KEY(sheet_name, block)
+);
+
+CREATE TABLE IF NOT EXISTS sheet_export_checkpoints (
+    sheet_name VARCHAR(100) PRIMARY KEY,
+    last_record_id INT NOT NULL,
+    next_row INT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Очередь исходящей синхронизации с Google Sheets
+CREATE TABLE IF NOT EXISTS sheets_outbox (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name VARCHAR(50) NOT NULL,
+    record_id INT NOT NULL,
+    action_type TEXT NOT NULL CHECK(action_type IN ('INSERT', 'UPDATE', 'DELETE')),
+    status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'dead')),
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    revision INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Не больше одного ожидающего задания на запись
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sheets_outbox_pending
+ON sheets_outbox(table_name, record_id) WHERE status = 'pending';
+
+-- Записи аудита, вызванные правками из Google Sheets: лист уже содержит
+-- эти данные, поэтому обратно они не отправляются
+CREATE TABLE IF NOT EXISTS sheets_echo (
+    table_name VARCHAR(50) NOT NULL,
+    audit_id INT NOT NULL,
+    PRIMARY KEY (table_name, audit_id)
+);
+
 CREATE VIEW IF NOT EXISTS employee_payment_info AS
 SELECT 
     e.tg_id,
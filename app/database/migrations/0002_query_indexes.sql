@@ -0,0 +1,15 @@
+-- Индексы под частые запросы бота и синхронизации
+
+-- Выплаты сотрудника (экраны швеи и раскройщика)
+CREATE INDEX IF NOT EXISTS idx_payments_employee
+    ON payments(employee_id);
+
+-- Пачки швеи в работе и пачки раскройщика
+CREATE INDEX IF NOT EXISTS idx_batches_seamstress_status
+    ON batches(seamstress_id, status);
+CREATE INDEX IF NOT EXISTS idx_batches_cutter
+    ON batches(cutter_id);
+
+-- Сдвиг индекса строк листа после удаления строк
+CREATE INDEX IF NOT EXISTS idx_sheet_row_index_position
+    ON sheet_row_index(sheet_name, row_number);
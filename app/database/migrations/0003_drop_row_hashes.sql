@@ -0,0 +1,2 @@
+-- Хэши отправленных строк больше не нужны: сверка идёт по контрольным суммам блоков
+DROP TABLE IF EXISTS sheet_row_hashes;
@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# Файлы миграций вида 0002_query_indexes.sql, применяются по возрастанию номера
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+_MIGRATION_FILE_RE = re.compile(r'^(?P<version>\d+)_(?P<name>\w+)\.sql$')
+
+
+class MigrationError(Exception):
+    """Миграция не применилась, либо уже применённая миграция изменена"""
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[tuple]:
+    """Миграции из каталога: (номер, название, SQL, контрольная сумма) по возрастанию номера"""
+    migrations = {}
+    for file_name in sorted(os.listdir(directory)):
+        match = _MIGRATION_FILE_RE.match(file_name)
+        if not match:
+            continue
+        version = int(match['version'])
+        if version in migrations:
+            raise MigrationError(f"Два файла миграции с номером {version}")
+        with open(os.path.join(directory, file_name), 'r', encoding='utf-8') as f:
+            sql = f.read()
+        checksum = hashlib.sha256(sql.encode('utf-8')).hexdigest()
+        migrations[version] = (version, match['name'], sql, checksum)
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def split_statements(sql: str) -> List[str]:
+    """Разбиение скрипта на отдельные запросы.
+
+    Границы ищутся по sqlite3.complete_statement, поэтому точки с запятой
+    внутри строк и тел триггеров (BEGIN ... END) запрос не разрывают.
+    """
+    statements = []
+    buffer = ''
+    for part in sql.split(';'):
+        buffer += part + ';'
+        if sqlite3.complete_statement(buffer):
+            if _has_code(buffer[:-1]):
+                statements.append(buffer.strip())
+            buffer = ''
+    # Хвост без точки с запятой: комментарии или последний запрос
+    tail = buffer[:-1].strip()
+    if _has_code(tail):
+        statements.append(tail)
+    return statements
+
+
+def _has_code(sql: str) -> bool:
+    """Есть ли во фрагменте что-то кроме пустых строк и комментариев --"""
+    return any(line.strip() and not line.strip().startswith('--') for line in sql.splitlines())
+
+
+async def migrate(db, directory: str = MIGRATIONS_DIR) -> List[int]:
+    """Применение новых миграций.
+
+    Применённые миграции записываются в schema_version с контрольной
+    суммой файла; изменённый после применения файл останавливает запуск.
+    Каждая миграция выполняется в своей транзакции вместе с записью
+    в schema_version. Возвращает номера применённых миграций.
+    """
+    migrations = load_migrations(directory)
+    async with db.transaction() as conn:
+        await conn.execute(
+            """CREATE TABLE IF NOT EXISTS schema_version (
+                   version INTEGER PRIMARY KEY,
+                   name VARCHAR(100) NOT NULL,
+                   checksum VARCHAR(64) NOT NULL,
+                   applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )"""
+        )
+        async with conn.execute("SELECT version, checksum FROM schema_version") as cursor:
+            applied = {row[0]: row[1] for row in await cursor.fetchall()}
+
+    unknown = set(applied) - {version for version, *_ in migrations}
+    if unknown:
+        logger.warning(f"В БД применены миграции, которых нет в {directory}: {sorted(unknown)}")
+
+    done = []
+    for version, name, sql, checksum in migrations:
+        if version in applied:
+            if applied[version] != checksum:
+                raise MigrationError(f"Миграция {version:04d}_{name} изменена после применения")
+            continue
+        try:
+            async with db.transaction() as conn:
+                for statement in split_statements(sql):
+                    await conn.execute(statement)
+                await conn.execute(
+                    "INSERT INTO schema_version (version, name, checksum) VALUES (?, ?, ?)",
+                    (version, name, checksum)
+                )
+        except sqlite3.Error as e:
+            raise MigrationError(f"Миграция {version:04d}_{name} не применена: {e}") from e
+        logger.info(f"Применена миграция {version:04d}_{name}")
+        done.append(version)
+    return done
@@ -1,89 +1,237 @@
 from threading import Thread
 import logging
+import re
 import aiosqlite
 from contextlib import asynccontextmanager
 from app.credentials import DB_PATH
 from app.services.google_sheets import GoogleSheetsManager
+from app.services.dictionary import COLUMN_TRANSLATIONS
+from app.services.rate_limiter import background_priority
+from app.database.outbox import SheetsOutbox, cancel_task
+from app.database.migrator import migrate
+from typing import List
 import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Страховочная проверка аудит-таблиц на случай записей в обход Database.execute
+AUDIT_FALLBACK_INTERVAL = 60  # секунды
+# Максимальный размер порции аудита, передаваемой в Google Sheets за раз
+AUDIT_CHUNK_SIZE = 200
+
+# Определение таблицы, в которую пишет запрос (INSERT/REPLACE/UPDATE/DELETE)
+_WRITE_QUERY_RE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)',
+    re.IGNORECASE
+)
+
+def coalesce_audit_rows(table_name: str, rows: List[dict]) -> List[dict]:
+    """Сворачивание изменений по первичному ключу.
+
+    Из нескольких записей аудита для одного ID остаётся последняя
+    (rows упорядочены по audit_id), поэтому итоговое действие - DELETE,
+    если запись в итоге была удалена.
+    """
+    id_column = next(iter(COLUMN_TRANSLATIONS[table_name]))
+    latest = {}
+    for row in rows:
+        # Переставляем ключ в конец, чтобы сохранить порядок последних изменений
+        latest.pop(row[id_column], None)
+        latest[row[id_column]] = row
+    return list(latest.values())
+
 class Database:
-    def __init__(self):
+    def __init__(self, db_path: str = DB_PATH, sheets_service=None):
+        self.db_path = db_path
         self.conn = None
-        self.sheets = GoogleSheetsManager(db_instance=self)
-        # УДАЛЕНО: asyncio.create_task(self._audit_polling_loop())
+        self.sheets = GoogleSheetsManager(db_instance=self, service=sheets_service)
+        self.outbox = SheetsOutbox(self)
+        # Отдельное соединение для многошаговых транзакций (см. transaction)
+        self._tx_conn = None
+        self._tx_lock = asyncio.Lock()
         self._polling_task = None  # Добавляем атрибут для хранения задачи
+        # Таблицы, изменения которых пишутся триггерами в *_audit
+        self._audited_tables = set()
+        # Таблицы с необработанными изменениями и событие для пробуждения потребителя
+        self._dirty_audit_tables = set()
+        self._audit_event = asyncio.Event()
 
     async def start_polling(self):
-        """Запускаем polling loop после инициализации приложения"""
+        """Запускаем обработчик аудита после инициализации приложения"""
         if not self._polling_task:
-            self._polling_task = asyncio.create_task(self._audit_polling_loop())
+            async with self.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE type='table' AND name LIKE '%_audit'"
+            ) as cursor:
+                audit_tables = [row['name'] for row in await self.fetchall(cursor)]
+            self._audited_tables = {name.rsplit('_audit', 1)[0] for name in audit_tables}
+            # Изменения, оставшиеся с прошлого запуска, обрабатываем сразу
+            self._notify_audit(*self._audited_tables)
+            self._polling_task = asyncio.create_task(self._audit_consumer_loop())
+            await self.outbox.start()
+
+    def _notify_audit(self, *tables):
+        """Помечает таблицы как изменённые и будит обработчик аудита"""
+        tables = [t for t in tables if t in self._audited_tables]
+        if tables:
+            self._dirty_audit_tables.update(tables)
+            self._audit_event.set()
+
+    def _notify_write(self, query: str):
+        """Сигнализирует об изменении, если запрос пишет в отслеживаемую таблицу"""
+        match = _WRITE_QUERY_RE.match(query)
+        if match:
+            self._notify_audit(match.group(1).lower())
+
+    async def _audit_consumer_loop(self):
+        """Фоновая задача: ждёт сигнала об изменениях и обрабатывает аудит-таблицы"""
+        # Выгрузка аудита - фоновая работа: запросы менеджеров к API идут вперёд
+        with background_priority():
+            while True:
+                try:
+                    try:
+                        await asyncio.wait_for(self._audit_event.wait(), timeout=AUDIT_FALLBACK_INTERVAL)
+                    except asyncio.TimeoutError:
+                        # Записи могли появиться в обход execute (например, executescript)
+                        self._dirty_audit_tables.update(self._audited_tables)
+
+                    # Сначала сбрасываем событие, затем забираем набор таблиц:
+                    # запись, пришедшая между этими шагами, снова взведёт событие
+                    self._audit_event.clear()
+                    tables, self._dirty_audit_tables = self._dirty_audit_tables, set()
+
+                    failed = False
+                    for table_name in tables:
+                        try:
+                            await self.drain_audit_table(table_name)
+                        except Exception as e:
+                            # Не теряем таблицу: вернём её в очередь на следующий проход
+                            logger.error(f"Ошибка обработки аудита {table_name}: {str(e)}", exc_info=True)
+                            self._dirty_audit_tables.add(table_name)
+                            failed = True
+
+                    if failed:
+                        await asyncio.sleep(5)
+                        self._audit_event.set()
+
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Ошибка в обработчике аудита: {str(e)}", exc_info=True)
+                    await asyncio.sleep(5)
+
+    async def drain_audit_table(self, table_name: str, chunk_size: int = AUDIT_CHUNK_SIZE) -> int:
+        """Перенос изменений таблицы из аудита в очередь синхронизации порциями.
 
-    async def _audit_polling_loop(self):
-        """Фоновая задача для периодической проверки аудит-таблиц"""
+        Порция - не более chunk_size самых старых записей аудита. Свёрнутые
+        изменения ставятся в sheets_outbox, а записи аудита до водяного знака
+        (максимального audit_id порции) удаляются в той же транзакции, поэтому
+        изменение не теряется ни при сбое, ни при недоступности Google.
+        Возвращает количество обработанных записей.
+        """
+        audit_table_name = f"{table_name}_audit"
+        processed = 0
         while True:
-            try:
-                # Получаем список всех аудит-таблиц
-                async with self.execute(
-                    "SELECT name FROM sqlite_master "
-                    "WHERE type='table' AND name LIKE '%_audit'"
-                ) as cursor:
-                    audit_tables = [row['name'] for row in await self.fetchall(cursor)]
-
-                # Проверяем каждую таблицу на наличие записей
-                for table_name in audit_tables:
-                    async with self.execute(
-                        f"SELECT COUNT(*) as count FROM {table_name}"
-                    ) as cursor:
-                        count = (await self.fetchall(cursor))[0]['count']
-                    
-                    if count > 0:
-                        await self._process_audit_change(table_name)
-
-                await asyncio.sleep(1)  # Проверка каждые 5 секунд
+            async with self.execute(
+                f"SELECT * FROM {audit_table_name} ORDER BY audit_id LIMIT ?",
+                (chunk_size,)
+            ) as cursor:
+                chunk = await self.fetchall(cursor)
 
-            except Exception as e:
-                logger.error(f"Ошибка в polling loop: {str(e)}", exc_info=True)
-                await asyncio.sleep(5)
+            if not chunk:
+                return processed
 
-    async def _process_audit_change(self, audit_table_name):
-        try:
-            # Получаем основную таблицу без суффикса _audit
-            main_table = audit_table_name.rsplit('_audit', 1)[0]
-            
-            # Получаем данные из аудит-таблицы
-            async with self.execute(f"SELECT * FROM {audit_table_name}") as cursor:
-                audit_rows = await self.fetchall(cursor)
-                audit_ids = [row['audit_id'] for row in audit_rows]
-
-            if audit_ids:
-                # Удаляем обработанные записи
-                async with self.execute(
-                    f"DELETE FROM {audit_table_name} WHERE audit_id IN ({','.join(['?']*len(audit_ids))})",
-                    audit_ids
-                ) as cursor:
-                    pass 
-        
-                # Обрабатываем каждое изменение
-                for audit_row in audit_rows:
-                    action_type = audit_row['action_type']
-                    # Используем оригинальное название таблицы из БД (main_table)
-                    await self.sheets.sync_single_row(
-                        table_name=main_table, 
-                        row_data=dict(audit_row),
-                        action_type=action_type
-                    )
-
-        except Exception as e:
-            logger.error(f"Audit processing error: {str(e)}")
-            raise
+            watermark = chunk[-1]['audit_id']
+            changes = await self._drop_sheet_echoes(table_name, chunk, watermark)
+            async with self.transaction() as conn:
+                await self.outbox.enqueue(conn, table_name, changes)
+                await conn.execute(
+                    f"DELETE FROM {audit_table_name} WHERE audit_id <= ?",
+                    (watermark,)
+                )
+                await conn.execute(
+                    "DELETE FROM sheets_echo WHERE table_name = ? AND audit_id <= ?",
+                    (table_name, watermark)
+                )
+            self.outbox.wake()
+            logger.info(f"Аудит {table_name}: {len(chunk)} записей свёрнуто в {len(changes)} заданий")
+            processed += len(chunk)
+
+            if len(chunk) < chunk_size:
+                return processed
+
+    async def _drop_sheet_echoes(self, table_name: str, chunk: List[dict], watermark: int) -> List[dict]:
+        """Свёрнутые изменения порции аудита без эха правок из Google Sheets.
+
+        Запись не отправляется в лист, если все её изменения в порции
+        помечены в sheets_echo: лист уже содержит эти данные.
+        """
+        changes = coalesce_audit_rows(table_name, chunk)
+        async with self.execute(
+            "SELECT audit_id FROM sheets_echo WHERE table_name = ? AND audit_id <= ?",
+            (table_name, watermark)
+        ) as cursor:
+            echoes = {row[0] for row in await cursor.fetchall()}
+        if not echoes:
+            return changes
+
+        id_column = next(iter(COLUMN_TRANSLATIONS[table_name]))
+        changed_elsewhere = {row[id_column] for row in chunk if row['audit_id'] not in echoes}
+        kept = [change for change in changes if change[id_column] in changed_elsewhere]
+        if len(kept) < len(changes):
+            logger.info(f"Аудит {table_name}: {len(changes) - len(kept)} изменений пришли из Google Sheets, "
+                        f"обратно не отправляются")
+        return kept
+
+    @staticmethod
+    async def last_audit_id(conn, table_name: str) -> int:
+        """Последний audit_id таблицы (внутри транзакции conn)"""
+        cursor = await conn.execute(f"SELECT COALESCE(MAX(audit_id), 0) FROM {table_name}_audit")
+        return (await cursor.fetchone())[0]
+
+    @staticmethod
+    async def mark_sheet_origin(conn, table_name: str, after_audit_id: int) -> None:
+        """Пометка записей аудита после after_audit_id как пришедших из Google Sheets.
+
+        Вызывается в той же транзакции, что и изменение: BEGIN IMMEDIATE
+        не даёт другим соединениям писать, поэтому новые записи аудита - наши.
+        """
+        await conn.execute(
+            f"INSERT OR IGNORE INTO sheets_echo (table_name, audit_id) "
+            f"SELECT ?, audit_id FROM {table_name}_audit WHERE audit_id > ?",
+            (table_name, after_audit_id)
+        )
+
+    async def _resolve_latest_state(self, table_name: str, changes: List[dict]) -> List[dict]:
+        """Подстановка актуального состояния строк вместо снимков из аудита.
+
+        Для изменений, кроме удаления, строка читается из основной таблицы;
+        если её там уже нет, изменение превращается в DELETE.
+        """
+        id_column = next(iter(COLUMN_TRANSLATIONS[table_name]))
+        ids = [row[id_column] for row in changes if row['action_type'] != 'DELETE']
+        current = {}
+        if ids:
+            async with self.execute(
+                f"SELECT * FROM {table_name} WHERE {id_column} IN ({','.join(['?']*len(ids))})",
+                ids
+            ) as cursor:
+                current = {row[id_column]: row for row in await self.fetchall(cursor)}
+
+        resolved = []
+        for row in changes:
+            record_id = row[id_column]
+            if row['action_type'] != 'DELETE' and record_id in current:
+                resolved.append({**current[record_id], 'action_type': row['action_type']})
+            else:
+                resolved.append({**row, 'action_type': 'DELETE'})
+        return resolved
 
     @asynccontextmanager
     async def get_connection(self):
         """Асинхронный контекстный менеджер для подключения"""
         if not self.conn:
-            self.conn = await aiosqlite.connect(DB_PATH)
+            self.conn = await aiosqlite.connect(self.db_path)
             # Включаем доступ к колонкам по имени
             self.conn.row_factory = aiosqlite.Row
             await self.conn.execute("PRAGMA foreign_keys = ON")
@@ -95,11 +243,23 @@ class Database:
             pass
 
     async def close(self):
-        """Явное закрытие соединения"""
+        """Явное закрытие соединения.
+
+        Сначала останавливаются обработчик аудита и очередь синхронизации,
+        иначе они продолжат обращаться к закрытым соединениям.
+        """
+        if self._polling_task:
+            await cancel_task(self._polling_task)
+            self._polling_task = None
+        await self.outbox.stop()
+        if self._tx_conn:
+            await self._tx_conn.close()
+            self._tx_conn = None
         if self.conn:
             await self.conn.close()
             logger.info("Database connection closed")
             self.conn = None
+        await self.sheets.close()
 
     @asynccontextmanager
     async def execute(self, query, args=()):
@@ -109,27 +269,66 @@ class Database:
             try:
                 yield cursor
                 await conn.commit()
+                self._notify_write(query)
+            except Exception as e:
+                await conn.rollback()
+                logger.error(f"Transaction rolled back: {str(e)}")
+                raise
+
+    @asynccontextmanager
+    async def executemany(self, query, args_seq):
+        """Контекстный менеджер для пакетного выполнения запроса в одной транзакции"""
+        async with self.get_connection() as conn:
+            cursor = await conn.executemany(query, args_seq)
+            try:
+                yield cursor
+                await conn.commit()
+                self._notify_write(query)
             except Exception as e:
                 await conn.rollback()
                 logger.error(f"Transaction rolled back: {str(e)}")
                 raise
 
+    @asynccontextmanager
+    async def transaction(self):
+        """Контекстный менеджер для нескольких запросов в одной транзакции.
+
+        Используется отдельное соединение: общее соединение фиксирует каждый
+        запрос сразу, и чужой commit разорвал бы транзакцию посередине.
+        Транзакции выполняются по очереди и захватывают блокировку записи
+        сразу (BEGIN IMMEDIATE).
+        """
+        async with self._tx_lock:
+            if not self._tx_conn:
+                self._tx_conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+                self._tx_conn.row_factory = aiosqlite.Row
+                await self._tx_conn.execute("PRAGMA foreign_keys = ON")
+            conn = self._tx_conn
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                await conn.execute("COMMIT")
+            except BaseException as e:
+                await conn.execute("ROLLBACK")
+                logger.error(f"Transaction rolled back: {str(e)}")
+                raise
+        # Запросы внутри транзакции не разбираются - проверяем весь аудит
+        self._notify_audit(*self._audited_tables)
+
     async def fetchall(self, cursor):
         # Преобразуем строки в словари
         return [dict(row) for row in await cursor.fetchall()]
 
-async def init_db():
+async def init_db(db: Database = None):
     """Инициализация структуры БД"""
-    db = Database()
+    # Работаем с общим экземпляром, чтобы обработчик аудита видел записи из хендлеров
+    db = db or Database()
     try:
-        async with db.get_connection() as conn:
-            with open('app/schema.sql', 'r') as f:
-                schema = f.read()
-            await conn.executescript(schema)
-            await conn.commit()
-            logger.info("Database schema initialized")
-        
-        # Запускаем polling после инициализации
+        # Схема ведётся миграциями: при запуске применяются только новые
+        applied = await migrate(db)
+        logger.info(f"Database schema is up to date, applied migrations: {applied or 'none'}")
+
+        # Запускаем обработчик аудита после инициализации
         await db.start_polling()
         return db  # Возвращаем экземпляр базы данных
         
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+from app.services.circuit_breaker import SheetsUnavailableError
+from app.services.dictionary import COLUMN_TRANSLATIONS
+from app.services.rate_limiter import background_priority
+
+logger = logging.getLogger(__name__)
+
+# Размер порции заданий, отправляемых в Google Sheets за раз
+OUTBOX_CHUNK_SIZE = 200
+# После стольких неудачных попыток задание переводится в dead
+OUTBOX_MAX_ATTEMPTS = 8
+# Экспоненциальная задержка повторов: 30 с, 60 с, 120 с ... но не больше часа
+OUTBOX_BASE_DELAY = 30
+OUTBOX_MAX_DELAY = 3600
+# Страховочная проверка очереди, если сигнал о новых заданиях потерян
+OUTBOX_FALLBACK_INTERVAL = 60
+
+
+
+async def cancel_task(task: asyncio.Task) -> None:
+    """Отмена фоновой задачи с ожиданием её завершения.
+
+    До Python 3.12 asyncio.wait_for теряет отмену, если ожидаемое событие
+    наступило одновременно с ней, поэтому отмена повторяется.
+    """
+    while not task.done():
+        task.cancel()
+        await asyncio.wait({task}, timeout=1)
+
+class SheetsOutbox:
+    """Очередь исходящей синхронизации с Google Sheets.
+
+    Задание - ссылка на запись (таблица, ID, действие); актуальное состояние
+    строки читается из БД в момент отправки. Для записи существует не больше
+    одного ожидающего задания: новое изменение обновляет его и увеличивает
+    revision, поэтому подтверждение отправки не удалит более свежее изменение.
+    Неудачные задания повторяются с растущей задержкой и после
+    OUTBOX_MAX_ATTEMPTS попыток переходят в статус dead до ручного повтора.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._event = asyncio.Event()
+        self._task = None
+
+    async def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._worker_loop())
+
+    async def stop(self) -> None:
+        """Остановка фоновой отправки; невыполненные задания остаются в очереди"""
+        if self._task:
+            await cancel_task(self._task)
+            self._task = None
+
+    def wake(self) -> None:
+        self._event.set()
+
+    @staticmethod
+    async def enqueue(conn, table_name: str, changes: List[dict]) -> None:
+        """Постановка изменений в очередь в рамках транзакции conn"""
+        id_column = next(iter(COLUMN_TRANSLATIONS[table_name]))
+        await conn.executemany(
+            """INSERT INTO sheets_outbox (table_name, record_id, action_type)
+               VALUES (?, ?, ?)
+               ON CONFLICT(table_name, record_id) WHERE status = 'pending'
+               DO UPDATE SET action_type = excluded.action_type,
+                             revision = revision + 1""",
+            [(table_name, change[id_column], change['action_type']) for change in changes]
+        )
+
+    async def enqueue_changes(self, table_name: str, changes: List[dict]) -> None:
+        """Постановка изменений в очередь в отдельной транзакции"""
+        async with self.db.transaction() as conn:
+            await self.enqueue(conn, table_name, changes)
+        self.wake()
+
+    async def _worker_loop(self):
+        """Фоновая отправка заданий из очереди"""
+        # Очередь обслуживается с фоновым приоритетом запросов к API
+        with background_priority():
+            while True:
+                try:
+                    # Пока Google Sheets недоступен, задания не тратят попытки
+                    await self.db.sheets.breaker.wait_closed()
+                    processed = await self.process_due()
+                    if processed:
+                        continue
+                    try:
+                        await asyncio.wait_for(self._event.wait(), timeout=await self._next_wakeup())
+                    except asyncio.TimeoutError:
+                        pass
+                    self._event.clear()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Ошибка в обработчике очереди синхронизации: {str(e)}", exc_info=True)
+                    await asyncio.sleep(5)
+
+    async def _next_wakeup(self) -> float:
+        """Секунды до ближайшего отложенного задания (не больше страховочного интервала)"""
+        async with self.db.execute(
+            "SELECT CAST(MIN((julianday(next_attempt_at) - julianday('now')) * 86400) AS REAL) "
+            "FROM sheets_outbox WHERE status = 'pending'"
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None or row[0] is None:
+            return OUTBOX_FALLBACK_INTERVAL
+        return min(max(row[0], 0.1), OUTBOX_FALLBACK_INTERVAL)
+
+    async def process_due(self, limit: int = OUTBOX_CHUNK_SIZE) -> int:
+        """Отправка готовых к обработке заданий, возвращает их количество"""
+        async with self.db.execute(
+            "SELECT * FROM sheets_outbox "
+            "WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP "
+            "ORDER BY job_id LIMIT ?",
+            (limit,)
+        ) as cursor:
+            jobs = await self.db.fetchall(cursor)
+
+        by_table: Dict[str, List[dict]] = {}
+        for job in jobs:
+            by_table.setdefault(job['table_name'], []).append(job)
+
+        for table_name, table_jobs in by_table.items():
+            id_column = next(iter(COLUMN_TRANSLATIONS[table_name]))
+            changes = await self.db._resolve_latest_state(
+                table_name,
+                [{id_column: job['record_id'], 'action_type': job['action_type']} for job in table_jobs]
+            )
+            try:
+                await self._sync_jobs(table_name, table_jobs, changes)
+            except SheetsUnavailableError:
+                # Сбой сервиса, а не заданий: дождёмся восстановления связи
+                return 0
+
+        return len(jobs)
+
+    async def _sync_jobs(self, table_name: str, jobs: List[dict], changes: List[dict]) -> None:
+        """Отправка порции заданий; при ошибке порция делится пополам.
+
+        Так одна строка, которую отвергает лист, тратит попытки только
+        своего задания, а не всей порции.
+        """
+        try:
+            await self.db.sheets.sync_rows(table_name, changes)
+        except SheetsUnavailableError:
+            raise
+        except Exception as e:
+            if len(jobs) == 1:
+                logger.error(f"Не удалось синхронизировать {table_name} #{jobs[0]['record_id']}: {str(e)}")
+                await self._mark_failed(jobs, str(e))
+                return
+            logger.warning(f"Не удалось синхронизировать {len(jobs)} изменений {table_name}, "
+                           f"отправляем по частям: {str(e)}")
+            middle = len(jobs) // 2
+            await self._sync_jobs(table_name, jobs[:middle], changes[:middle])
+            await self._sync_jobs(table_name, jobs[middle:], changes[middle:])
+        else:
+            await self._acknowledge(jobs)
+
+    async def _acknowledge(self, jobs: List[dict]) -> None:
+        """Удаление отправленных заданий, если их не обновили во время отправки"""
+        async with self.db.executemany(
+            "DELETE FROM sheets_outbox WHERE job_id = ? AND revision = ?",
+            [(job['job_id'], job['revision']) for job in jobs]
+        ):
+            pass
+
+    async def _mark_failed(self, jobs: List[dict], error: str) -> None:
+        """Перенос заданий на повтор с экспоненциальной задержкой или в dead"""
+        params = []
+        for job in jobs:
+            attempts = job['attempts'] + 1
+            delay = min(OUTBOX_BASE_DELAY * 2 ** (attempts - 1), OUTBOX_MAX_DELAY)
+            status = 'dead' if attempts >= OUTBOX_MAX_ATTEMPTS else 'pending'
+            params.append((attempts, status, f"+{delay} seconds", error[:500], job['job_id']))
+            if status == 'dead':
+                logger.error(f"Задание {job['job_id']} ({job['table_name']} #{job['record_id']}) "
+                             f"переведено в dead после {attempts} попыток")
+        async with self.db.executemany(
+            "UPDATE sheets_outbox SET attempts = ?, status = ?, "
+            "next_attempt_at = datetime('now', ?), last_error = ? WHERE job_id = ?",
+            params
+        ):
+            pass
+
+    async def stats(self) -> Dict[str, int]:
+        """Количество заданий по статусам"""
+        async with self.db.execute(
+            "SELECT status, COUNT(*) AS count FROM sheets_outbox GROUP BY status"
+        ) as cursor:
+            counts = {row['status']: row['count'] for row in await self.db.fetchall(cursor)}
+        return {'pending': counts.get('pending', 0), 'dead': counts.get('dead', 0)}
+
+    async def dead_jobs(self, limit: int = 10) -> List[dict]:
+        """Последние задания, исчерпавшие попытки"""
+        async with self.db.execute(
+            "SELECT * FROM sheets_outbox WHERE status = 'dead' ORDER BY job_id DESC LIMIT ?",
+            (limit,)
+        ) as cursor:
+            return await self.db.fetchall(cursor)
+
+    async def replay_dead(self) -> int:
+        """Возврат всех dead-заданий в очередь, возвращает их количество"""
+        async with self.db.transaction() as conn:
+            # Для записи уже может стоять новое ожидающее задание - оно и так
+            # отправит актуальное состояние, дубликат не нужен
+            await conn.execute(
+                """DELETE FROM sheets_outbox WHERE status = 'dead' AND EXISTS (
+                       SELECT 1 FROM sheets_outbox p
+                       WHERE p.status = 'pending'
+                         AND p.table_name = sheets_outbox.table_name
+                         AND p.record_id = sheets_outbox.record_id)"""
+            )
+            # Из нескольких dead-заданий по одной записи оставляем последнее
+            await conn.execute(
+                """DELETE FROM sheets_outbox WHERE status = 'dead' AND job_id NOT IN (
+                       SELECT MAX(job_id) FROM sheets_outbox
+                       WHERE status = 'dead' GROUP BY table_name, record_id)"""
+            )
+            cursor = await conn.execute(
+                "UPDATE sheets_outbox SET status = 'pending', attempts = 0, "
+                "next_attempt_at = CURRENT_TIMESTAMP, last_error = NULL WHERE status = 'dead'"
+            )
+            replayed = cursor.rowcount
+        self.wake()
+        logger.info(f"Возвращено в очередь {replayed} заданий синхронизации")
+        return replayed
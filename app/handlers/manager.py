@@ -1,15 +1,18 @@
 from aiogram import Router, types, F
+from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import BufferedInputFile
 from io import BytesIO
 from app.states import ManagerStates
-from app.keyboards.inline import manager_menu, manager_batch_decision, cancel_button_manager, tables_selector, table_actions, back_cancel_keyboard, controller_batch_decision, seamstress_menu
+from app.keyboards.inline import manager_menu, manager_batch_decision, cancel_button_manager, tables_selector, table_actions, outbox_actions, back_cancel_keyboard, controller_batch_decision, seamstress_menu
 from app.database import db
 from app.services import generate_qr_code
 from app.services.qr_processing import process_qr_code
 from app.handlers.trunk import delete_message_reply_markup, send_payment_notification
 from app.services.update_from_sheets import sync_db_to_sheets
+from app.services.circuit_breaker import SheetsUnavailableError
 from app.bot import bot
+from app.credentials import MANAGERS_ID
 import logging
 import traceback
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -38,6 +41,43 @@ async def new_manager_menu(callback: types.CallbackQuery):
     )
 
 
+async def run_sheets_operation(callback: types.CallbackQuery, key: str, operation, success_text: str, error_text: str):
+    """Выполнение синхронизации с Google Sheets из обработчика кнопки.
+
+    Если Google Sheets недоступен (предохранитель разомкнут), операция
+    откладывается до восстановления связи, а менеджер сразу получает ответ.
+    success_text может быть функцией от результата операции.
+    """
+    try:
+        db.sheets.breaker.check()
+        result = await operation()
+        if callable(success_text):
+            success_text = success_text(result)
+        await callback.message.edit_text(success_text, reply_markup=manager_menu())
+    except SheetsUnavailableError as e:
+        logger.warning(f"Операция {key} отложена: {str(e)}")
+        db.sheets.breaker.defer(key, operation)
+        await callback.message.edit_text(
+            "⏳ Google Sheets сейчас недоступен. Операция поставлена в очередь "
+            "и выполнится автоматически после восстановления связи.",
+            reply_markup=manager_menu()
+        )
+    except Exception as e:
+        logger.error(f"{error_text}: {str(e)}")
+        await callback.message.edit_text(f"❌ {error_text}: {str(e)}", reply_markup=manager_menu())
+
+def sync_report_text(table_name: str, report: dict) -> str:
+    """Сообщение об итогах переноса изменений из Google Sheets в БД"""
+    text = (f"✅ Синхронизация таблицы '{table_name}' с Google Sheets выполнена!\n\n"
+            f"Добавлено: {report['inserted']}\n"
+            f"Обновлено: {report['updated']}\n"
+            f"Удалено: {report['deleted']}")
+    if report['failed']:
+        text += f"\n\n⚠️ Не применено строк: {len(report['failed'])}"
+        for failure in report['failed'][:10]:
+            text += f"\n• ID {failure['record_id']}: {failure['error']}"
+    return text
+
 @router.callback_query(lambda c: c.data == 'cancel_manager')
 async def cancel_creation(callback: types.CallbackQuery, state: FSMContext):
     await state.clear()
@@ -56,18 +96,13 @@ async def process_sync_db_to_sheets(callback: types.CallbackQuery, state: FSMCon
     
     await callback.answer("Начинаю синхронизацию базы данных с Google Sheets...")
     
-    try:
-        await sync_db_to_sheets(table_name)
-        await callback.message.edit_text(
-            f"✅ Синхронизация таблицы '{table_name}' с Google Sheets успешно выполнена!",
-            reply_markup=manager_menu()
-        )
-    except Exception as e:
-        logger.error(f"Ошибка синхронизации: {str(e)}")
-        await callback.message.edit_text(
-            f"❌ Ошибка при синхронизации таблицы '{table_name}': {str(e)}",
-            reply_markup=manager_menu()
-        )
+    await run_sheets_operation(
+        callback,
+        key=f"sync_db_to_sheets:{table_name}",
+        operation=lambda: sync_db_to_sheets(table_name),
+        success_text=lambda report: sync_report_text(table_name, report),
+        error_text=f"Ошибка при синхронизации таблицы '{table_name}'"
+    )
 
 
 @router.callback_query(lambda c: c.data.startswith('rollback_google_sheet_'))
@@ -78,22 +113,14 @@ async def process_sync_data_to_sheet(callback: types.CallbackQuery, state: FSMCo
     
     await callback.answer("Начинаю откат изменений в Google Sheets...")
     
-    try:
-        # Импортируем функцию внутри обработчика, чтобы избежать циклических импортов
-        
-        # Синхронизируем данные из БД в таблицу
-        await db.sheets.sync_data_to_sheet(table_name)
-        
-        await callback.message.edit_text(
-            f"✅ Откат изменений для таблицы '{table_name}' успешно выполнен!",
-            reply_markup=manager_menu()
-        )
-    except Exception as e:
-        logger.error(f"Ошибка отката изменений: {str(e)}")
-        await callback.message.edit_text(
-            f"❌ Ошибка при откате изменений для таблицы '{table_name}': {str(e)}",
-            reply_markup=manager_menu()
-        )
+    # Синхронизируем данные из БД в таблицу
+    await run_sheets_operation(
+        callback,
+        key=f"sync_data_to_sheet:{table_name}",
+        operation=lambda: db.sheets.sync_data_to_sheet(table_name),
+        success_text=f"✅ Откат изменений для таблицы '{table_name}' успешно выполнен!",
+        error_text=f"Ошибка при откате изменений для таблицы '{table_name}'"
+    )
 
 @router.callback_query(lambda c: c.data == 'ignore_google_sheet')
 async def ignore_google_sheet(callback: types.CallbackQuery):
@@ -143,18 +170,13 @@ async def start_sync_db_to_sheets(callback: types.CallbackQuery):
     
     await callback.answer("Начинаю синхронизацию базы данных с Google Sheets...")
     
-    try:
-        await sync_db_to_sheets(table_name)
-        await callback.message.edit_text(
-            f"✅ Синхронизация таблицы '{table_name}' с Google Sheets успешно выполнена!",
-            reply_markup=manager_menu()
-        )
-    except Exception as e:
-        logger.error(f"Ошибка синхронизации БД с Google Sheets: {str(e)}")
-        await callback.message.edit_text(
-            f"❌ Ошибка при синхронизации таблицы '{table_name}': {str(e)}",
-            reply_markup=manager_menu()
-        )
+    await run_sheets_operation(
+        callback,
+        key=f"sync_db_to_sheets:{table_name}",
+        operation=lambda: sync_db_to_sheets(table_name),
+        success_text=lambda report: sync_report_text(table_name, report),
+        error_text=f"Ошибка при синхронизации таблицы '{table_name}'"
+    )
 
 @router.callback_query(lambda c: c.data.startswith('sync_data_to_sheet_'))
 async def start_sync_data_to_sheet(callback: types.CallbackQuery):
@@ -164,18 +186,58 @@ async def start_sync_data_to_sheet(callback: types.CallbackQuery):
     
     await callback.answer("Начинаю синхронизацию Google Sheets с базой данных...")
     
+    # Если прошлая выгрузка прервалась недавно, продолжаем её с контрольной точки,
+    # иначе лист выгружается заново целиком
+    await run_sheets_operation(
+        callback,
+        key=f"sync_data_to_sheet:{table_name}",
+        operation=lambda: db.sheets.sync_data_to_sheet(table_name, resume=True),
+        success_text=f"✅ Синхронизация Google Sheets с таблицей '{table_name}' успешно выполнена!",
+        error_text=f"Ошибка при синхронизации Google Sheets с таблицей '{table_name}'"
+    )
+
+async def outbox_report():
+    """Текст отчёта о состоянии очереди синхронизации"""
+    stats = await db.outbox.stats()
+    lines = [
+        "Очередь синхронизации с Google Sheets:",
+        f"• Ожидают отправки: {stats['pending']}",
+        f"• Не отправлены после всех попыток: {stats['dead']}",
+    ]
+    dead_jobs = await db.outbox.dead_jobs()
+    if dead_jobs:
+        lines.append("")
+        lines.append("Последние неотправленные:")
+        for job in dead_jobs:
+            lines.append(f"• {job['table_name']} #{job['record_id']} ({job['action_type']}): "
+                         f"{(job['last_error'] or '')[:100]}")
+    return "\n".join(lines), stats['dead'] > 0
+
+@router.message(Command('outbox'))
+async def show_outbox(message: types.Message):
+    """Состояние очереди синхронизации (только для менеджеров)"""
+    if message.from_user.id not in MANAGERS_ID:
+        return
+    text, has_dead = await outbox_report()
+    await message.answer(text, reply_markup=outbox_actions(has_dead))
+
+@router.callback_query(lambda c: c.data in ('outbox_refresh', 'outbox_replay'))
+async def handle_outbox_action(callback: types.CallbackQuery):
+    """Обновление отчёта и повтор неотправленных заданий"""
+    if callback.from_user.id not in MANAGERS_ID:
+        await callback.answer()
+        return
+    if callback.data == 'outbox_replay':
+        replayed = await db.outbox.replay_dead()
+        await callback.answer(f"Возвращено в очередь: {replayed}")
+    else:
+        await callback.answer()
+    text, has_dead = await outbox_report()
     try:
-        await db.sheets.sync_data_to_sheet(table_name)
-        await callback.message.edit_text(
-            f"✅ Синхронизация Google Sheets с таблицей '{table_name}' успешно выполнена!",
-            reply_markup=manager_menu()
-        )
+        await callback.message.edit_text(text, reply_markup=outbox_actions(has_dead))
     except Exception as e:
-        logger.error(f"Ошибка синхронизации Google Sheets с БД: {str(e)}")
-        await callback.message.edit_text(
-            f"❌ Ошибка при синхронизации Google Sheets с таблицей '{table_name}': {str(e)}",
-            reply_markup=manager_menu()
-        )
+        # Текст не изменился - Telegram отклоняет такое редактирование
+        logger.debug(f"Could not edit outbox report: {str(e)}")
 
 @router.callback_query(lambda c: c.data == 'manager_create_batch')
 async def start_create_batch(callback: types.CallbackQuery, state: FSMContext):
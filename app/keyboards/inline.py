@@ -147,6 +147,15 @@ def table_actions(table_name: str):
         [InlineKeyboardButton(text="🔙 В главное меню", callback_data="back_to_manager_menu")]
     ])
 
+def outbox_actions(has_dead: bool):
+    """Клавиатура управления очередью синхронизации"""
+    buttons = []
+    if has_dead:
+        buttons.append([InlineKeyboardButton(text="🔁 Повторить неотправленные", callback_data="outbox_replay")])
+    buttons.append([InlineKeyboardButton(text="🔄 Обновить", callback_data="outbox_refresh")])
+    buttons.append([InlineKeyboardButton(text="🔙 В главное меню", callback_data="back_to_manager_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
 def back_cancel_keyboard(back_callback: str = "back_step", cancel_callback: str = "cancel_cutter"):
     """Клавиатура с кнопками Назад и Отмена"""
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -16,7 +16,8 @@ from app.handlers import manager, seamstress, cutter, controller, trunk
 from app.database import init_db, db
 from app.credentials import WEBHOOK_URL, MANAGERS_ID
 from app.bot import bot
-from app.services.update_from_sheets import handle_google_sheets_update
+from app.services.update_from_sheets import edit_queue
+from app.services.dictionary import TABLE_TRANSLATIONS
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from aiogram.exceptions import TelegramAPIError
 # Настройка логирования
@@ -39,8 +40,9 @@ scheduler = AsyncIOScheduler()
 
 def start_scheduler():
     # Запланировать выполнение функции full_sync каждый день в 4:00
+    # Корутина выполняется в цикле событий приложения, рядом с открытым соединением БД
     scheduler.add_job(
-        func=lambda: asyncio.run(db.sheets.full_sync()),
+        func=db.sheets.full_sync,
         trigger='cron',
         hour=5,
         minute=4
@@ -72,7 +74,7 @@ async def set_commands():
     )
 @app.before_serving
 async def startup():
-    db_instance = await init_db()  # Получаем инициализированный экземпляр БД
+    db_instance = await init_db(db)  # Инициализируем общий экземпляр БД
     app.db = db_instance  # Сохраняем в контексте приложения
     
     logger.info("Обновление менеджеров")
@@ -84,17 +86,24 @@ async def startup():
 
     await set_commands()
     logger.info("Настройка Google Sheets")
+    await db.sheets.load_metadata()
     async with db.execute("""SELECT name FROM sqlite_master WHERE type='table'
                            AND name NOT LIKE 'sqlite_%' 
                            AND name NOT LIKE '%_audit'""") as cursor:
-        tables = [row[0] for row in await cursor.fetchall()]
+        tables = [row[0] for row in await cursor.fetchall() if row[0] in TABLE_TRANSLATIONS]
         for table in tables:
             await db.sheets.initialize_sheet(table)
     await db.sheets.full_sync()
+    await edit_queue.start()
 
     # Запуск планировщика
     start_scheduler()
 
+@app.after_serving
+async def shutdown():
+    # Правки из Google Sheets, уже подтверждённые вебхуком, применяем до выхода
+    await edit_queue.stop()
+
 @app.route('/webhook', methods=['POST'])
 async def webhook_handler():
     try:
@@ -107,13 +116,23 @@ async def webhook_handler():
             await dp.feed_update(bot, update)
             return jsonify({'status': 'ok'})
         else:  # Это запрос от Google Sheets
-            await handle_google_sheets_update(data)
+            # Правка применяется в фоне, Apps Script не ждёт БД и уведомлений
+            if not edit_queue.submit(data):
+                return jsonify({'status': 'error', 'message': 'queue is full'}), 503
             return jsonify({'status': 'ok'})
             
     except Exception as e:
         logger.error(f"Webhook error: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+async def metrics_handler():
+    """Состояние очередей синхронизации с Google Sheets"""
+    return jsonify({
+        'sheets_ingest': edit_queue.metrics(),
+        'sheets_outbox': await db.outbox.stats(),
+    })
+
 if __name__ == '__main__':
     from hypercorn.config import Config
     from hypercorn.asyncio import serve
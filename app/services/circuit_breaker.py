@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsUnavailableError(Exception):
+    """Google Sheets временно недоступен: запрос отклонён без обращения к API"""
+
+
+class CircuitBreaker:
+    """Предохранитель для обращений к внешнему сервису.
+
+    После failure_threshold сбоев подряд цепь размыкается: вызовы сразу
+    получают SheetsUnavailableError, не дожидаясь таймаутов и повторов.
+    Пока цепь разомкнута, фоновая задача периодически вызывает probe;
+    первая удачная проверка замыкает цепь и запускает отложенные операции.
+    """
+
+    def __init__(self, probe: Callable[[], Awaitable], failure_threshold: int = 5,
+                 probe_interval: float = 15, max_probe_interval: float = 300):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.max_probe_interval = max_probe_interval
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._closed = asyncio.Event()
+        self._closed.set()
+        self._probe_task = None
+        # Операции, отложенные до восстановления связи (ключ исключает дубли)
+        self._deferred: Dict[str, Callable[[], Awaitable]] = {}
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def check(self) -> None:
+        """Отклонить вызов, если цепь разомкнута"""
+        if self.is_open:
+            raise SheetsUnavailableError(
+                f"Google Sheets недоступен уже {time.monotonic() - self._opened_at:.0f} сек"
+            )
+
+    def record_success(self) -> None:
+        self._failures = 0
+
+    def record_failure(self, error: Exception) -> None:
+        self._failures += 1
+        if not self.is_open and self._failures >= self.failure_threshold:
+            self._open(error)
+
+    async def wait_closed(self) -> None:
+        await self._closed.wait()
+
+    def defer(self, key: str, operation: Callable[[], Awaitable]) -> None:
+        """Отложить операцию до восстановления связи"""
+        self._deferred[key] = operation
+
+    def _open(self, error: Exception) -> None:
+        logger.error(f"Google Sheets недоступен после {self._failures} сбоев подряд "
+                     f"({str(error)}), запросы приостановлены")
+        self._opened_at = time.monotonic()
+        self._closed.clear()
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    def _close(self) -> None:
+        logger.info(f"Связь с Google Sheets восстановлена через "
+                    f"{time.monotonic() - self._opened_at:.0f} сек")
+        self._opened_at = None
+        self._failures = 0
+        self._closed.set()
+        deferred, self._deferred = self._deferred, {}
+        for key, operation in deferred.items():
+            asyncio.create_task(self._run_deferred(key, operation))
+
+    async def _probe_loop(self) -> None:
+        """Проверка доступности с растущим интервалом, пока цепь разомкнута"""
+        interval = self.probe_interval
+        while self.is_open:
+            await asyncio.sleep(interval)
+            try:
+                await self.probe()
+            except Exception as e:
+                logger.warning(f"Google Sheets всё ещё недоступен: {str(e)}")
+                interval = min(interval * 2, self.max_probe_interval)
+            else:
+                self._close()
+
+    @staticmethod
+    async def _run_deferred(key: str, operation: Callable[[], Awaitable]) -> None:
+        try:
+            await operation()
+            logger.info(f"Отложенная операция {key} выполнена")
+        except Exception as e:
+            logger.error(f"Отложенная операция {key} завершилась ошибкой: {str(e)}")
@@ -0,0 +1,506 @@
+import collections
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+# Диапазон A1: необязательный лист (в кавычках или без), ячейка или интервал
+_A1_RE = re.compile(
+    r"^(?:(?P<sheet>'(?:[^']|'')+'|[^!']+)!)?"
+    r"(?P<c1>[A-Z]*)(?P<r1>\d*)(?::(?P<c2>[A-Z]*)(?P<r2>\d*))?$"
+)
+_NUMBER_RE = re.compile(r'^-?\d+(?:[.,]\d+)?$')
+# Прямая ссылка на диапазон в формуле; удалённый целиком диапазон становится #REF!
+_FORMULA_REF_RE = re.compile(r"(?P<sheet>'(?:[^']|'')+')!(?P<c1>[A-Z]+)(?P<r1>\d+):(?P<c2>[A-Z]+)(?P<r2>\d+)")
+_REF = r"(?P<range>'(?:[^']|'')+'![A-Z]+\d+:[A-Z]+\d+|#REF!)"
+# Формулы сверки блоков (block_checksum_formula и block_layout_formula в google_sheets)
+_CHECKSUM_FORMULA_RE = re.compile(r'^=LET\(x, TEXTJOIN\(CHAR\(31\), FALSE, ' + _REF + r'\)')
+_LAYOUT_FORMULA_RE = re.compile(r'^=ROW\(' + _REF + r'\)&')
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+def _column_letters(index: int) -> str:
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _quote_sheet(title: str) -> str:
+    if re.fullmatch(r'\w+', title, re.ASCII):
+        return title
+    return "'" + title.replace("'", "''") + "'"
+
+
+class FakeSheetsRequest:
+    """Запрос к локальной таблице с интерфейсом HttpRequest googleapiclient"""
+
+    def __init__(self, service: 'FakeSheetsService', method_id: str, http_method: str,
+                 handler, body: Optional[dict] = None):
+        self.service = service
+        self.methodId = method_id
+        self.method = http_method
+        self.uri = f"fake://sheets/{method_id}"
+        self.body = json.dumps(body, ensure_ascii=False) if body is not None else None
+        self.headers = {}
+        self._handler = handler
+
+    def execute(self, http=None, num_retries=0):
+        return self.service._execute(self)
+
+
+class _FakeValues:
+    def __init__(self, service: 'FakeSheetsService'):
+        self._service = service
+
+    def get(self, spreadsheetId, range, valueRenderOption='FORMATTED_VALUE', **kwargs):
+        return self._service._request(
+            'sheets.spreadsheets.values.get', 'GET',
+            lambda: self._service._read_range(range, valueRenderOption)
+        )
+
+    def batchGet(self, spreadsheetId, ranges, valueRenderOption='FORMATTED_VALUE', **kwargs):
+        return self._service._request(
+            'sheets.spreadsheets.values.batchGet', 'GET',
+            lambda: {
+                'spreadsheetId': spreadsheetId,
+                'valueRanges': [self._service._read_range(r, valueRenderOption) for r in ranges]
+            }
+        )
+
+    def update(self, spreadsheetId, range, valueInputOption, body, **kwargs):
+        return self._service._request(
+            'sheets.spreadsheets.values.update', 'PUT',
+            lambda: self._service._write_range(range, body['values'], valueInputOption),
+            body
+        )
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        def handler():
+            responses = [
+                self._service._write_range(data['range'], data['values'], body.get('valueInputOption'))
+                for data in body['data']
+            ]
+            return {
+                'spreadsheetId': spreadsheetId,
+                'totalUpdatedRows': sum(r['updatedRows'] for r in responses),
+                'responses': responses
+            }
+        return self._service._request('sheets.spreadsheets.values.batchUpdate', 'POST', handler, body)
+
+    def append(self, spreadsheetId, range, valueInputOption, body, **kwargs):
+        return self._service._request(
+            'sheets.spreadsheets.values.append', 'POST',
+            lambda: {'spreadsheetId': spreadsheetId,
+                     'updates': self._service._append(range, body['values'], valueInputOption)},
+            body
+        )
+
+    def clear(self, spreadsheetId, range, body=None, **kwargs):
+        return self._service._request(
+            'sheets.spreadsheets.values.clear', 'POST',
+            lambda: self._service._clear_range(range),
+            body or {}
+        )
+
+
+class _FakeSpreadsheets:
+    def __init__(self, service: 'FakeSheetsService'):
+        self._service = service
+
+    def values(self):
+        return _FakeValues(self._service)
+
+    def get(self, spreadsheetId, **kwargs):
+        return self._service._request(
+            'sheets.spreadsheets.get', 'GET',
+            lambda: {'spreadsheetId': spreadsheetId, 'sheets': self._service._sheet_properties()}
+        )
+
+    def create(self, body, **kwargs):
+        return self._service._request(
+            'sheets.spreadsheets.create', 'POST',
+            lambda: {'spreadsheetId': f"fake-{next(self._service._ids)}", **body},
+            body
+        )
+
+    def batchUpdate(self, spreadsheetId, body, **kwargs):
+        return self._service._request(
+            'sheets.spreadsheets.batchUpdate', 'POST',
+            lambda: {'spreadsheetId': spreadsheetId,
+                     'replies': [self._service._apply_request(r) for r in body['requests']]},
+            body
+        )
+
+
+class FakeSheetsService:
+    """Локальная замена сервиса Google Sheets API v4 для тестов и бенчмарков.
+
+    Повторяет интерфейс объекта build('sheets', 'v4') в той части, которую
+    использует GoogleSheetsManager: values get/batchGet/update/batchUpdate/
+    append/clear и spreadsheets get/create/batchUpdate (addSheet, deleteSheet,
+    deleteDimension, insertDimension, updateSheetProperties; запросы
+    форматирования принимаются без изменений данных). Из формул
+    вычисляется только контрольная сумма блока строк, остальные
+    возвращаются текстом.
+
+    Настраиваются задержка ответа, внедрение ошибок (fail_next, error_rate)
+    и поминутные квоты чтения/записи с ответом 429. Счётчики вызовов и
+    переданных байтов доступны в stats().
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 reads_per_minute: Optional[int] = None, writes_per_minute: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quotas = {'read': reads_per_minute, 'write': writes_per_minute}
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._sheets: Dict[str, dict] = {}
+        self._ids = itertools.count(1)
+        self._failures = collections.deque()
+        self._quota_windows = {'read': collections.deque(), 'write': collections.deque()}
+        self.reset_stats()
+
+    def spreadsheets(self):
+        return _FakeSpreadsheets(self)
+
+    # --- Управление состоянием из тестов ---
+
+    def add_sheet(self, title: str, rows: Optional[List[list]] = None) -> int:
+        with self._lock:
+            return self._add_sheet(title, rows)['sheetId']
+
+    def sheet_values(self, title: str) -> List[list]:
+        """Копия содержимого листа без хвостовых пустых строк"""
+        with self._lock:
+            rows = [list(row) for row in self._sheet(title)['rows']]
+        while rows and not any(cell not in ('', None) for cell in rows[-1]):
+            rows.pop()
+        return rows
+
+    def fail_next(self, count: int = 1, status: int = 503, exception: Optional[Exception] = None) -> None:
+        """Следующие count запросов завершатся ошибкой HTTP status или исключением exception"""
+        with self._lock:
+            self._failures.extend([(status, exception)] * count)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls = collections.Counter()
+            self.errors = collections.Counter()
+            self.bytes_sent = 0
+            self.bytes_received = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'calls': dict(self.calls),
+                'total_calls': sum(self.calls.values()),
+                'errors': dict(self.errors),
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+            }
+
+    # --- Выполнение запросов ---
+
+    def _request(self, method_id: str, http_method: str, handler, body: Optional[dict] = None):
+        return FakeSheetsRequest(self, method_id, http_method, handler, body)
+
+    def _execute(self, request: FakeSheetsRequest):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        kind = 'read' if request.method == 'GET' else 'write'
+        with self._lock:
+            self.calls[request.methodId] += 1
+            self.bytes_sent += len(request.body.encode('utf-8')) if request.body else 0
+
+            if self._failures:
+                status, exception = self._failures.popleft()
+                self.errors[request.methodId] += 1
+                if exception is not None:
+                    raise exception
+                raise self._http_error(status, 'Injected failure')
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors[request.methodId] += 1
+                raise self._http_error(503, 'The service is currently unavailable.')
+            self._check_quota(kind)
+
+            result = request._handler()
+            self.bytes_received += len(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+            return result
+
+    def _check_quota(self, kind: str) -> None:
+        limit = self.quotas[kind]
+        if not limit:
+            return
+        window = self._quota_windows[kind]
+        now = time.monotonic()
+        while window and now - window[0] >= 60:
+            window.popleft()
+        if len(window) >= limit:
+            self.errors['quota'] += 1
+            raise self._http_error(
+                429, f"Quota exceeded for quota metric '{kind.capitalize()} requests'",
+                retry_after=max(1, int(60 - (now - window[0])) + 1)
+            )
+        window.append(now)
+
+    @staticmethod
+    def _http_error(status: int, message: str, retry_after: Optional[int] = None) -> HttpError:
+        info = {'status': str(status), 'content-type': 'application/json'}
+        if retry_after is not None:
+            info['retry-after'] = str(retry_after)
+        content = json.dumps({'error': {'code': status, 'message': message}}).encode('utf-8')
+        return HttpError(httplib2.Response(info), content, uri='fake://sheets')
+
+    # --- Модель данных ---
+
+    def _add_sheet(self, title: str, rows: Optional[List[list]] = None,
+                   row_count: int = 1000, column_count: int = 26) -> dict:
+        if title in self._sheets:
+            raise self._http_error(400, f'Invalid requests[0].addSheet: A sheet with the name "{title}" already exists.')
+        sheet = {
+            'sheetId': next(self._ids), 'title': title, 'hidden': False,
+            'rowCount': row_count, 'columnCount': column_count,
+            'rows': [list(row) for row in rows or []],
+        }
+        self._sheets[title] = sheet
+        return sheet
+
+    def _sheet(self, title: str) -> dict:
+        if title not in self._sheets:
+            raise self._http_error(400, f'Unable to parse range: {title}')
+        return self._sheets[title]
+
+    def _sheet_by_id(self, sheet_id: int) -> dict:
+        for sheet in self._sheets.values():
+            if sheet['sheetId'] == sheet_id:
+                return sheet
+        raise self._http_error(400, f'No grid with id: {sheet_id}')
+
+    def _properties(self, sheet: dict) -> dict:
+        return {
+            'sheetId': sheet['sheetId'], 'title': sheet['title'], 'hidden': sheet['hidden'],
+            'gridProperties': {'rowCount': sheet['rowCount'], 'columnCount': sheet['columnCount']},
+        }
+
+    def _sheet_properties(self) -> List[dict]:
+        return [{'properties': self._properties(sheet)} for sheet in self._sheets.values()]
+
+    def _parse_range(self, a1: str):
+        """Лист и границы диапазона (строки с 0, конец включительно; None - до конца)"""
+        if '!' not in a1 and a1.strip("'").replace("''", "'") in self._sheets:
+            # Диапазон из одного названия листа - весь лист
+            return self._sheets[a1.strip("'").replace("''", "'")], 0, 0, None, None
+        match = _A1_RE.match(a1)
+        if not match:
+            raise self._http_error(400, f'Unable to parse range: {a1}')
+        title = match['sheet'] or next(iter(self._sheets), '')
+        if title.startswith("'"):
+            title = title[1:-1].replace("''", "'")
+        sheet = self._sheet(title)
+        c1, r1, c2, r2 = match['c1'], match['r1'], match['c2'], match['r2']
+        first_col = _column_index(c1) if c1 else 0
+        first_row = int(r1) - 1 if r1 else 0
+        if match.group('c2') is None and match.group('r2') is None:
+            # Одна ячейка, один столбец или одна строка
+            last_col = first_col if c1 else None
+            last_row = first_row if r1 else None
+        else:
+            last_col = _column_index(c2) if c2 else None
+            last_row = int(r2) - 1 if r2 else None
+        return sheet, first_row, first_col, last_row, last_col
+
+    @staticmethod
+    def _to_cell(value, input_option: Optional[str]):
+        """Значение в ячейке: USER_ENTERED распознаёт числа, как это делает Google"""
+        if input_option == 'USER_ENTERED' and isinstance(value, str) and _NUMBER_RE.match(value):
+            number = float(value.replace(',', '.'))
+            return int(number) if number.is_integer() and '.' not in value and ',' not in value else number
+        return '' if value is None else value
+
+    @staticmethod
+    def _render(value, render_option: str):
+        if render_option != 'FORMATTED_VALUE':
+            return value
+        if isinstance(value, bool):
+            return 'TRUE' if value else 'FALSE'
+        return str(value)
+
+    def _range_label(self, sheet: dict, first_row: int, first_col: int, last_row: int, last_col: int) -> str:
+        return (f"{_quote_sheet(sheet['title'])}!{_column_letters(first_col)}{first_row + 1}"
+                f":{_column_letters(last_col)}{last_row + 1}")
+
+    def _read_range(self, a1: str, render_option: str = 'FORMATTED_VALUE') -> dict:
+        sheet, first_row, first_col, last_row, last_col = self._parse_range(a1)
+        rows = sheet['rows']
+        end_row = len(rows) - 1 if last_row is None else min(last_row, len(rows) - 1)
+        values = []
+        for row in rows[first_row:end_row + 1]:
+            cells = row[first_col:None if last_col is None else last_col + 1]
+            while cells and cells[-1] in ('', None):
+                cells = cells[:-1]
+            values.append([self._render(self._evaluate(cell), render_option) for cell in cells])
+        # Google не возвращает хвостовые пустые строки
+        while values and not values[-1]:
+            values.pop()
+        result = {'range': a1, 'majorDimension': 'ROWS'}
+        if values:
+            result['values'] = values
+        return result
+
+    def _evaluate(self, cell):
+        """Значение формул сверки блоков.
+
+        Контрольная сумма - сумма кодов символов склейки блока с весом позиции,
+        диапазон - 'первая строка:строк:колонок'.
+        """
+        if not isinstance(cell, str):
+            return cell
+        match = _CHECKSUM_FORMULA_RE.match(cell) or _LAYOUT_FORMULA_RE.match(cell)
+        if not match:
+            return cell
+        try:
+            sheet, first_row, first_col, last_row, last_col = self._parse_range(match['range'])
+        except HttpError:
+            return '#REF!'
+        if match.re is _LAYOUT_FORMULA_RE:
+            return f"{first_row + 1}:{last_row - first_row + 1}:{last_col - first_col + 1}"
+        rows = sheet['rows']
+        text = chr(31).join(
+            '' if cell in ('', None) else self._render(cell, 'FORMATTED_VALUE')
+            for row in (rows[index] if index < len(rows) else [] for index in range(first_row, last_row + 1))
+            for cell in (row[col] if col < len(row) else '' for col in range(first_col, last_col + 1))
+        )
+        return sum(position * ord(char) for position, char in enumerate(text, start=1))
+
+    def _write_cells(self, sheet: dict, first_row: int, first_col: int, values: List[list],
+                     input_option: Optional[str]) -> dict:
+        rows = sheet['rows']
+        width = 0
+        for offset, row_values in enumerate(values):
+            index = first_row + offset
+            while len(rows) <= index:
+                rows.append([])
+            row = rows[index]
+            for col_offset, value in enumerate(row_values):
+                while len(row) <= first_col + col_offset:
+                    row.append('')
+                # None в запросе означает "не менять ячейку"
+                if value is not None:
+                    row[first_col + col_offset] = self._to_cell(value, input_option)
+            width = max(width, len(row_values))
+        sheet['rowCount'] = max(sheet['rowCount'], len(rows))
+        last_row = first_row + max(len(values), 1) - 1
+        return {
+            'updatedRange': self._range_label(sheet, first_row, first_col, last_row, first_col + max(width, 1) - 1),
+            'updatedRows': len(values),
+            'updatedColumns': width,
+            'updatedCells': sum(len(row) for row in values),
+        }
+
+    def _write_range(self, a1: str, values: List[list], input_option: Optional[str]) -> dict:
+        sheet, first_row, first_col, _, _ = self._parse_range(a1)
+        return self._write_cells(sheet, first_row, first_col, values, input_option)
+
+    def _append(self, a1: str, values: List[list], input_option: Optional[str]) -> dict:
+        """Добавление после последней непустой строки листа"""
+        sheet, _, first_col, _, _ = self._parse_range(a1)
+        rows = sheet['rows']
+        last = len(rows)
+        while last and not any(cell not in ('', None) for cell in rows[last - 1]):
+            last -= 1
+        return self._write_cells(sheet, last, first_col, values, input_option)
+
+    def _clear_range(self, a1: str) -> dict:
+        sheet, first_row, first_col, last_row, last_col = self._parse_range(a1)
+        rows = sheet['rows']
+        end_row = len(rows) - 1 if last_row is None else min(last_row, len(rows) - 1)
+        for index in range(first_row, end_row + 1):
+            rows[index] = [
+                '' if col >= first_col and (last_col is None or col <= last_col) else cell
+                for col, cell in enumerate(rows[index])
+            ]
+        return {'clearedRange': a1}
+
+    def _shift_references(self, title: str, kind: str, start: int, end: int) -> None:
+        """Сдвиг прямых ссылок формул на строки листа, как это делает Google"""
+        quoted = "'" + title.replace("'", "''") + "'"
+
+        def shift(match):
+            if match['sheet'] != quoted:
+                return match.group(0)
+            first, last = int(match['r1']) - 1, int(match['r2']) - 1
+            if kind == 'insertDimension':
+                first += end - start if first >= start else 0
+                last += end - start if last >= start else 0
+            else:
+                if start <= first and last < end:
+                    return '#REF!'
+                first = first - (end - start) if first >= end else min(first, start)
+                last = last - (end - start) if last >= end else min(last, start - 1)
+            return f"{match['sheet']}!{match['c1']}{first + 1}:{match['c2']}{last + 1}"
+
+        for sheet in self._sheets.values():
+            for row in sheet['rows']:
+                for col, cell in enumerate(row):
+                    if isinstance(cell, str) and cell.startswith('='):
+                        row[col] = _FORMULA_REF_RE.sub(shift, cell)
+
+    def _apply_request(self, request: dict) -> dict:
+        """Один запрос из spreadsheets.batchUpdate"""
+        kind, params = next(iter(request.items()))
+        if kind == 'addSheet':
+            properties = params.get('properties', {})
+            grid = properties.get('gridProperties', {})
+            sheet = self._add_sheet(
+                properties.get('title') or f"Лист{len(self._sheets) + 1}",
+                row_count=grid.get('rowCount', 1000), column_count=grid.get('columnCount', 26)
+            )
+            sheet['hidden'] = properties.get('hidden', False)
+            return {'addSheet': {'properties': self._properties(sheet)}}
+        if kind == 'deleteSheet':
+            sheet = self._sheet_by_id(params['sheetId'])
+            del self._sheets[sheet['title']]
+        elif kind in ('deleteDimension', 'insertDimension'):
+            grid_range = params['range']
+            if grid_range.get('dimension') != 'ROWS':
+                return {}
+            sheet = self._sheet_by_id(grid_range['sheetId'])
+            start, end = grid_range['startIndex'], grid_range['endIndex']
+            if kind == 'deleteDimension':
+                del sheet['rows'][start:end]
+                sheet['rowCount'] -= min(end, sheet['rowCount']) - start
+            else:
+                sheet['rows'][start:start] = [[] for _ in range(end - start)]
+                sheet['rowCount'] += end - start
+            self._shift_references(sheet['title'], kind, start, end)
+        elif kind == 'updateSheetProperties':
+            properties = params['properties']
+            sheet = self._sheet_by_id(properties['sheetId'])
+            if 'title' in properties and properties['title'] != sheet['title']:
+                del self._sheets[sheet['title']]
+                sheet['title'] = properties['title']
+                self._sheets[sheet['title']] = sheet
+            if 'hidden' in properties:
+                sheet['hidden'] = properties['hidden']
+        # Форматирование, проверка данных и прочее на значения не влияют
+        return {}
@@ -1,51 +1,534 @@
 import logging
 import asyncio
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from google.oauth2.service_account import Credentials
 import re
 from datetime import datetime
 import hashlib
+import json
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from google_auth_httplib2 import AuthorizedHttp
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
+import threading
+import aiohttp
+import os
 from app.credentials import GOOGLE_CREDS, SPREADSHEET_ID
 from app.services.dictionary import COLUMN_TRANSLATIONS, TABLE_TRANSLATIONS
+from app.services.sheets_transport import AsyncSheetsTransport
+from app.services.fake_sheets import FakeSheetsService
+from app.services.rate_limiter import (
+    PRIORITY_BACKGROUND, SheetsRateLimiter, background_priority, backoff_delay, parse_retry_after, request_priority
+)
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.sheet_converters import compile_row_converter
 import ssl
 import time
 
 logger = logging.getLogger(__name__)
 
+# Окно накопления записей перед отправкой одним пакетом
+SHEETS_BATCH_WINDOW = 0.5  # секунды
+# Размер порции строк при полной выгрузке таблицы в лист
+EXPORT_CHUNK_SIZE = 1000
+# Прерванная выгрузка продолжается, только если контрольная точка свежая:
+# строки до неё, изменённые позже, иначе остались бы старыми
+EXPORT_RESUME_MAX_AGE = 3600  # секунды
+# Сколько таблиц full_sync синхронизирует одновременно (с оглядкой на квоты API)
+FULL_SYNC_CONCURRENCY = 2
+# Отдельный пул потоков для запросов к Google Sheets
+SHEETS_IO_WORKERS = 4
+# Таймаут сокета меньше SHEETS_CALL_TIMEOUT: зависший запрос освобождает поток
+# пула вскоре после того, как попытка отменена по общему таймауту
+SHEETS_HTTP_TIMEOUT = 15  # секунды
+# Квоты Google Sheets API на пользователя в минуту и число попыток запроса
+SHEETS_READS_PER_MINUTE = 60
+SHEETS_WRITES_PER_MINUTE = 60
+SHEETS_MAX_ATTEMPTS = 5
+# Предохранитель: общий таймаут попытки, неудачных вызовов подряд до размыкания
+# (вызов с повторами считается одним сбоем) и интервал проверки связи
+SHEETS_CALL_TIMEOUT = 20  # секунды
+SHEETS_BREAKER_THRESHOLD = 5
+SHEETS_PROBE_INTERVAL = 15  # секунды
+# Асинхронный транспорт на aiohttp вместо потоков с httplib2 (включается переменной окружения)
+SHEETS_ASYNC_TRANSPORT = os.getenv('SHEETS_ASYNC_TRANSPORT', '0') == '1'
+# Локальная замена Google Sheets для работы без сети и учётных данных
+SHEETS_FAKE_BACKEND = os.getenv('SHEETS_BACKEND', 'google') == 'fake'
+# Сколько раз пересчитывать позиции строк, если структура листа изменилась
+SHEETS_LAYOUT_ATTEMPTS = 3
+# Помесячные листы: таблица -> колонка с датой, месяц которой определяет лист
+# (например, 'Пачки 2026-10'). Включается переменной окружения SHEETS_PARTITION_BATCHES=1
+SHEETS_PARTITIONED_TABLES = (
+    {'batches': 'created_at'} if os.getenv('SHEETS_PARTITION_BATCHES', '0') == '1' else {}
+)
+_PARTITION_SHEET_RE = re.compile(r'^(?P<base>.+) (?P<month>\d{4}-\d{2})$')
+# Сверка по блокам строк: размер блока, скрытый лист с формулами контрольных
+# сумм и сколько блоков скачивается одним batchGet
+SHEETS_CHECKSUM_BLOCK_ROWS = 100
+SHEETS_CHECKSUM_SHEET = 'Контрольные суммы'
+SHEETS_CHECKSUM_FETCH_BLOCKS = 50
+
+
+def a1_range(sheet_name: str, cells: str) -> str:
+    """Диапазон A1 с названием листа в кавычках (в названии могут быть пробелы)"""
+    return "'{}'!{}".format(sheet_name.replace("'", "''"), cells)
+
+
+def current_partition_month() -> str:
+    # Месяц по UTC, как CURRENT_TIMESTAMP в SQLite
+    return datetime.utcnow().strftime('%Y-%m')
+
+
+def partition_sheet_name(table_name: str, month: str) -> str:
+    return f"{TABLE_TRANSLATIONS.get(table_name, table_name)} {month}"
+
+
+def parse_partition_sheet(sheet_name: str) -> Optional[tuple]:
+    """(таблица, месяц) для помесячного листа, иначе None"""
+    match = _PARTITION_SHEET_RE.match(sheet_name)
+    if not match:
+        return None
+    for table_name in SHEETS_PARTITIONED_TABLES:
+        if TABLE_TRANSLATIONS.get(table_name) == match['base']:
+            return table_name, match['month']
+    return None
+
+
+def is_closed_partition(month: str) -> bool:
+    """Прошедшие месяцы закрыты: их листы только для чтения"""
+    return month < current_partition_month()
+
+
+def block_checksum_formula(sheet_name: str, first_row: int, last_row: int, last_column: str) -> str:
+    """Формула контрольной суммы блока строк листа.
+
+    Ячейки блока склеиваются через TEXTJOIN, коды символов суммируются
+    с весом позиции - сумма меняется при правке любой ячейки. Ссылка на
+    диапазон прямая (не INDIRECT), поэтому формула пересчитывается только
+    при правках внутри блока.
+    """
+    cells = a1_range(sheet_name, f"A{first_row}:{last_column}{last_row}")
+    return (f'=LET(x, TEXTJOIN(CHAR(31), FALSE, {cells}), n, LEN(x), '
+            f'IF(n = 0, 0, SUMPRODUCT(UNICODE(MID(x, SEQUENCE(n), 1)), SEQUENCE(n))))')
+
+
+def block_layout_formula(sheet_name: str, first_row: int, last_row: int, last_column: str) -> str:
+    """Формула, показывающая, куда сейчас указывает диапазон блока.
+
+    При вставке и удалении строк Google сдвигает прямые ссылки; результат
+    'первая строка:строк:колонок' позволяет заметить сдвиг и переписать формулы.
+    """
+    cells = a1_range(sheet_name, f"A{first_row}:{last_column}{last_row}")
+    return f'=ROW({cells})&":"&ROWS({cells})&":"&COLUMNS({cells})'
+
+
+class StaleRowPositionError(Exception):
+    """Номер строки вычислен до удаления строк или перезаписи листа"""
+
+
+class SheetsWriteBatcher:
+    """Накопитель записей в листы.
+
+    Обновления строк всех листов, поступившие за короткое окно, отправляются
+    одним values.batchUpdate, добавления - одним append на лист, удаления
+    строк - одним spreadsheets.batchUpdate. Вызывающий ждёт завершения
+    пакета, в который попала его запись.
+
+    Удаление строк сдвигает номера остальных, поэтому у каждого листа есть
+    версия структуры. Обновления и удаления передают версию, для которой
+    вычислен номер строки; если с тех пор строки удалялись, операция
+    завершается StaleRowPositionError и позицию нужно найти заново.
+    Пакеты отправляются строго по очереди: следующий проверяет версии
+    только после того, как удаления предыдущего учтены в индексе строк.
+    Пакет отправляется с наивысшим приоритетом среди попавших в него записей.
+
+    Проверочные чтения ячеек, поступившие за то же окно, тоже собираются
+    в один values.batchGet и выполняются перед записями пакета.
+    """
+
+    def __init__(self, manager: 'GoogleSheetsManager', window: float = SHEETS_BATCH_WINDOW):
+        self.manager = manager
+        self.window = window
+        self._updates = []  # (лист, номер строки, значения, версия, future)
+        self._appends = {}  # лист -> [(значения, future)]
+        self._deletes = {}  # лист -> [(номер строки, версия, future)]
+        self._reads = []  # (диапазоны, future)
+        self._layout_versions = {}
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self._priority = PRIORITY_BACKGROUND
+
+    def layout_version(self, sheet_name: str) -> int:
+        return self._layout_versions.get(sheet_name, 0)
+
+    def bump_layout(self, sheet_name: str) -> None:
+        """Отметить, что номера строк листа изменились"""
+        self._layout_versions[sheet_name] = self.layout_version(sheet_name) + 1
+
+    async def update(self, sheet_name: str, row_number: int, values: list, version: Optional[int] = None) -> None:
+        """Обновление строки с известным номером"""
+        future = asyncio.get_running_loop().create_future()
+        self._updates.append((sheet_name, row_number, values, version, future))
+        self._schedule_flush(request_priority.get())
+        await future
+
+    async def append(self, sheet_name: str, values: list) -> Optional[int]:
+        """Добавление строки в конец листа, возвращает её номер (если известен)"""
+        future = asyncio.get_running_loop().create_future()
+        self._appends.setdefault(sheet_name, []).append((values, future))
+        self._schedule_flush(request_priority.get())
+        return await future
+
+    async def read(self, ranges: List[str]) -> List[list]:
+        """Чтение диапазонов, возвращает значения каждого из них"""
+        future = asyncio.get_running_loop().create_future()
+        self._reads.append((ranges, future))
+        self._schedule_flush(request_priority.get())
+        return await future
+
+    async def delete(self, sheet_name: str, row_number: int, version: int) -> None:
+        """Удаление строки с известным номером"""
+        future = asyncio.get_running_loop().create_future()
+        self._deletes.setdefault(sheet_name, []).append((row_number, version, future))
+        self._schedule_flush(request_priority.get())
+        await future
+
+    def _schedule_flush(self, priority: int):
+        # Задача отправки копирует контекст первого вызывающего, поэтому
+        # приоритет пакета хранится отдельно и устанавливается при отправке
+        self._priority = min(self._priority, priority)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Отправка всех накопленных записей.
+
+        Порядок внутри пакета: чтения, обновления, добавления, затем удаления
+        снизу вверх, поэтому все номера строк пакета относятся к одной версии
+        листа.
+        """
+        async with self._flush_lock:
+            priority, self._priority = self._priority, PRIORITY_BACKGROUND
+            token = request_priority.set(priority)
+            try:
+                await self._flush_pending()
+            finally:
+                request_priority.reset(token)
+
+    async def _flush_pending(self) -> None:
+        reads, self._reads = self._reads, []
+        if reads:
+            await self._flush_reads(reads)
+
+        updates, self._updates = self._updates, []
+        appends, self._appends = self._appends, {}
+        deletes, self._deletes = self._deletes, {}
+        sheets = self.manager.sheets
+
+        updates = self._reject_stale(updates, lambda item: (item[0], item[3]))
+        deletes = {
+            sheet_name: self._reject_stale(items, lambda item: (sheet_name, item[1]))
+            for sheet_name, items in deletes.items()
+        }
+
+        if updates:
+            try:
+                await self.manager._execute_api_call(
+                    sheets.values().batchUpdate,
+                    spreadsheetId=SPREADSHEET_ID,
+                    body={
+                        'valueInputOption': 'USER_ENTERED',
+                        'data': [
+                            {'range': a1_range(sheet_name, f"A{row_number}"), 'values': [values]}
+                            for sheet_name, row_number, values, *_ in updates
+                        ]
+                    }
+                )
+            except Exception as e:
+                self._resolve([future for *_, future in updates], error=e)
+            else:
+                self._resolve([future for *_, future in updates])
+                logger.info(f"Отправлено пакетом {len(updates)} обновлений строк")
+
+        # Номера добавленных строк отдаём после удалений: они сдвинут и их
+        appended = {}
+        for sheet_name, items in appends.items():
+            futures = [future for _, future in items]
+            try:
+                result = await self.manager._execute_api_call(
+                    sheets.values().append,
+                    spreadsheetId=SPREADSHEET_ID,
+                    range=a1_range(sheet_name, "A:A"),
+                    valueInputOption='USER_ENTERED',
+                    body={'values': [values for values, _ in items]}
+                )
+            except Exception as e:
+                self._resolve(futures, error=e)
+                continue
+            first_row = self.manager._parse_first_row(result.get('updates', {}).get('updatedRange', ''))
+            appended[sheet_name] = (futures, first_row)
+
+        deleted = await self._flush_deletes({sheet: items for sheet, items in deletes.items() if items})
+
+        for sheet_name, (futures, first_row) in appended.items():
+            if first_row:
+                # Добавленные строки ниже всех удалённых
+                first_row -= deleted.get(sheet_name, 0)
+            self._resolve(futures, results=[first_row + offset if first_row else None for offset in range(len(futures))])
+
+    async def _flush_deletes(self, deletes: Dict[str, list]) -> Dict[str, int]:
+        """Удаление строк всех листов одним запросом, возвращает число удалённых по листам"""
+        if not deletes:
+            return {}
+        futures = [future for items in deletes.values() for *_, future in items]
+        spans = {
+            sheet_name: self._merge_spans({row_number for row_number, *_ in items})
+            for sheet_name, items in deletes.items()
+        }
+        try:
+            requests = []
+            for sheet_name, sheet_spans in spans.items():
+                sheet_id = await self.manager._get_sheet_id(sheet_name)
+                # Снизу вверх: удаление не сдвигает ещё не удалённые диапазоны
+                requests.extend({
+                    'deleteDimension': {
+                        'range': {
+                            'sheetId': sheet_id,
+                            'dimension': 'ROWS',
+                            'startIndex': start - 1,
+                            'endIndex': end
+                        }
+                    }
+                } for start, end in reversed(sheet_spans))
+            await self.manager._execute_api_call(
+                self.manager.sheets.batchUpdate,
+                spreadsheetId=SPREADSHEET_ID,
+                body={'requests': requests}
+            )
+        except Exception as e:
+            self._resolve(futures, error=e)
+            return {}
+
+        for sheet_name, sheet_spans in spans.items():
+            self.bump_layout(sheet_name)
+            await self.manager._shift_row_index(sheet_name, sheet_spans)
+        self._resolve(futures)
+        logger.info(f"Удалено одним запросом {sum(len(items) for items in deletes.values())} строк "
+                    f"({len(requests)} диапазонов)")
+        return {
+            sheet_name: sum(end - start + 1 for start, end in sheet_spans)
+            for sheet_name, sheet_spans in spans.items()
+        }
+
+    @staticmethod
+    def _merge_spans(row_numbers) -> List[tuple]:
+        """Слияние номеров строк в непрерывные диапазоны (начало, конец) по возрастанию"""
+        spans = []
+        for row_number in sorted(row_numbers):
+            if spans and row_number == spans[-1][1] + 1:
+                spans[-1] = (spans[-1][0], row_number)
+            else:
+                spans.append((row_number, row_number))
+        return spans
+
+    def _reject_stale(self, items: list, key) -> list:
+        """Отклонение операций, номер строки которых вычислен для старой версии листа"""
+        valid = []
+        for item in items:
+            sheet_name, version = key(item)
+            if version is not None and version != self.layout_version(sheet_name):
+                self._resolve([item[-1]], error=StaleRowPositionError(
+                    f"Структура листа {sheet_name} изменилась, позиция строки устарела"
+                ))
+            else:
+                valid.append(item)
+        return valid
+
+    async def _flush_reads(self, reads: List[tuple]) -> None:
+        """Все чтения пакета - один batchGet, ответ делится между вызывающими"""
+        futures = [future for _, future in reads]
+        try:
+            result = await self.manager._execute_api_call(
+                self.manager.sheets.values().batchGet,
+                spreadsheetId=SPREADSHEET_ID,
+                ranges=[a1 for ranges, _ in reads for a1 in ranges]
+            )
+        except Exception as e:
+            self._resolve(futures, error=e)
+            return
+        values = [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+        results, offset = [], 0
+        for ranges, _ in reads:
+            results.append(values[offset:offset + len(ranges)])
+            offset += len(ranges)
+        self._resolve(futures, results)
+
+    @staticmethod
+    def _resolve(futures, results=None, error=None):
+        for idx, future in enumerate(futures):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[idx] if results else None)
+
+
 class GoogleSheetsManager:
-    def __init__(self, db_instance=None):  # Добавлен параметр для инъекции зависимости
-        self.creds = Credentials.from_service_account_file(
-            GOOGLE_CREDS,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
-        )
-        self.service = build('sheets', 'v4', credentials=self.creds)
+    def __init__(self, db_instance=None, service=None):  # Добавлен параметр для инъекции зависимости
+        # Сервис можно подменить (например, FakeSheetsService в тестах и бенчмарках)
+        if service is None and SHEETS_FAKE_BACKEND:
+            service = FakeSheetsService()
+        if service is None:
+            self.creds = Credentials.from_service_account_file(
+                GOOGLE_CREDS,
+                scopes=['https://www.googleapis.com/auth/spreadsheets']
+            )
+            service = build('sheets', 'v4', credentials=self.creds)
+        else:
+            self.creds = None
+        self.service = service
         self.sheets = self.service.spreadsheets()
         self.db = db_instance  # Сохраняем ссылку на экземпляр БД
+        self.writer = SheetsWriteBatcher(self)
+        self.rate_limiter = SheetsRateLimiter(SHEETS_READS_PER_MINUTE, SHEETS_WRITES_PER_MINUTE)
+        self.breaker = CircuitBreaker(
+            self._probe,
+            failure_threshold=SHEETS_BREAKER_THRESHOLD,
+            probe_interval=SHEETS_PROBE_INTERVAL
+        )
+        # Кэш метаданных: типы и ограничения колонок, ID листов
+        self._column_types = {}
+        self._column_constraints = {}
+        # Скомпилированные преобразователи входящих строк по (таблица, заголовки)
+        self._row_converters = {}
+        self._sheet_ids = {}
+        self._schema_fingerprint = None
+        # ID листов, на которых уже стоит защита (закрытые месяцы)
+        self._protected_sheet_ids = set()
+        self._partition_lock = asyncio.Lock()
+        self._checksum_lock = asyncio.Lock()
+        # Листы, индекс строк которых построен в текущем процессе и считается полным
+        self._indexed_sheets = set()
+        # Запросы к API выполняются в собственном пуле, чтобы не занимать
+        # общий executor (распознавание QR, генерация PDF). У каждого потока
+        # свой авторизованный HTTP-клиент: httplib2 не потокобезопасен
+        self._executor = ThreadPoolExecutor(
+            max_workers=SHEETS_IO_WORKERS,
+            thread_name_prefix='sheets-io'
+        )
+        self._thread_local = threading.local()
+        self.transport = (
+            AsyncSheetsTransport(self.creds, timeout=SHEETS_HTTP_TIMEOUT)
+            if SHEETS_ASYNC_TRANSPORT and self.creds else None
+        )
+
+    async def close(self) -> None:
+        """Закрытие сессии асинхронного транспорта и пула потоков запросов"""
+        if self.transport:
+            await self.transport.close()
+        # Зависшие в потоках запросы не ждём: их попытки уже отменены таймаутом
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _thread_http(self) -> AuthorizedHttp:
+        """HTTP-клиент текущего потока пула, создаётся при первом обращении"""
+        http = getattr(self._thread_local, 'http', None)
+        if http is None:
+            http = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=SHEETS_HTTP_TIMEOUT))
+            self._thread_local.http = http
+        return http
+
+    def _run_request(self, request):
+        """Выполнение запроса в потоке пула"""
+        if self.creds is None:
+            # Подменённый сервис выполняет запросы сам
+            return request.execute()
+        return request.execute(http=self._thread_http())
+
+    async def _send(self, request):
+        """Одна попытка выполнения запроса с общим таймаутом"""
+        if self.transport and self.transport.supports(request):
+            call = self.transport.execute(request)
+        else:
+            call = asyncio.get_running_loop().run_in_executor(self._executor, self._run_request, request)
+        return await asyncio.wait_for(call, timeout=SHEETS_CALL_TIMEOUT)
+
+    async def _probe(self) -> None:
+        """Лёгкий запрос для проверки доступности API (в обход предохранителя)"""
+        await self.rate_limiter.acquire('read')
+        await self._send(self.sheets.get(spreadsheetId=SPREADSHEET_ID, fields='spreadsheetId'))
 
     async def _execute_api_call(self, func, *args, **kwargs):
-        """Обработка асинхронных вызовов API с повторными попытками при сбоях"""
-        loop = asyncio.get_event_loop()
+        """Обработка асинхронных вызовов API с повторными попытками при сбоях.
+
+        Перед каждой попыткой берётся токен из квоты чтения или записи
+        (с приоритетом текущей задачи). Ответ 429 приостанавливает квоту
+        на время из Retry-After, задержки между попытками со случайным разбросом.
+        Сбои и таймауты учитываются предохранителем один раз на вызов,
+        а не на каждую попытку: если он разомкнут, вызов сразу завершается
+        SheetsUnavailableError.
+        """
+        # Запрос строится локально, без обращения к сети
+        request = func(*args, **kwargs)
+        kind = 'read' if request.method == 'GET' else 'write'
         attempt = 0
-        max_attempts = 3
-        base_delay = 2  # начальная задержка в секундах
+        failure_recorded = False
         
         while True:
+            attempt += 1
+            self.breaker.check()
+            await self.rate_limiter.acquire(kind)
             try:
-                attempt += 1
-                return await loop.run_in_executor(None, lambda: func(*args, **kwargs).execute())
-            except (ssl.SSLError, TimeoutError, ConnectionError, HttpError) as e:
-                # Обработка ошибок сети и SSL
-                if attempt >= max_attempts:
+                result = await self._send(request)
+                self.breaker.record_success()
+                return result
+            except HttpError as e:
+                status = e.resp.status
+                if not self._is_retryable(e):
+                    logger.error(f"Google API ошибка после {attempt} попыток: {str(e)}")
+                    raise
+                # Превышение квоты - не признак недоступности сервиса
+                if status != 429 and not failure_recorded:
+                    self.breaker.record_failure(e)
+                    failure_recorded = True
+                if attempt >= SHEETS_MAX_ATTEMPTS:
+                    logger.error(f"Google API ошибка после {attempt} попыток: {str(e)}")
+                    raise
+                retry_after = parse_retry_after(e.resp.get('retry-after')) if status == 429 else None
+                delay = backoff_delay(attempt, retry_after=retry_after)
+                if status == 429:
+                    self.rate_limiter.penalize(kind, delay)
+                logger.warning(f"Ошибка API {status}: {str(e)}. Повторная попытка через {delay:.1f} сек...")
+                await asyncio.sleep(delay)
+            except (ssl.SSLError, TimeoutError, asyncio.TimeoutError, ConnectionError, aiohttp.ClientError) as e:
+                # Обработка ошибок сети, SSL и таймаутов (asyncio.TimeoutError
+                # до Python 3.11 не совпадает со встроенным TimeoutError)
+                if not failure_recorded:
+                    self.breaker.record_failure(e)
+                    failure_recorded = True
+                if attempt >= SHEETS_MAX_ATTEMPTS:
                     logger.error(f"Google API ошибка после {attempt} попыток: {str(e)}")
                     raise
                 
-                # Экспоненциальная задержка перед повторной попыткой
-                delay = base_delay * (2 ** (attempt - 1))
-                logger.warning(f"Сетевая/SSL ошибка: {str(e)}. Повторная попытка через {delay} сек...")
+                delay = backoff_delay(attempt)
+                logger.warning(f"Сетевая/SSL ошибка: {str(e)}. Повторная попытка через {delay:.1f} сек...")
                 await asyncio.sleep(delay)
 
+    @staticmethod
+    def _is_retryable(error: HttpError) -> bool:
+        """Повторяем превышение квоты и ошибки сервера, но не ошибки в запросе"""
+        status = error.resp.status
+        if status == 429 or status >= 500:
+            return True
+        # Старый формат ответа о превышении квоты
+        return status == 403 and b'rateLimitExceeded' in (error.content or b'')
+
     async def create_new_spreadsheet(self, title: str) -> str:
         """Создать новую таблицу"""
         spreadsheet = {
@@ -66,26 +549,16 @@ class GoogleSheetsManager:
         sheet_name = TABLE_TRANSLATIONS.get(table_name, table_name)
         clean_name = self._sanitize_sheet_name(sheet_name)
         
-        # Получаем список всех листов
-        spreadsheet = await self._execute_api_call(
-            self.sheets.get,
-            spreadsheetId=SPREADSHEET_ID,
-            includeGridData=False
-        )
-        
-        # Проверяем существование листа
-        existing_sheets = [s['properties']['title'] for s in spreadsheet['sheets']]
-        if clean_name in existing_sheets:
-            await self._execute_api_call(
-                self.sheets.values().clear,
-                spreadsheetId=SPREADSHEET_ID,
-                range=f"{sheet_name}!A:R",
-                body={}
-            )
+        # Список листов берём из кэша, при промахе обновляем его
+        if clean_name not in self._sheet_ids:
+            await self._refresh_sheet_ids()
+
+        # Существующий лист не очищаем: full_sync переносит только изменения
+        if clean_name in self._sheet_ids:
             return
     
         # Создаем новый лист
-        await self._execute_api_call(
+        result = await self._execute_api_call(
             self.sheets.batchUpdate,
             spreadsheetId=SPREADSHEET_ID,
             body={
@@ -99,6 +572,8 @@ class GoogleSheetsManager:
                 }]
             }
         )
+        properties = result['replies'][0]['addSheet']['properties']
+        self._sheet_ids[properties['title']] = properties['sheetId']
     
     def _sanitize_sheet_name(self, name: str) -> str:
         """Очистка названия листа по правилам Google"""
@@ -115,7 +590,62 @@ class GoogleSheetsManager:
         })).strip("'")
     
 
+    async def load_metadata(self) -> None:
+        """Загрузка метаданных схемы БД и списка листов в кэш.
+
+        Кэш колонок сбрасывается только при смене отпечатка схемы БД.
+        """
+        fingerprint = await self._get_schema_fingerprint()
+        if fingerprint != self._schema_fingerprint:
+            self._column_types.clear()
+            self._column_constraints.clear()
+            self._row_converters.clear()
+            self._schema_fingerprint = fingerprint
+            logger.info(f"Кэш схемы БД сброшен, отпечаток {fingerprint[:12]}")
+        await self._refresh_sheet_ids()
+
+    def invalidate_metadata(self) -> None:
+        """Принудительный сброс кэша метаданных"""
+        self._column_types.clear()
+        self._column_constraints.clear()
+        self._row_converters.clear()
+        self._sheet_ids.clear()
+        self._schema_fingerprint = None
+
+    async def _get_schema_fingerprint(self) -> str:
+        """Отпечаток схемы БД по определениям объектов в sqlite_master"""
+        async with self.db.execute(
+            "SELECT type, name, sql FROM sqlite_master ORDER BY type, name"
+        ) as cursor:
+            rows = await cursor.fetchall()
+        digest = hashlib.sha256()
+        for row in rows:
+            digest.update('|'.join(str(value) for value in row).encode('utf-8'))
+        return digest.hexdigest()
+
+    async def _refresh_sheet_ids(self) -> None:
+        """Загрузка соответствия названий листов и их ID"""
+        spreadsheet = await self._execute_api_call(
+            self.sheets.get,
+            spreadsheetId=SPREADSHEET_ID,
+            includeGridData=False
+        )
+        self._sheet_ids = {
+            sheet['properties']['title']: sheet['properties']['sheetId']
+            for sheet in spreadsheet['sheets']
+        }
+        self._protected_sheet_ids = {
+            sheet['properties']['sheetId']
+            for sheet in spreadsheet['sheets'] if sheet.get('protectedRanges')
+        }
+
     async def _get_column_constraints(self, table_name: str) -> Dict[str, List[str]]:
+        """Ограничения колонок из кэша метаданных"""
+        if table_name not in self._column_constraints:
+            self._column_constraints[table_name] = await self._load_column_constraints(table_name)
+        return self._column_constraints[table_name]
+
+    async def _load_column_constraints(self, table_name: str) -> Dict[str, List[str]]:
         """Получение ограничений с исправленным парсингом многострочных CHECK"""
         constraints = {}
         try:
@@ -162,7 +692,24 @@ class GoogleSheetsManager:
         
         return constraints
     
+    async def row_converter(self, table_name: str, headers: list) -> Callable[[list], dict]:
+        """Преобразователь строк листа в записи таблицы, собирается один раз до смены схемы"""
+        key = (table_name, tuple(headers))
+        if key not in self._row_converters:
+            self._row_converters[key] = compile_row_converter(
+                table_name, headers,
+                await self._get_column_types(table_name),
+                await self._get_column_constraints(table_name)
+            )
+        return self._row_converters[key]
+
     async def _get_column_types(self, table_name: str) -> Dict[str, str]:
+        """Типы данных колонок из кэша метаданных"""
+        if table_name not in self._column_types:
+            self._column_types[table_name] = await self._load_column_types(table_name)
+        return self._column_types[table_name]
+
+    async def _load_column_types(self, table_name: str) -> Dict[str, str]:
         """Получение типов данных колонок из схемы БД"""
         column_types = {}
         async with self.db.execute(f"PRAGMA table_info({table_name})") as cursor:
@@ -204,10 +751,11 @@ class GoogleSheetsManager:
             }
         return None
 
-    async def _apply_data_validation(self, table_name: str, constraints: Dict[str, List[str]]):
+    async def _apply_data_validation(self, table_name: str, constraints: Dict[str, List[str]],
+                                     sheet_name: Optional[str] = None):
         """Применение правил валидации к листу с учетом перевода названий таблиц"""
         # Переводим название таблицы на русский
-        sheet_name = TABLE_TRANSLATIONS.get(table_name, table_name)
+        sheet_name = sheet_name or TABLE_TRANSLATIONS.get(table_name, table_name)
         
         logger.info(f"Начало применения валидации для листа {sheet_name} с ограничениями: {constraints}")
 
@@ -230,7 +778,7 @@ class GoogleSheetsManager:
         logger.info(f"Обнаруженные типы колонок для {table_name}: {column_types}")
 
         # Получаем ID листа
-        sheet_id = await self._get_sheet_id(table_name)
+        sheet_id = await self._get_sheet_id(sheet_name)
         logger.info(f"Применение валидации к листу {sheet_name} (ID: {sheet_id})")
 
         requests = []
@@ -305,10 +853,9 @@ class GoogleSheetsManager:
         else:
             logger.warning(f"Не сгенерировано запросов на валидацию для {sheet_name}")
 
-    async def initialize_sheet(self, table_name: str) -> None:
-        """Инициализация структуры листа"""
-        # Переводим название таблицы на русский
-        sheet_name = TABLE_TRANSLATIONS.get(table_name, table_name)
+    async def initialize_sheet(self, table_name: str, sheet_name: Optional[str] = None) -> None:
+        """Инициализация структуры листа (по умолчанию - рабочего листа таблицы)"""
+        sheet_name = sheet_name or self.default_sheet_name(table_name)
         await self.ensure_sheet_exists(sheet_name)
         # Получаем метаданные таблицы
         async with self.db.execute(f"PRAGMA table_info({table_name})") as cursor:
@@ -326,7 +873,7 @@ class GoogleSheetsManager:
         await self._execute_api_call(
             self.sheets.values().update,
             spreadsheetId=SPREADSHEET_ID,
-            range=f"{sheet_name}!A1",
+            range=a1_range(sheet_name, "A1"),
             valueInputOption='USER_ENTERED',
             body={'values': [translated_columns]}
         )
@@ -363,107 +910,413 @@ class GoogleSheetsManager:
         
         # Применяем валидацию
         constraints = await self._get_column_constraints(table_name)
-        await self._apply_data_validation(table_name, constraints)
+        await self._apply_data_validation(table_name, constraints, sheet_name)
+
+    def is_partitioned(self, table_name: str) -> bool:
+        return table_name in SHEETS_PARTITIONED_TABLES
+
+    def default_sheet_name(self, table_name: str) -> str:
+        """Лист для повседневной работы: у помесячных таблиц - лист текущего месяца"""
+        if self.is_partitioned(table_name):
+            return partition_sheet_name(table_name, current_partition_month())
+        return TABLE_TRANSLATIONS.get(table_name, table_name)
+
+    def sheet_name_for_row(self, table_name: str, row: dict) -> str:
+        """Лист, в котором должна находиться строка таблицы"""
+        if not self.is_partitioned(table_name):
+            return TABLE_TRANSLATIONS.get(table_name, table_name)
+        value = row.get(SHEETS_PARTITIONED_TABLES[table_name])
+        if isinstance(value, datetime):
+            month = value.strftime('%Y-%m')
+        elif isinstance(value, str) and re.match(r'^\d{4}-\d{2}', value):
+            month = value[:7]
+        else:
+            month = current_partition_month()
+        return partition_sheet_name(table_name, month)
+
+    def partition_filter(self, table_name: str, sheet_name: str) -> tuple:
+        """Условие WHERE и параметры для строк таблицы, относящихся к листу"""
+        partition = parse_partition_sheet(sheet_name)
+        if not partition or partition[0] != table_name:
+            return '', ()
+        return f"{self._partition_month_sql(table_name)} = ?", (partition[1],)
+
+    @staticmethod
+    def _partition_month_sql(table_name: str) -> str:
+        # Пустая или нераспознанная дата относит строку к текущему месяцу, как sheet_name_for_row
+        column = SHEETS_PARTITIONED_TABLES[table_name]
+        return f"COALESCE(strftime('%Y-%m', {column}), strftime('%Y-%m', 'now'))"
+
+    async def partition_sheets(self, table_name: str) -> List[str]:
+        """Листы помесячной таблицы: месяцы с данными в БД и уже созданные листы"""
+        async with self.db.execute(
+            f"SELECT DISTINCT {self._partition_month_sql(table_name)} FROM {table_name}"
+        ) as cursor:
+            months = {row[0] for row in await cursor.fetchall() if row[0]}
+        months.add(current_partition_month())
+        for sheet_name in self._sheet_ids:
+            partition = parse_partition_sheet(sheet_name)
+            if partition and partition[0] == table_name:
+                months.add(partition[1])
+        return [partition_sheet_name(table_name, month) for month in sorted(months)]
+
+    async def _ensure_partition_sheet(self, table_name: str, sheet_name: str) -> None:
+        """Создание листа месяца при первой записи в него"""
+        if sheet_name in self._sheet_ids:
+            return
+        async with self._partition_lock:
+            if sheet_name not in self._sheet_ids:
+                logger.info(f"Создаём лист {sheet_name}")
+                await self.initialize_sheet(table_name, sheet_name)
+
+    async def _locate_rows(self, table_name: str, record_ids: List[str]) -> Dict[str, List[str]]:
+        """Листы помесячной таблицы, в которых находятся записи.
+
+        Листы ищутся по индексу строк. Записи, которых в индексе нет, ищутся
+        по колонке ID листов, индекс которых не построен полностью в этом
+        процессе (как при промахе в _find_rows).
+        """
+        if not record_ids:
+            return {}
+        async with self.db.execute(
+            f"SELECT sheet_name, record_id FROM sheet_row_index "
+            f"WHERE sheet_name LIKE ? AND record_id IN ({','.join(['?'] * len(record_ids))})",
+            (f"{TABLE_TRANSLATIONS[table_name]} %", *record_ids)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        located = {}
+        for sheet_name, record_id in rows:
+            partition = parse_partition_sheet(sheet_name)
+            if partition and partition[0] == table_name:
+                located.setdefault(sheet_name, []).append(record_id)
+
+        missing = set(record_ids) - {record_id for ids in located.values() for record_id in ids}
+        if missing:
+            candidates = [
+                sheet_name for sheet_name in list(self._sheet_ids)
+                if sheet_name not in self._indexed_sheets
+                and (parse_partition_sheet(sheet_name) or ('',))[0] == table_name
+            ]
+            for sheet_name in candidates:
+                index = await self.rebuild_row_index(sheet_name)
+                found = [record_id for record_id in missing if record_id in index]
+                if found:
+                    located.setdefault(sheet_name, []).extend(found)
+                    missing.difference_update(found)
+                if not missing:
+                    break
+        return located
+
+    async def protect_closed_partitions(self) -> int:
+        """Защита листов закрытых месяцев от ручного редактирования"""
+        requests = []
+        protected = []
+        for sheet_name, sheet_id in self._sheet_ids.items():
+            partition = parse_partition_sheet(sheet_name)
+            if not partition or not is_closed_partition(partition[1]) or sheet_id in self._protected_sheet_ids:
+                continue
+            protected_range = {
+                'range': {'sheetId': sheet_id},
+                'description': 'Месяц закрыт: изменения вносятся только через бот',
+            }
+            if self.creds is not None:
+                # Редактировать может только сервисный аккаунт синхронизации
+                protected_range['editors'] = {'users': [self.creds.service_account_email]}
+            else:
+                protected_range['warningOnly'] = True
+            requests.append({'addProtectedRange': {'protectedRange': protected_range}})
+            protected.append(sheet_id)
+
+        if requests:
+            await self._execute_api_call(
+                self.sheets.batchUpdate,
+                spreadsheetId=SPREADSHEET_ID,
+                body={'requests': requests}
+            )
+            self._protected_sheet_ids.update(protected)
+            logger.info(f"Защищено листов закрытых месяцев: {len(requests)}")
+        return len(requests)
 
     async def sync_single_row(self, table_name: str, row_data: dict, action_type: str):
         """Синхронизация одной строки с учетом типа действия"""
-        if action_type == "DELETE":
-            return
         try:
-            logger.info(f"Syncing single row for {row_data}")
+            await self.sync_rows(table_name, [{**row_data, 'action_type': action_type}])
+        except HttpError as e:
+            logger.error(f"Google Sheets API Error: {str(e)}")
+
+    async def sync_rows(self, table_name: str, rows: List[dict]) -> None:
+        """Синхронизация набора изменений одной таблицы как единого целого.
+
+        Обновления, добавления и удаления строк уходят через накопитель
+        записей, поэтому вся порция превращается в несколько вызовов API.
+        Ошибки API пробрасываются вызывающему, чтобы изменения
+        подтверждались только после успешной отправки.
+        """
+        id_column = next(iter(COLUMN_TRANSLATIONS.get(table_name, {})))
+        upserts = [row for row in rows if row.get('action_type') != 'DELETE']
+        deleted_ids = [str(row[id_column]) for row in rows if row.get('action_type') == 'DELETE']
+        logger.info(f"Syncing {len(upserts)} rows and {len(deleted_ids)} deletions for {table_name}")
+
+        if self.is_partitioned(table_name):
+            # Строки раскладываются по листам своих месяцев
+            upserts_by_sheet: Dict[str, List[dict]] = {}
+            for row in upserts:
+                upserts_by_sheet.setdefault(self.sheet_name_for_row(table_name, row), []).append(row)
+            target_sheet = {
+                str(row[id_column]): sheet_name
+                for sheet_name, sheet_rows in upserts_by_sheet.items() for row in sheet_rows
+            }
+            # Удаляемые строки и строки, сменившие месяц, убираются с прежних листов
+            deletes_by_sheet: Dict[str, List[str]] = {}
+            located = await self._locate_rows(table_name, deleted_ids + list(target_sheet))
+            for sheet_name, record_ids in located.items():
+                stale_ids = [record_id for record_id in record_ids if target_sheet.get(record_id) != sheet_name]
+                if stale_ids:
+                    deletes_by_sheet[sheet_name] = stale_ids
+        else:
             sheet_name = TABLE_TRANSLATIONS.get(table_name, table_name)
-            column_mapping = COLUMN_TRANSLATIONS.get(table_name, {})
-            column_types = await self._get_column_types(table_name)
+            upserts_by_sheet = {sheet_name: upserts} if upserts else {}
+            deletes_by_sheet = {sheet_name: deleted_ids} if deleted_ids else {}
+
+        # Удаления и записи попадают в один пакет накопителя
+        await asyncio.gather(
+            *(self._upsert_rows(table_name, sheet_rows, sheet_name)
+              for sheet_name, sheet_rows in upserts_by_sheet.items()),
+            *(self.delete_rows(table_name, record_ids, sheet_name)
+              for sheet_name, record_ids in deletes_by_sheet.items())
+        )
+
+    async def _upsert_rows(self, table_name: str, rows: List[dict], sheet_name: str) -> None:
+        """Обновление строк листа и добавление отсутствующих"""
+        if not rows:
+            return
+        if self.is_partitioned(table_name):
+            await self._ensure_partition_sheet(table_name, sheet_name)
+        id_column = next(iter(COLUMN_TRANSLATIONS.get(table_name, {})))
+        column_types = await self._get_column_types(table_name)
+        prepared = {
+            str(row[id_column]): self._format_row(table_name, row, column_types)
+            for row in rows
+        }
+
+        pending = prepared
+        for attempt in range(1, SHEETS_LAYOUT_ATTEMPTS + 1):
+            # Номера строк берём из индекса, без загрузки всего листа
+            version = self.writer.layout_version(sheet_name)
+            positions = await self._find_rows(sheet_name, list(pending))
+
+            update_ids = [record_id for record_id in pending if record_id in positions]
+            new_ids = [record_id for record_id in pending if record_id not in positions]
+            results = await asyncio.gather(
+                *(self.writer.update(sheet_name, positions[record_id], pending[record_id], version)
+                  for record_id in update_ids),
+                *(self.writer.append(sheet_name, pending[record_id]) for record_id in new_ids),
+                return_exceptions=True
+            )
+
+            # Запоминаем позиции добавленных строк
+            appended = {
+                record_id: row_number
+                for record_id, row_number in zip(new_ids, results[len(update_ids):])
+                if not isinstance(row_number, Exception)
+            }
+            if all(appended.values()):
+                await self._store_row_index(sheet_name, appended)
+            else:
+                self.invalidate_row_index(sheet_name)
+
+            errors = [result for result in results if isinstance(result, Exception)]
+            stale = [
+                record_id for record_id, result in zip(update_ids, results)
+                if isinstance(result, StaleRowPositionError)
+            ]
+            if len(errors) > len(stale):
+                raise next(e for e in errors if not isinstance(e, StaleRowPositionError))
+            if not stale:
+                break
+            # Между поиском и записью в листе удалялись строки - ищем позиции заново
+            pending = {record_id: prepared[record_id] for record_id in stale}
+        else:
+            raise StaleRowPositionError(f"Не удалось записать строки листа {sheet_name}: структура постоянно меняется")
+
+    async def format_row(self, table_name: str, row_data: dict) -> list:
+        """Значения строки таблицы в том виде, в котором они пишутся в лист"""
+        return self._format_row(table_name, row_data, await self._get_column_types(table_name))
+
+    def _format_row(self, table_name: str, row_data: dict, column_types: Dict[str, str]) -> list:
+        """Преобразование строки БД в список значений для листа"""
+        column_mapping = COLUMN_TRANSLATIONS.get(table_name, {})
+        formatted_data = {}
+        for col_en, col_ru in column_mapping.items():
+            value = row_data.get(col_en)
             
-            # Преобразование данных перед отправкой
-            formatted_data = {}
-            for col_en, col_ru in column_mapping.items():
-                value = row_data.get(col_en)
+            if column_types.get(col_en) == 'DATETIME' and value:
+                # Универсальное преобразование даты
+                if isinstance(value, str):
+                    try:
+                        # Парсим из строки ISO формата
+                        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+                    except ValueError:
+                        # Парсим из SQLite формата (если используется)
+                        dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+                elif isinstance(value, datetime):
+                    dt = value
+                else:
+                    dt = None
                 
-                if column_types.get(col_en) == 'DATETIME' and value:
-                    # Универсальное преобразование даты
-                    if isinstance(value, str):
-                        try:
-                            # Парсим из строки ISO формата
-                            dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                        except ValueError:
-                            # Парсим из SQLite формата (если используется)
-                            dt = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
-                    elif isinstance(value, datetime):
-                        dt = value
-                    else:
-                        dt = None
-                    
-                    if dt:
-                        # Форматируем для Google Sheets
-                        formatted_data[col_en] = dt.strftime("%d.%m.%Y %H:%M:%S")
-                    else:
-                        formatted_data[col_en] = ''
+                if dt:
+                    # Форматируем для Google Sheets
+                    formatted_data[col_en] = dt.strftime("%d.%m.%Y %H:%M:%S")
                 else:
-                    formatted_data[col_en] = value
+                    formatted_data[col_en] = ''
+            else:
+                formatted_data[col_en] = value
 
-            # Остальная часть функции остается без изменений
-            values = [formatted_data.get(col) for col in column_mapping.keys()]
-            
-            # Проверяем существование строки с таким ID
-            result = await self._execute_api_call(
-                self.sheets.values().get,
-                spreadsheetId=SPREADSHEET_ID,
-                range=f"{sheet_name}!A:Z"
-            )
-            rows = result.get('values', [])
-            
-            # Ищем индекс строки с совпадающим ID (первый столбец)
-            row_index = next(
-                (i+1 for i, row in enumerate(rows[1:]) 
-                 if row and row[0] == str(row_data[next(iter(column_mapping.keys()))])),
-                None
+        return [formatted_data.get(col) for col in column_mapping.keys()]
+
+    @staticmethod
+    def _parse_first_row(updated_range: str) -> Optional[int]:
+        """Номер первой строки из диапазона вида 'Лист'!A12:R14"""
+        match = re.search(r'![A-Z]+(\d+)', updated_range)
+        return int(match.group(1)) if match else None
+
+    async def _find_rows(self, sheet_name: str, record_ids: List[str]) -> Dict[str, int]:
+        """Поиск номеров строк листа по ID записей.
+
+        Номера берутся из индекса и проверяются чтением ячеек ID через
+        накопитель (проверки одновременных вызовов - один batchGet).
+        Если индекс устарел, он перестраивается по колонке ID.
+        Возвращает позиции только найденных записей.
+        """
+        async with self.db.execute(
+            f"SELECT record_id, row_number FROM sheet_row_index "
+            f"WHERE sheet_name = ? AND record_id IN ({','.join(['?']*len(record_ids))})",
+            (sheet_name, *record_ids)
+        ) as cursor:
+            positions = {row[0]: row[1] for row in await cursor.fetchall()}
+
+        stale = False
+        if positions:
+            cells = await self.writer.read(
+                [a1_range(sheet_name, f"A{row_number}") for row_number in positions.values()]
             )
-            
-            if row_index:
-                # Обновляем существующую строку
-                await self._execute_api_call(
-                    self.sheets.values().update,
-                    spreadsheetId=SPREADSHEET_ID,
-                    range=f"{sheet_name}!A{row_index+1}",
-                    valueInputOption='USER_ENTERED',
-                    body={'values': [values]}
-                )
-            else:
-                # Добавляем новую строку
-                await self._execute_api_call(
-                    self.sheets.values().append,
-                    spreadsheetId=SPREADSHEET_ID,
-                    range=f"{sheet_name}!A:A",
-                    valueInputOption='USER_ENTERED',
-                    body={'values': [values]}
-                )
+            for record_id, cell in zip(positions, cells):
+                if not (cell and cell[0] and cell[0][0] == record_id):
+                    stale = True
+                    break
 
-        except HttpError as e:
-            logger.error(f"Google Sheets API Error: {str(e)}")
+        if stale:
+            logger.warning(f"Индекс строк листа {sheet_name} устарел, перестраиваем")
+        elif len(positions) == len(record_ids) or sheet_name in self._indexed_sheets:
+            # Индекс актуален, отсутствующих записей в листе нет
+            return positions
 
-    async def delete_row(self, sheet_name: str, row_data: dict):
-        """Удаление строки из таблицы"""
-        try:
-            sheet_id = await self._get_sheet_id(sheet_name)
-            await self._execute_api_call(
-                self.sheets.batchUpdate,
-                spreadsheetId=SPREADSHEET_ID, 
-                body={
-                    "requests": [{
-                        "deleteDimension": {
-                            "range": {
-                                "sheetId": sheet_id,
-                                "dimension": "ROWS",
-                                "startIndex": row_data['audit_id'],
-                                "endIndex": row_data['audit_id'] + 1
-                            }
-                        }
-                    }]
-                }
+        index = await self.rebuild_row_index(sheet_name)
+        return {record_id: index[record_id] for record_id in record_ids if record_id in index}
+
+    async def rebuild_row_index(self, sheet_name: str) -> Dict[str, int]:
+        """Перестроение индекса ID -> номер строки по колонке ID листа"""
+        result = await self._execute_api_call(
+            self.sheets.values().get,
+            spreadsheetId=SPREADSHEET_ID,
+            range=a1_range(sheet_name, "A:A")
+        )
+        return await self.index_sheet_rows(sheet_name, result.get('values', []))
+
+    async def index_sheet_rows(self, sheet_name: str, rows: List[List[str]]) -> Dict[str, int]:
+        """Построение индекса по уже загруженным строкам листа (с заголовком)"""
+        index = {
+            str(row[0]): row_number
+            for row_number, row in enumerate(rows, start=1)
+            if row_number > 1 and row and row[0]
+        }
+        await self._replace_row_index(sheet_name, index)
+        return index
+
+    async def _replace_row_index(self, sheet_name: str, index: Dict[str, int]) -> None:
+        """Полная замена индекса строк листа"""
+        async with self.db.execute(
+            "DELETE FROM sheet_row_index WHERE sheet_name = ?",
+            (sheet_name,)
+        ):
+            pass
+        await self._store_row_index(sheet_name, index)
+        self._indexed_sheets.add(sheet_name)
+        logger.info(f"Индекс строк листа {sheet_name} перестроен: {len(index)} записей")
+
+    async def _store_row_index(self, sheet_name: str, index: Dict[str, int]) -> None:
+        """Сохранение позиций строк в индексе"""
+        if not index:
+            return
+        async with self.db.executemany(
+            "INSERT OR REPLACE INTO sheet_row_index (sheet_name, record_id, row_number) VALUES (?, ?, ?)",
+            [(sheet_name, record_id, row_number) for record_id, row_number in index.items()]
+        ):
+            pass
+
+    def invalidate_row_index(self, sheet_name: str) -> None:
+        """Пометить индекс листа как ненадёжный (строки могли добавить вручную)"""
+        self._indexed_sheets.discard(sheet_name)
+
+    async def delete_rows(self, table_name: str, record_ids: List[str],
+                          sheet_name: Optional[str] = None) -> int:
+        """Удаление строк записей из листа.
+
+        Позиции берутся из индекса строк, удаление идёт через накопитель:
+        все удаления пакета - один batchUpdate с диапазонами deleteDimension.
+        Записей, которых нет в листе, удаление не касается. Для помесячной
+        таблицы без явного листа записи ищутся по индексу во всех её листах.
+        Возвращает количество удалённых строк.
+        """
+        if not record_ids:
+            return 0
+        if sheet_name is None and self.is_partitioned(table_name):
+            located = await self._locate_rows(table_name, [str(record_id) for record_id in record_ids])
+            counts = await asyncio.gather(
+                *(self.delete_rows(table_name, ids, sheet) for sheet, ids in located.items())
             )
-        except HttpError as e:
-            logger.error(f"Google Sheets Delete Error: {str(e)}")
+            return sum(counts)
+        sheet_name = sheet_name or TABLE_TRANSLATIONS.get(table_name, table_name)
+        pending = [str(record_id) for record_id in record_ids]
+        deleted = 0
+
+        for attempt in range(1, SHEETS_LAYOUT_ATTEMPTS + 1):
+            version = self.writer.layout_version(sheet_name)
+            positions = await self._find_rows(sheet_name, pending)
+            found = list(positions)
+            results = await asyncio.gather(
+                *(self.writer.delete(sheet_name, positions[record_id], version) for record_id in found),
+                return_exceptions=True
+            )
+            errors = [result for result in results if isinstance(result, Exception)]
+            pending = [
+                record_id for record_id, result in zip(found, results)
+                if isinstance(result, StaleRowPositionError)
+            ]
+            deleted += len(found) - len(errors)
+            if len(errors) > len(pending):
+                raise next(e for e in errors if not isinstance(e, StaleRowPositionError))
+            if not pending:
+                break
+        else:
+            raise StaleRowPositionError(f"Не удалось удалить строки листа {sheet_name}: структура постоянно меняется")
+
+        logger.info(f"Из листа {sheet_name} удалено {deleted} строк")
+        return deleted
+
+    async def _shift_row_index(self, sheet_name: str, spans: List[tuple]) -> None:
+        """Учёт удалённых диапазонов строк в индексе: записи удаляются, нижние строки сдвигаются"""
+        async with self.db.transaction() as conn:
+            for start, end in reversed(spans):
+                await conn.execute(
+                    "DELETE FROM sheet_row_index WHERE sheet_name = ? AND row_number BETWEEN ? AND ?",
+                    (sheet_name, start, end)
+                )
+                await conn.execute(
+                    "UPDATE sheet_row_index SET row_number = row_number - ? "
+                    "WHERE sheet_name = ? AND row_number > ?",
+                    (end - start + 1, sheet_name, end)
+                )
 
     def _convert_row_values(self, row_data: dict) -> list:
         """Конвертация данных строки для Google Sheets"""
@@ -472,90 +1325,495 @@ class GoogleSheetsManager:
             for col in COLUMN_TRANSLATIONS.get(row_data['table_name'], {}).keys()
         ]
     # Обновленная функция для синхронизации данных
-    async def sync_data_to_sheet(self, table_name: str) -> None:
-        """Синхронизация данных с предварительной очисткой листа"""
-        # Переводим название таблицы на русский
-        
-        sheet_name = TABLE_TRANSLATIONS.get(table_name, table_name)
-        
-        await self._execute_api_call(
-            self.sheets.values().clear,
-            spreadsheetId=SPREADSHEET_ID,
-            range=f"{sheet_name}!A2:R"
-        )
-        # Получаем типы колонок и маппинг
+    async def sync_data_to_sheet(self, table_name: str, resume: bool = False) -> None:
+        """Синхронизация данных с предварительной очисткой листа.
+
+        Таблица читается и записывается порциями по EXPORT_CHUNK_SIZE строк
+        (по возрастанию ID), поэтому память ограничена размером порции.
+        После каждой порции сохраняется контрольная точка; при resume=True
+        прерванная выгрузка продолжается с неё без повторной очистки листа,
+        если точка сохранена не раньше EXPORT_RESUME_MAX_AGE секунд назад.
+        Помесячная таблица выгружается в листы своих месяцев по очереди.
+        """
+        if self.is_partitioned(table_name):
+            for sheet_name in await self.partition_sheets(table_name):
+                await self._ensure_partition_sheet(table_name, sheet_name)
+                await self._export_sheet(table_name, sheet_name, resume)
+            return
+        await self._export_sheet(table_name, TABLE_TRANSLATIONS.get(table_name, table_name), resume)
+
+    async def _export_sheet(self, table_name: str, sheet_name: str, resume: bool) -> None:
+        """Порционная выгрузка строк таблицы, относящихся к листу"""
+        partition_where, partition_params = self.partition_filter(table_name, sheet_name)
         column_types = await self._get_column_types(table_name)
         column_mapping = COLUMN_TRANSLATIONS.get(table_name, {})
-        
-        # Получаем данные
-        async with self.db.execute(f"SELECT * FROM {table_name}") as cursor:
-            data = await cursor.fetchall()
-
-        # Преобразуем данные
-        values = []
-        for row in data:
-            converted_row = []
-            for idx, (col_name, value) in enumerate(zip(column_mapping.keys(), row)):
-                if column_types.get(col_name) == 'DATETIME':
-                    if isinstance(value, datetime):
-                        converted_value = value.strftime("%d.%m.%Y %H:%M:%S")
-                    elif isinstance(value, str):
-                        converted_value = datetime.fromisoformat(value).strftime("%d.%m.%Y %H:%M:%S")
-                    else:
-                        converted_value = ""
-                else:
-                    converted_value = value
-                converted_row.append(converted_value)
-            values.append(converted_row)
+        id_column = next(iter(column_mapping))
+
+        checkpoint = await self._get_export_checkpoint(sheet_name) if resume else None
+        # Пока лист переписывается, индекс строк не считается полным,
+        # а позиции, найденные до перезаписи, недействительны
+        self.invalidate_row_index(sheet_name)
+        self.writer.bump_layout(sheet_name)
+        if checkpoint:
+            last_id, next_row = checkpoint
+            logger.info(f"Продолжаем выгрузку {table_name} после ID {last_id} со строки {next_row}")
+        else:
+            await self._execute_api_call(
+                self.sheets.values().clear,
+                spreadsheetId=SPREADSHEET_ID,
+                range=a1_range(sheet_name, "A2:R")
+            )
+            await self._clear_sheet_bookkeeping(sheet_name)
+            last_id, next_row = None, 2
+
+        while True:
+            # Постраничное чтение по ключу: каждая порция - отдельный короткий запрос
+            conditions = [partition_where] if partition_where else []
+            params = list(partition_params)
+            if last_id is not None:
+                conditions.append(f"{id_column} > ?")
+                params.append(last_id)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            async with self.db.execute(
+                f"SELECT {', '.join(column_mapping)} FROM {table_name} {where} "
+                f"ORDER BY {id_column} LIMIT ?",
+                (*params, EXPORT_CHUNK_SIZE)
+            ) as cursor:
+                chunk = await self.db.fetchall(cursor)
+
+            if not chunk:
+                break
+
+            values = [self._format_row(table_name, row, column_types) for row in chunk]
+            await self._execute_api_call(
+                self.sheets.values().update,
+                spreadsheetId=SPREADSHEET_ID,
+                range=a1_range(sheet_name, f"A{next_row}"),
+                valueInputOption='USER_ENTERED',
+                body={'values': values}
+            )
+
+            # Строки записаны подряд, индекс известен без чтения листа
+            record_ids = [str(row[id_column]) for row in chunk]
+            await self._store_row_index(
+                sheet_name,
+                {record_id: next_row + offset for offset, record_id in enumerate(record_ids)}
+            )
+
+            last_id = chunk[-1][id_column]
+            next_row += len(chunk)
+            await self._save_export_checkpoint(sheet_name, last_id, next_row)
+
+            if len(chunk) < EXPORT_CHUNK_SIZE:
+                break
+
+        await self._delete_export_checkpoint(sheet_name)
+        self._indexed_sheets.add(sheet_name)
+        logger.info(f"Выгрузка {table_name} в лист {sheet_name} завершена: {next_row - 2} строк")
+
+    async def _clear_sheet_bookkeeping(self, sheet_name: str) -> None:
+        """Сброс индекса строк и состояния блоков листа перед полной перезаписью"""
+        for table in ('sheet_row_index', 'sheet_block_checksums'):
+            async with self.db.execute(
+                f"DELETE FROM {table} WHERE sheet_name = ?",
+                (sheet_name,)
+            ):
+                pass
+
+    async def _get_export_checkpoint(self, sheet_name: str) -> Optional[tuple]:
+        """Свежая контрольная точка прерванной выгрузки: (последний ID, следующая строка)"""
+        async with self.db.execute(
+            "SELECT last_record_id, next_row, updated_at >= datetime('now', ?) "
+            "FROM sheet_export_checkpoints WHERE sheet_name = ?",
+            (f"-{EXPORT_RESUME_MAX_AGE} seconds", sheet_name)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row and not row[2]:
+            logger.info(f"Контрольная точка выгрузки листа {sheet_name} устарела, выгружаем лист заново")
+            return None
+        return (row[0], row[1]) if row else None
+
+    async def _save_export_checkpoint(self, sheet_name: str, last_record_id: int, next_row: int) -> None:
+        async with self.db.execute(
+            "INSERT OR REPLACE INTO sheet_export_checkpoints (sheet_name, last_record_id, next_row) "
+            "VALUES (?, ?, ?)",
+            (sheet_name, last_record_id, next_row)
+        ):
+            pass
+
+    async def _delete_export_checkpoint(self, sheet_name: str) -> None:
+        async with self.db.execute(
+            "DELETE FROM sheet_export_checkpoints WHERE sheet_name = ?",
+            (sheet_name,)
+        ):
+            pass
+
+    async def _load_table_rows(self, table_name: str, sheet_name: Optional[str] = None) -> Dict[str, list]:
+        """Строки таблицы (для помесячного листа - только его месяца) в формате листа, по ID записи"""
+        column_types = await self._get_column_types(table_name)
+        column_mapping = COLUMN_TRANSLATIONS.get(table_name, {})
+        id_column = next(iter(column_mapping))
+        where, params = self.partition_filter(table_name, sheet_name) if sheet_name else ('', ())
+
+        async with self.db.execute(
+            f"SELECT {', '.join(column_mapping)} FROM {table_name} "
+            f"{'WHERE ' + where if where else ''} ORDER BY {id_column}",
+            params
+        ) as cursor:
+            data = await self.db.fetchall(cursor)
+
+        return {
+            str(row[id_column]): self._format_row(table_name, row, column_types)
+            for row in data
+        }
+
+    @staticmethod
+    def _row_hash(values: list) -> str:
+        """Хэш значений в том виде, в котором они уходят в лист (строк блока)"""
+        payload = json.dumps(values, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    async def reconcile_table(self, table_name: str) -> Dict[str, int]:
+        """Сверка таблицы с листами по контрольным суммам блоков строк.
+
+        Лист делится на блоки по SHEETS_CHECKSUM_BLOCK_ROWS строк. Для каждого
+        блока скрытый лист SHEETS_CHECKSUM_SHEET считает формулой сумму со
+        стороны таблицы, а со стороны БД хэш считается по индексу строк.
+        Скачиваются и исправляются только блоки, у которых с прошлой сверки
+        изменилась сумма в листе или хэш в БД; остальное читается одним
+        запросом к листу сумм.
+        """
+        sheet_names = (
+            await self.partition_sheets(table_name) if self.is_partitioned(table_name)
+            else [TABLE_TRANSLATIONS.get(table_name, table_name)]
+        )
+        column_count = len(COLUMN_TRANSLATIONS[table_name])
+        checksums = await self._read_block_checksums()
+        totals = {'blocks': 0, 'checked': 0, 'updated': 0, 'appended': 0, 'deleted': 0}
+        verified = {}
+        for sheet_name in sheet_names:
+            if self.is_partitioned(table_name):
+                await self._ensure_partition_sheet(table_name, sheet_name)
+            counts, db_hashes = await self._reconcile_sheet(table_name, sheet_name, checksums.get(sheet_name, {}))
+            for key, count in counts.items():
+                totals[key] += count
+            if db_hashes is not None:
+                verified[sheet_name] = db_hashes
+
+        # Проверенные блоки запоминаются со свежими суммами: их могли изменить исправления
+        if totals['checked']:
+            checksums = await self._read_block_checksums()
+        for sheet_name, db_hashes in verified.items():
+            await self._store_block_state(sheet_name, {
+                block: checksum
+                for block, (checksum, layout, _) in checksums.get(sheet_name, {}).items()
+                if layout == self._block_layout(block, column_count)
+            }, db_hashes)
+        logger.info(f"Сверка {table_name} по блокам: {totals}")
+        return totals
+
+    async def _reconcile_sheet(self, table_name: str, sheet_name: str, sheet_checksums: Dict[int, tuple]) -> tuple:
+        """Исправление изменившихся блоков одного листа.
+
+        Формулы блоков, диапазон которых сдвинулся (строки листа удаляли или
+        вставляли) или не покрывает все колонки, переписываются, а сами
+        блоки проверяются. Возвращает счётчики и хэши блоков со стороны БД
+        после исправлений (None, если не все исправления дошли до листа).
+        """
+        column_mapping = COLUMN_TRANSLATIONS[table_name]
+        id_column = next(iter(column_mapping))
+        last_column = chr(ord('A') + len(column_mapping) - 1)
+        current = await self._load_table_rows(table_name, sheet_name)
+        index = await self._load_row_index(sheet_name)
+
+        # Блоки с запасом в один: туда попадают строки, добавленные в лист вручную
+        last_row = max([1 + len(current), *index.values()])
+        block_count = self._block_of(last_row) + 2
+        missing = [block for block in range(block_count) if block not in sheet_checksums]
+        if missing:
+            await self._add_block_formulas(sheet_name, last_column, missing)
+        drifted = {
+            block: checksum_row for block, (_, layout, checksum_row) in sheet_checksums.items()
+            if layout != self._block_layout(block, len(column_mapping))
+        }
+        if drifted:
+            await self._rewrite_block_formulas(sheet_name, last_column, drifted)
+        checksums = {
+            block: checksum for block, (checksum, _, _) in sheet_checksums.items() if block not in drifted
+        }
+
+        stored = await self._load_block_state(sheet_name)
+        db_hashes = self._block_hashes(current, index)
+        dirty = [
+            block for block in range(block_count)
+            if checksums.get(block) is None
+            or stored.get(block) != (checksums[block], db_hashes.get(block, self._row_hash([])))
+        ]
+        counts = {'blocks': block_count, 'checked': len(dirty), 'updated': 0, 'appended': 0, 'deleted': 0}
+        if not dirty:
+            return counts, db_hashes
+
+        version = self.writer.layout_version(sheet_name)
+        convert = await self.row_converter(table_name, list(column_mapping.values()))
+        to_update, to_delete, index_fixes, seen = {}, [], {}, set()
+        for first in range(0, len(dirty), SHEETS_CHECKSUM_FETCH_BLOCKS):
+            blocks = dirty[first:first + SHEETS_CHECKSUM_FETCH_BLOCKS]
+            result = await self._execute_api_call(
+                self.sheets.values().batchGet,
+                spreadsheetId=SPREADSHEET_ID,
+                ranges=[a1_range(sheet_name, f"A{self._block_first_row(block)}:{last_column}"
+                                             f"{self._block_first_row(block + 1) - 1}") for block in blocks],
+                valueRenderOption='UNFORMATTED_VALUE',
+                dateTimeRenderOption='SERIAL_NUMBER'
+            )
+            for block, value_range in zip(blocks, result.get('valueRanges', [])):
+                for offset, row in enumerate(value_range.get('values', [])):
+                    record_id = convert(row)[id_column] if row else None
+                    if record_id is None:
+                        continue  # Строки без ID не трогаем, как и индекс строк
+                    row_number = self._block_first_row(block) + offset
+                    record_id = str(record_id)
+                    if record_id not in current or record_id in seen:
+                        # Записи нет в БД (или в этом месяце), либо это повтор строки
+                        to_delete.append(row_number)
+                        continue
+                    seen.add(record_id)
+                    if index.get(record_id) != row_number:
+                        index_fixes[record_id] = row_number
+                    if not convert.matches(row, current[record_id]):
+                        to_update[record_id] = row_number
+
+        # Записи, которые по индексу стоят в проверенных блоках, но не нашлись там
+        lost = {
+            record_id for record_id, row_number in index.items()
+            if self._block_of(row_number) in dirty and record_id not in seen
+        }
+        unplaced = [record_id for record_id in current if record_id not in seen and
+                    (record_id in lost or record_id not in index)]
+        if unplaced and (lost or sheet_name not in self._indexed_sheets):
+            # Индекс неполон: позиции остальных записей берём из колонки ID
+            index = await self.rebuild_row_index(sheet_name)
+            index.update(index_fixes)
+            for record_id in unplaced:
+                if record_id in index and record_id not in seen:
+                    to_update[record_id] = index[record_id]
+            unplaced = [record_id for record_id in unplaced if record_id not in index]
+        else:
+            await self._store_row_index(sheet_name, index_fixes)
+
+        results = await asyncio.gather(
+            *(self.writer.update(sheet_name, row_number, current[record_id], version)
+              for record_id, row_number in to_update.items()),
+            *(self.writer.append(sheet_name, current[record_id]) for record_id in unplaced),
+            *(self.writer.delete(sheet_name, row_number, version) for row_number in to_delete),
+            return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        appended = dict(zip(unplaced, results[len(to_update):len(to_update) + len(unplaced)]))
+        if not errors and all(appended.values()):
+            await self._store_row_index(sheet_name, appended)
+        else:
+            self.invalidate_row_index(sheet_name)
+
+        counts.update(updated=len(to_update), appended=len(unplaced), deleted=len(to_delete))
+        if errors:
+            logger.error(f"Сверка листа {sheet_name}: не применено {len(errors)} исправлений: {errors[0]}")
+            return counts, None
+        # Строки уже загружены, после исправлений меняются только их позиции
+        return counts, self._block_hashes(current, await self._load_row_index(sheet_name))
+
+    @staticmethod
+    def _block_of(row_number: int) -> int:
+        return (row_number - 2) // SHEETS_CHECKSUM_BLOCK_ROWS
+
+    @staticmethod
+    def _block_first_row(block: int) -> int:
+        return 2 + block * SHEETS_CHECKSUM_BLOCK_ROWS
+
+    def _block_layout(self, block: int, column_count: int) -> str:
+        """Ожидаемый результат block_layout_formula для блока"""
+        return f"{self._block_first_row(block)}:{SHEETS_CHECKSUM_BLOCK_ROWS}:{column_count}"
 
-        # Записываем новые данные
+    def _block_formulas(self, sheet_name: str, last_column: str, block: int) -> list:
+        bounds = (sheet_name, self._block_first_row(block), self._block_first_row(block + 1) - 1, last_column)
+        return [block_checksum_formula(*bounds), block_layout_formula(*bounds)]
+
+    def _block_hashes(self, current: Dict[str, list], index: Dict[str, int]) -> Dict[int, str]:
+        """Хэши блоков со стороны БД: строки записей на позициях из индекса"""
+        blocks = {}
+        for record_id, row_number in index.items():
+            blocks.setdefault(self._block_of(row_number), []).append((row_number, current.get(record_id)))
+        return {block: self._row_hash(sorted(rows, key=lambda item: item[0])) for block, rows in blocks.items()}
+
+    async def _load_row_index(self, sheet_name: str) -> Dict[str, int]:
+        async with self.db.execute(
+            "SELECT record_id, row_number FROM sheet_row_index WHERE sheet_name = ?",
+            (sheet_name,)
+        ) as cursor:
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+
+    async def _ensure_checksum_sheet(self) -> None:
+        """Создание скрытого листа контрольных сумм"""
+        if SHEETS_CHECKSUM_SHEET in self._sheet_ids:
+            return
+        async with self._checksum_lock:
+            await self._refresh_sheet_ids()
+            if SHEETS_CHECKSUM_SHEET in self._sheet_ids:
+                return
+            result = await self._execute_api_call(
+                self.sheets.batchUpdate,
+                spreadsheetId=SPREADSHEET_ID,
+                body={'requests': [{'addSheet': {'properties': {'title': SHEETS_CHECKSUM_SHEET, 'hidden': True}}}]}
+            )
+            properties = result['replies'][0]['addSheet']['properties']
+            self._sheet_ids[properties['title']] = properties['sheetId']
+            await self._execute_api_call(
+                self.sheets.values().update,
+                spreadsheetId=SPREADSHEET_ID,
+                range=a1_range(SHEETS_CHECKSUM_SHEET, "A1"),
+                valueInputOption='RAW',
+                body={'values': [['Лист', 'Блок', 'Контрольная сумма', 'Диапазон']]}
+            )
+
+    async def _read_block_checksums(self) -> Dict[str, Dict[int, tuple]]:
+        """Блоки по листам: (сумма, диапазон, строка в листе сумм).
+
+        Ошибка формулы суммы даёт None - такой блок проверяется всегда.
+        """
+        await self._ensure_checksum_sheet()
+        result = await self._execute_api_call(
+            self.sheets.values().get,
+            spreadsheetId=SPREADSHEET_ID,
+            range=a1_range(SHEETS_CHECKSUM_SHEET, "A:D"),
+            valueRenderOption='UNFORMATTED_VALUE'
+        )
+        checksums = {}
+        for checksum_row, row in enumerate(result.get('values', []), start=1):
+            if checksum_row == 1 or len(row) < 2 or not isinstance(row[1], (int, float)):
+                continue
+            value = row[2] if len(row) > 2 else None
+            checksums.setdefault(str(row[0]), {})[int(row[1])] = (
+                value if isinstance(value, (int, float)) and not isinstance(value, bool) else None,
+                row[3] if len(row) > 3 else None,
+                checksum_row
+            )
+        return checksums
+
+    async def _add_block_formulas(self, sheet_name: str, last_column: str, blocks: List[int]) -> None:
         await self._execute_api_call(
-            self.sheets.values().update,
+            self.sheets.values().append,
             spreadsheetId=SPREADSHEET_ID,
-            range=f"{sheet_name}!A2",
+            range=a1_range(SHEETS_CHECKSUM_SHEET, "A:D"),
             valueInputOption='USER_ENTERED',
-            body={'values': values}
+            body={'values': [
+                [sheet_name, block, *self._block_formulas(sheet_name, last_column, block)] for block in blocks
+            ]}
         )
 
-    async def full_sync(self) -> Dict[str, str]:
-        """Полная синхронизация всех таблиц"""
-        results = {}
+    async def _rewrite_block_formulas(self, sheet_name: str, last_column: str, blocks: Dict[int, int]) -> None:
+        """Возврат формул блоков к их постоянным границам (блок -> строка в листе сумм)"""
+        logger.info(f"Диапазоны {len(blocks)} блоков листа {sheet_name} сдвинулись, переписываем формулы")
+        await self._execute_api_call(
+            self.sheets.values().batchUpdate,
+            spreadsheetId=SPREADSHEET_ID,
+            body={
+                'valueInputOption': 'USER_ENTERED',
+                'data': [
+                    {'range': a1_range(SHEETS_CHECKSUM_SHEET, f"C{checksum_row}:D{checksum_row}"),
+                     'values': [self._block_formulas(sheet_name, last_column, block)]}
+                    for block, checksum_row in blocks.items()
+                ]
+            }
+        )
+
+    async def _load_block_state(self, sheet_name: str) -> Dict[int, tuple]:
+        """Сумма листа и хэш БД каждого блока на момент последней сверки"""
+        async with self.db.execute(
+            "SELECT block, sheet_checksum, db_hash FROM sheet_block_checksums WHERE sheet_name = ?",
+            (sheet_name,)
+        ) as cursor:
+            return {row[0]: (row[1], row[2]) for row in await cursor.fetchall()}
+
+    async def _store_block_state(self, sheet_name: str, checksums: Dict[int, Optional[float]],
+                                 db_hashes: Dict[int, str]) -> None:
+        """Запоминание сверенного состояния блоков листа"""
+        async with self.db.transaction() as conn:
+            await conn.execute("DELETE FROM sheet_block_checksums WHERE sheet_name = ?", (sheet_name,))
+            await conn.executemany(
+                "INSERT INTO sheet_block_checksums (sheet_name, block, sheet_checksum, db_hash) "
+                "VALUES (?, ?, ?, ?)",
+                [(sheet_name, block, checksum, db_hashes.get(block, self._row_hash([])))
+                 for block, checksum in checksums.items() if checksum is not None]
+            )
+
+    async def full_sync(self, concurrency: int = FULL_SYNC_CONCURRENCY) -> Dict[str, Dict]:
+        """Полная синхронизация всех таблиц.
+
+        Таблицы синхронизируются параллельно, одновременно - не более
+        concurrency штук. Возвращает по каждой таблице статус, длительность
+        в секундах и счётчики перенесённых строк.
+        """
+        # Заодно проверяем, не изменились ли схема БД и список листов
+        await self.load_metadata()
         async with self.db.execute("""SELECT name FROM sqlite_master 
                         WHERE type='table' 
                         AND name NOT LIKE 'sqlite_%' 
                         AND name NOT LIKE '%_audit'""") as cursor:
-            tables = [row[0] for row in await cursor.fetchall()]
-
-        for table in tables:
+            tables = [row[0] for row in await cursor.fetchall() if row[0] in TABLE_TRANSLATIONS]
+        if SHEETS_PARTITIONED_TABLES:
             try:
-                await self.sync_data_to_sheet(table)
-                results[table] = 'OK'
+                await self.protect_closed_partitions()
             except Exception as e:
-                results[table] = f"Error: {str(e)}"
-                logger.error(f"Sync failed for {table}: {e}")
+                logger.error(f"Не удалось защитить листы закрытых месяцев: {e}")
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def sync_table(table: str) -> Dict:
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    counts = await self.reconcile_table(table)
+                    result = {'status': 'OK', **counts}
+                except Exception as e:
+                    result = {'status': 'error', 'error': str(e)}
+                    logger.error(f"Sync failed for {table}: {e}")
+                result['duration'] = round(time.monotonic() - started, 3)
+                return result
+
+        started = time.monotonic()
+        # Полная синхронизация не должна задерживать запросы менеджеров
+        with background_priority():
+            results = dict(zip(tables, await asyncio.gather(*(sync_table(table) for table in tables))))
+        logger.info(f"Полная синхронизация завершена за {time.monotonic() - started:.2f} сек: {results}")
         return results
 
     async def _get_sheet_id(self, table_name: str) -> int:
         """Получение ID листа по названию"""
         # Переводим название таблицы на русский
         sheet_name = TABLE_TRANSLATIONS.get(table_name, table_name)
-        
-        spreadsheet = await self._execute_api_call(
-            self.sheets.get,
-            spreadsheetId=SPREADSHEET_ID,
-            includeGridData=False
-        )
-        for sheet in spreadsheet['sheets']:
-            if sheet['properties']['title'] == sheet_name:
-                return sheet['properties']['sheetId']
+
+        # Лист мог появиться после загрузки кэша - обновляем список один раз
+        if sheet_name not in self._sheet_ids:
+            await self._refresh_sheet_ids()
+        if sheet_name in self._sheet_ids:
+            return self._sheet_ids[sheet_name]
         raise ValueError(f"Sheet {sheet_name} not found")
 
-    async def get_sheet_data(self, sheet_name: str) -> List[List[str]]:
-        """Получить данные из листа"""
+    async def get_sheet_data(self, sheet_name: str, unformatted: bool = False) -> List[List[str]]:
+        """Получить данные из листа.
+
+        При unformatted=True числа приходят числами, а даты - порядковыми
+        номерами дней (SERIAL_NUMBER), без разбора отображаемого текста.
+        """
+        render = (
+            {'valueRenderOption': 'UNFORMATTED_VALUE', 'dateTimeRenderOption': 'SERIAL_NUMBER'}
+            if unformatted else {}
+        )
         result = await self._execute_api_call(
             self.sheets.values().get,
             spreadsheetId=SPREADSHEET_ID,
-            range=f"{sheet_name}!A:Z"
+            range=a1_range(sheet_name, "A:Z"),
+            **render
         )
         return result.get('values', [])
 
@@ -0,0 +1,124 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты запросов: меньшее значение обслуживается раньше
+PRIORITY_INTERACTIVE = 0  # действия менеджеров в боте
+PRIORITY_BACKGROUND = 1   # выгрузка аудита, ночная синхронизация
+
+# Приоритет наследуется всеми запросами, сделанными из текущей задачи
+request_priority = contextvars.ContextVar('sheets_request_priority', default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def background_priority():
+    """Выполнить вложенные запросы к API с фоновым приоритетом"""
+    token = request_priority.set(PRIORITY_BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 32.0,
+                  retry_after: Optional[float] = None) -> float:
+    """Задержка перед повторной попыткой.
+
+    Если сервер прислал Retry-After, ждём его плюс небольшой разброс,
+    иначе - экспоненциальная задержка с полным разбросом, чтобы
+    повторные попытки разных задач не шли синхронно.
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, 1)
+    return random.uniform(base, min(cap, base * 2 ** attempt))
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Значение заголовка Retry-After в секундах (формат с датой не поддерживается)"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Корзина токенов с очередью ожидающих по приоритету.
+
+    Токены пополняются равномерно со скоростью per_minute в минуту,
+    запас не превышает burst. Освободившийся токен получает ожидающий
+    с наивысшим приоритетом, внутри приоритета - в порядке очереди.
+    """
+
+    def __init__(self, per_minute: int, burst: Optional[int] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, per_minute // 6)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []  # куча (приоритет, порядковый номер, future)
+        self._seq = itertools.count()
+        self._wakeup = None
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self._dispatch()
+        await future
+
+    def block_for(self, seconds: float) -> None:
+        """Остановить выдачу токенов (например, после ответа 429)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():
+                # Ожидающий отменён
+                heapq.heappop(self._waiters)
+                continue
+            if now < self._blocked_until or self._tokens < 1:
+                break
+            heapq.heappop(self._waiters)
+            self._tokens -= 1
+            future.set_result(None)
+
+        if self._waiters and self._wakeup is None:
+            delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate, 0.01)
+            self._wakeup = asyncio.get_running_loop().call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self) -> None:
+        self._wakeup = None
+        self._dispatch()
+
+
+class SheetsRateLimiter:
+    """Ограничитель запросов к Google Sheets с раздельными квотами чтения и записи"""
+
+    def __init__(self, reads_per_minute: int, writes_per_minute: int):
+        self.buckets = {
+            'read': TokenBucket(reads_per_minute),
+            'write': TokenBucket(writes_per_minute),
+        }
+
+    async def acquire(self, kind: str) -> None:
+        await self.buckets[kind].acquire(request_priority.get())
+
+    def penalize(self, kind: str, seconds: float) -> None:
+        """Пауза для корзины после превышения квоты"""
+        logger.warning(f"Квота Google Sheets ({kind}) исчерпана, пауза {seconds:.1f} сек")
+        self.buckets[kind].block_for(seconds)
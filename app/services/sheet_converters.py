@@ -0,0 +1,154 @@
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from app.services.dictionary import COLUMN_TRANSLATIONS
+
+# Начало отсчёта дат Google Sheets в формате SERIAL_NUMBER
+SHEETS_EPOCH = datetime(1899, 12, 30)
+DB_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_SHEET_DATETIME_RE = re.compile(
+    r'^(?P<day>\d{2})\.(?P<month>\d{2})\.(?P<year>\d{4})'
+    r'(?:\s(?P<hour>\d{1,2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?)?$'
+)
+_INTEGER_RE = re.compile(r'^-?\d+$')
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_text(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        # Числа в текстовых колонках (размер, цвет-код) приходят без форматирования
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def parse_integer(value):
+    if _is_number(value):
+        return int(value) if float(value).is_integer() else value
+    value = parse_text(value)
+    if value is not None and _INTEGER_RE.match(value):
+        return int(value)
+    # Нераспознанное значение уходит в БД как есть: ошибку покажет ограничение схемы
+    return value
+
+
+def parse_real(value):
+    if _is_number(value):
+        return float(value)
+    value = parse_text(value)
+    if value is None:
+        return None
+    try:
+        return float(value.replace(',', '.'))
+    except ValueError:
+        return value
+
+
+def parse_datetime(value):
+    if _is_number(value):
+        # SERIAL_NUMBER: дни от 30.12.1899, дробная часть - время суток
+        moment = SHEETS_EPOCH + timedelta(days=value)
+        return (moment + timedelta(microseconds=500000)).replace(microsecond=0).strftime(DB_DATETIME_FORMAT)
+    value = parse_text(value)
+    if value is None:
+        return None
+    match = _SHEET_DATETIME_RE.match(value)
+    if match:
+        try:
+            return datetime(
+                int(match['year']), int(match['month']), int(match['day']),
+                int(match['hour'] or 0), int(match['minute'] or 0), int(match['second'] or 0)
+            ).strftime(DB_DATETIME_FORMAT)
+        except ValueError:
+            return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime(DB_DATETIME_FORMAT)
+    except ValueError:
+        return value
+
+
+def enum_parser(allowed: List[str]) -> Callable:
+    """Значение из списка допустимых, без учёта регистра и пробелов по краям"""
+    canonical = {option.lower(): option for option in allowed}
+
+    def parse_enum(value):
+        value = parse_text(value)
+        if value is None:
+            return None
+        return canonical.get(value.lower(), value)
+    return parse_enum
+
+
+_TYPE_PARSERS = {
+    'INTEGER': parse_integer,
+    'REAL': parse_real,
+    'DATETIME': parse_datetime,
+    'TEXT': parse_text,
+}
+
+
+def column_parser(column_type: str, allowed: Optional[List[str]] = None) -> Callable:
+    """Функция разбора значения ячейки для колонки с типом column_type"""
+    if allowed:
+        return enum_parser(allowed)
+    return _TYPE_PARSERS.get(column_type, parse_text)
+
+
+def compile_row_converter(table_name: str, headers: list, column_types: Dict[str, str],
+                          constraints: Dict[str, List[str]]) -> Callable[[list], dict]:
+    """Сборка преобразователя строки листа в запись таблицы.
+
+    Заголовки сопоставляются с колонками один раз; преобразователь
+    разбирает строку по позициям ячеек за один проход. Колонки,
+    которых нет в листе, получают None. convert.matches(row, other)
+    сравнивает две строки листа так, как их увидит пользователь.
+    """
+    translations = COLUMN_TRANSLATIONS[table_name]
+    by_header = {title.lower(): column for column, title in translations.items()}
+    plan = []
+    for position, header in enumerate(headers):
+        column = by_header.get(str(header).strip().lower())
+        if column:
+            plan.append((column, position, column_parser(column_types.get(column, 'TEXT'), constraints.get(column))))
+    mapped = {column for column, _, _ in plan}
+    missing = [column for column in translations if column not in mapped]
+    # Текст сравнивается дословно, числа и даты - по значению (вид задаёт формат ячейки)
+    by_value = {column for column in mapped
+                if not constraints.get(column) and column_types.get(column) in ('INTEGER', 'REAL', 'DATETIME')}
+
+    def convert(row: list) -> dict:
+        size = len(row)
+        record = dict.fromkeys(missing)
+        for column, position, parse in plan:
+            record[column] = parse(row[position]) if position < size else None
+        return record
+
+    def matches(row: list, other: list) -> bool:
+        """Выглядят ли в листе две строки (в порядке заголовков) одинаково"""
+        for column, position, parse in plan:
+            left = row[position] if position < len(row) else None
+            right = other[position] if position < len(other) else None
+            if column in by_value:
+                if parse(left) != parse(right):
+                    return False
+            elif _as_text(left) != _as_text(right):
+                return False
+        return True
+
+    convert.matches = matches
+    return convert
+
+
+def _as_text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Окно накопления правок: повторные правки строки за это время схлопываются
+INGEST_COALESCE_WINDOW = float(os.getenv('SHEETS_INGEST_WINDOW', '0.5'))  # секунды
+# Максимум правок в одной транзакции
+INGEST_BATCH_SIZE = 200
+# При переполнении очереди вебхук отвечает ошибкой, и Apps Script повторит запрос
+INGEST_MAX_QUEUE = 10000
+# Сколько ждать применения принятых правок при остановке приложения
+INGEST_DRAIN_TIMEOUT = 30  # секунды
+
+REQUIRED_FIELDS = ('sheet_name', 'num_rows', 'row_id')
+
+
+def expand_payload(payload: dict) -> List[dict]:
+    """Разбор правки диапазона на правки одиночных строк.
+
+    Правка нескольких строк приходит с полем rows: список
+    {'row_id': ..., 'entire_row': [...]} для каждой изменённой строки.
+    Запросы старого формата (без rows) возвращаются как есть.
+    """
+    if 'rows' not in payload:
+        return [payload]
+    return [
+        {'sheet_name': payload['sheet_name'], 'num_rows': 1,
+         'row_id': row['row_id'], 'entire_row': row['entire_row']}
+        for row in payload['rows']
+    ]
+
+
+class SheetsEditQueue:
+    """Очередь правок из вебхука Google Sheets.
+
+    Вебхук только ставит правку в очередь и сразу отвечает. Обработчик
+    забирает правки по порядку, ждёт INGEST_COALESCE_WINDOW, оставляет
+    последнюю правку каждой строки и передаёт пачку в apply, которая
+    применяет её одной транзакцией. Правка диапазона занимает в очереди
+    одно место, поэтому её строки всегда попадают в одну пачку.
+    При остановке (stop) приём закрывается, а уже принятые правки
+    применяются без ожидания окна.
+    """
+
+    def __init__(self, apply: Callable[[List[dict]], Awaitable]):
+        self.apply = apply
+        # Пары (время получения, правка) в порядке поступления
+        self._pending = deque()
+        self._event = asyncio.Event()
+        self._task = None
+        self._closed = False
+        self._counters = {'received': 0, 'applied': 0, 'failed': 0, 'coalesced': 0, 'rejected': 0,
+                          'failed_batches': 0}
+        self._last_lag = 0.0
+        self._max_lag = 0.0
+
+    async def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._worker_loop())
+
+    async def stop(self, timeout: float = INGEST_DRAIN_TIMEOUT) -> None:
+        """Закрытие приёма и применение уже принятых правок"""
+        self._closed = True
+        self._event.set()
+        if not self._task:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.error(f"Очередь правок не разобрана за {timeout} сек, потеряно правок: {len(self._pending)}")
+
+    def submit(self, payload: dict) -> bool:
+        """Постановка правки в очередь; False, если очередь переполнена"""
+        if 'rows' in payload:
+            missing = ['sheet_name'] if 'sheet_name' not in payload else []
+            if any('row_id' not in row or 'entire_row' not in row for row in payload['rows']):
+                missing.append('rows[].row_id/entire_row')
+        else:
+            missing = [field for field in REQUIRED_FIELDS if field not in payload]
+        if missing:
+            raise ValueError(f"В запросе нет полей: {', '.join(missing)}")
+        if self._closed:
+            self._counters['rejected'] += 1
+            logger.error("Приложение останавливается, правка из Google Sheets отклонена")
+            return False
+        if len(self._pending) >= INGEST_MAX_QUEUE:
+            self._counters['rejected'] += 1
+            logger.error("Очередь правок Google Sheets переполнена, правка отклонена")
+            return False
+        self._pending.append((time.monotonic(), payload))
+        self._counters['received'] += 1
+        self._event.set()
+        return True
+
+    async def _worker_loop(self):
+        while not (self._closed and not self._pending):
+            try:
+                batch = await self._collect_batch()
+                if not batch:
+                    continue
+                edits = self._coalesce([payload for _, payload in batch])
+                try:
+                    await self.apply(edits)
+                except Exception as e:
+                    self._counters['failed_batches'] += 1
+                    self._counters['failed'] += len(edits)
+                    logger.error(f"Ошибка применения {len(edits)} правок из Google Sheets: {str(e)}", exc_info=True)
+                else:
+                    self._counters['applied'] += len(edits)
+                self._last_lag = time.monotonic() - batch[0][0]
+                self._max_lag = max(self._max_lag, self._last_lag)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике очереди правок: {str(e)}", exc_info=True)
+                await asyncio.sleep(1)
+
+    async def _collect_batch(self) -> List[tuple]:
+        """Самая старая правка и всё, что пришло за окно накопления после неё"""
+        while not self._pending:
+            if self._closed:
+                return []
+            self._event.clear()
+            await self._event.wait()
+        wait = self._pending[0][0] + INGEST_COALESCE_WINDOW - time.monotonic()
+        if wait > 0 and len(self._pending) < INGEST_BATCH_SIZE and not self._closed:
+            await asyncio.sleep(wait)
+        return [self._pending.popleft() for _ in range(min(len(self._pending), INGEST_BATCH_SIZE))]
+
+    def _coalesce(self, payloads: List[dict]) -> List[dict]:
+        """Последняя правка каждой строки на месте её последнего появления"""
+        edits: Dict[tuple, dict] = {}
+        rows = [edit for payload in payloads for edit in expand_payload(payload)]
+        for position, payload in enumerate(rows):
+            if payload['num_rows'] == 1 and payload['row_id'] != '':
+                key = (payload['sheet_name'], str(payload['row_id']))
+            else:
+                # Массовые правки и удаления не схлопываются
+                key = ('', position)
+            if edits.pop(key, None) is not None:
+                self._counters['coalesced'] += 1
+            edits[key] = payload
+        return list(edits.values())
+
+    def metrics(self) -> dict:
+        """Глубина очереди, задержка обработки и счётчики"""
+        return {
+            'depth': len(self._pending),
+            'oldest_age': round(time.monotonic() - self._pending[0][0], 3) if self._pending else 0.0,
+            'last_lag': round(self._last_lag, 3),
+            'max_lag': round(self._max_lag, 3),
+            **self._counters,
+        }
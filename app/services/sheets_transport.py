@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+import httplib2
+from google.auth import jwt
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+TOKEN_URI = 'https://oauth2.googleapis.com/token'
+# Токен обновляем заранее, не дожидаясь истечения
+TOKEN_REFRESH_MARGIN = 300  # секунды
+
+# Методы Sheets API, которые отправляются через асинхронный транспорт
+SUPPORTED_METHODS = {
+    'sheets.spreadsheets.get',
+    'sheets.spreadsheets.batchUpdate',
+    'sheets.spreadsheets.values.get',
+    'sheets.spreadsheets.values.batchGet',
+    'sheets.spreadsheets.values.update',
+    'sheets.spreadsheets.values.append',
+    'sheets.spreadsheets.values.clear',
+    'sheets.spreadsheets.values.batchUpdate',
+}
+
+
+class AsyncSheetsTransport:
+    """Асинхронный транспорт для запросов Sheets API поверх aiohttp.
+
+    Запрос строится клиентом googleapiclient как обычно (URI, метод, тело),
+    а отправляется через общую сессию aiohttp с пулом keep-alive соединений.
+    Токен сервисного аккаунта получается и обновляется асинхронно.
+    Ошибки HTTP пробрасываются как HttpError, чтобы повторные попытки
+    и учёт квот работали так же, как для синхронного клиента.
+    """
+
+    def __init__(self, creds, connection_limit: int = 10, timeout: float = 60):
+        self.creds = creds
+        self.connection_limit = connection_limit
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._token: Optional[str] = None
+        self._token_expiry = 0.0
+        self._token_lock = asyncio.Lock()
+
+    @staticmethod
+    def supports(request) -> bool:
+        return getattr(request, 'methodId', None) in SUPPORTED_METHODS
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def _get_token(self, force_refresh: bool = False) -> str:
+        """Токен доступа сервисного аккаунта (JWT bearer grant)"""
+        async with self._token_lock:
+            if not force_refresh and self._token and time.time() < self._token_expiry - TOKEN_REFRESH_MARGIN:
+                return self._token
+
+            now = int(time.time())
+            assertion = jwt.encode(self.creds.signer, {
+                'iss': self.creds.service_account_email,
+                'scope': ' '.join(self.creds.scopes or []),
+                'aud': TOKEN_URI,
+                'iat': now,
+                'exp': now + 3600,
+            })
+            async with self._get_session().post(TOKEN_URI, data={
+                'grant_type': 'urn:ietf:params:oauth:grant-type:jwt-bearer',
+                'assertion': assertion.decode('utf-8') if isinstance(assertion, bytes) else assertion,
+            }) as response:
+                content = await response.read()
+                if response.status != 200:
+                    raise HttpError(self._http_response(response), content, uri=TOKEN_URI)
+                data = json.loads(content)
+
+            self._token = data['access_token']
+            self._token_expiry = now + int(data.get('expires_in', 3600))
+            logger.info("Токен доступа Google Sheets обновлён")
+            return self._token
+
+    async def execute(self, request) -> dict:
+        """Отправка построенного запроса googleapiclient"""
+        body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+        headers = {
+            key: value for key, value in request.headers.items()
+            if key.lower() not in ('content-length', 'authorization')
+        }
+
+        for attempt in (1, 2):
+            headers['Authorization'] = f"Bearer {await self._get_token(force_refresh=attempt > 1)}"
+            async with self._get_session().request(
+                request.method, request.uri, data=body, headers=headers
+            ) as response:
+                content = await response.read()
+                # Токен могли отозвать - получаем новый и повторяем один раз
+                if response.status == 401 and attempt == 1:
+                    continue
+                if response.status >= 400:
+                    raise HttpError(self._http_response(response), content, uri=request.uri)
+                return json.loads(content) if content else {}
+
+    @staticmethod
+    def _http_response(response: aiohttp.ClientResponse) -> httplib2.Response:
+        """Ответ в формате httplib2, который ожидает HttpError"""
+        info = {key.lower(): value for key, value in response.headers.items()}
+        info['status'] = str(response.status)
+        result = httplib2.Response(info)
+        result.reason = response.reason
+        return result
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
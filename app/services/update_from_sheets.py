@@ -1,143 +1,174 @@
-import ssl
-import asyncio
 import logging
-from datetime import datetime
+from typing import List
 logger = logging.getLogger(__name__)
 from app.database import db
 from app.services.dictionary import TABLE_TRANSLATIONS, COLUMN_TRANSLATIONS
 from app.credentials import MANAGERS_ID
 from app.bot import bot
 from app.keyboards.inline import change_google_sheet
-import re
-# Конфигурация повторных попыток
-MAX_RETRIES = 3
-RETRY_DELAY = 2  # секунды
-
-def retry(attempts: int, delay: float, exceptions: tuple):
-    def decorator(func):
-        async def wrapper(*args, **kwargs):
-            for attempt in range(1, attempts + 1):
-                try:
-                    return await func(*args, **kwargs)
-                except exceptions as e:
-                    if attempt == attempts:
-                        logger.error(f"Ошибка после {attempts} попыток: {str(e)}")
-                        raise
-                    logger.warning(f"Попытка {attempt} из {attempts} не удалась: {str(e)}. Повторная попытка через {delay} сек...")
-                    await asyncio.sleep(delay * (2 ** (attempt - 1)))  # Экспоненциальная задержка
-            return None
-        return wrapper
-    return decorator
-
-# Расширенный список исключений для сетевых проблем
-NETWORK_EXCEPTIONS = (
-    ssl.SSLError,             # Все ошибки SSL
-    TimeoutError,             # Таймауты
-    ConnectionError,          # Ошибки соединения
-    ConnectionResetError,     # Сброс соединения
-    ConnectionRefusedError,   # Отказ в соединении
-    ConnectionAbortedError,   # Прерывание соединения
-    BrokenPipeError,          # Разорванное соединение
-    OSError,                  # Общие ошибки ОС, включая сетевые
-)
-
-@retry(attempts=MAX_RETRIES, delay=RETRY_DELAY, exceptions=NETWORK_EXCEPTIONS)
-async def safe_db_operation(func, *args, **kwargs):
-    """Безопасное выполнение операций с БД с повторными попытками"""
-    try:
-        if asyncio.iscoroutinefunction(func):
-            return await func(*args, **kwargs)
-        else:
-            return func(*args, **kwargs)
-    except NETWORK_EXCEPTIONS as e:
-        logger.warning(f"Сетевая ошибка: {str(e)}. Повторная попытка...")
-        raise
+from app.services.circuit_breaker import SheetsUnavailableError
+from app.services.google_sheets import is_closed_partition, parse_partition_sheet
+from app.services.sheets_ingest import SheetsEditQueue, expand_payload
+# Размер порции строк при переносе изменений из листа в БД
+SYNC_APPLY_CHUNK_SIZE = 500
+# Сколько ID записей перечислять в сообщении об ошибках правки диапазона
+FAILURE_IDS_SHOWN = 20
 
 async def handle_google_sheets_update(request_data: dict):
     """Обработка запроса на обновление данных из Google Sheets"""
-    # ... existing code ...
+    await apply_sheet_edits(expand_payload(request_data))
+
+
+async def apply_sheet_edits(edits: List[dict]):
+    """Применение пачки правок из Google Sheets.
+
+    Правки строк (в том числе развёрнутые правки диапазонов) применяются
+    одной транзакцией, каждая под своей точкой сохранения: ошибка одной
+    правки откатывает только её. Уведомления менеджерам и откат листа
+    выполняются после фиксации.
+    """
+    row_edits = []   # (таблица, лист, ID, колонки, строка листа, значения, преобразователь)
+    mass_edits = {}  # (таблица, сообщение) -> None, без повторов
+    failures = []    # (таблица, лист, ID, ошибка)
+
+    for request_data in edits:
+        sheet_name = request_data["sheet_name"]
+        num_rows = request_data["num_rows"]
+        row_id = request_data["row_id"]
 
-    sheet_name = request_data["sheet_name"]
-    num_rows = request_data["num_rows"]
-    row_id = request_data["row_id"]
-    
-    try:
         # Находим английское название таблицы по русскому имени листа
-        table_name = next(k for k, v in TABLE_TRANSLATIONS.items() if v == sheet_name)
+        # (помесячные листы вида 'Пачки 2026-10' относятся к своей таблице)
+        partition = parse_partition_sheet(sheet_name)
+        if partition:
+            table_name = partition[0]
+        else:
+            table_name = next((k for k, v in TABLE_TRANSLATIONS.items() if v == sheet_name), None)
+        if table_name is None:
+            error_msg = f"Не найдено соответствие для листа: {sheet_name}"
+            logger.error(error_msg)
+            failures.append((sheet_name, sheet_name, str(row_id), error_msg))
+            continue
         columns = list(COLUMN_TRANSLATIONS[table_name].keys())  # Берем английские имена колонок
-        id_column = columns[0]  # Первый ключ как имя колонки ID
-        
-        if num_rows == 1:
-            try:
-                if row_id == '':
-                    logger.info("Попытка удаления строки")
-                    error_msg = f"Если была попытка удаления строки в таблице {sheet_name}\n\
-                                необходимо синхронизовать данные"
-                    await _handle_mass_edit_attempt(
-                        table_name=table_name,
-                        error_msg=error_msg
-                    )
-                    return
-                row_data = dict(zip(columns, request_data["entire_row"]))
-                # Формируем SQL-запрос, исключаем id_column из обновляемых полей
-                set_clause = ", ".join([f"{col} = ?" for col in columns if col != id_column])
-                # Заменяем пустые строки на None для NULL значений в БД
-                values = [row_data[col] if row_data[col] != '' else None for col in columns if col != id_column]
-                values.append(row_id)  # Для WHERE условия
-                logger.info(f"set_clause: {set_clause}")
-                logger.info(f"values: {values}")
-                
-                async with db.execute(
-                    f"UPDATE {table_name} SET {set_clause} WHERE {id_column} = ?",
-                    tuple(values)
-                ) as cursor:
-                    updated_rows = cursor.rowcount
-                
-                if updated_rows == 0:
-                    logger.warning(f"Запись {row_id} не найдена в таблице {table_name} \n создаем новую запись")
-                    # Формируем полный набор значений включая ID
-                    insert_values = [row_id] + values[:-1]  # Добавляем ID и убираем последний элемент (бывший WHERE param)
-                    
-                    async with db.execute(
-                        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?']*len(columns))})",
-                        tuple(insert_values)
-                    ) as cursor: 
-                        await cursor.fetchall()
-                    
-                    logger.info(f"Успешно создана новая запись {row_id} в таблице {table_name}")
-                else:
-                    logger.info(f"Успешно обновлена запись {row_id} в таблице {table_name}")
 
-            except Exception as e:
-                error_msg = f"Ошибка обновления: {str(e)}"
-                logger.error(error_msg)
-                await _handle_update_failure(
-                    table_name=table_name,
-                    record_id=str(row_id),
-                    sheet_name=sheet_name,
-                    columns=columns,
-                    error_msg=error_msg
-                )
-        else:
+        if partition and is_closed_partition(partition[1]):
+            # Закрытый месяц только для чтения: возвращаем лист к состоянию БД
+            logger.info(f"Попытка изменения закрытого листа {sheet_name}")
+            error_msg = f"Лист {sheet_name} закрыт: данные прошлых месяцев меняются только через бот"
+            if num_rows == 1 and row_id != '':
+                failures.append((table_name, sheet_name, str(row_id), error_msg))
+            else:
+                mass_edits[(table_name, error_msg)] = None
+            continue
+
+        if num_rows != 1:
+            # Запрос старого формата: строки диапазона не переданы
             logger.info("Попытка редактирования нескольких строк одновременно")
-            error_msg = "Редактирование нескольких строк одновременно\n\
-                        необходимо синхронизовать данные"
-            await _handle_mass_edit_attempt(
-                table_name=table_name,
-                error_msg=error_msg
+            mass_edits[(table_name, "Редактирование нескольких строк одновременно\n\
+                        необходимо синхронизовать данные")] = None
+            continue
+        if row_id == '':
+            logger.info("Попытка удаления строки")
+            mass_edits[(table_name, f"Если была попытка удаления строки в таблице {sheet_name}\n\
+                                необходимо синхронизовать данные")] = None
+            continue
+
+        try:
+            # Строка приходит целиком в порядке колонок листа
+            convert = await db.sheets.row_converter(
+                table_name, [COLUMN_TRANSLATIONS[table_name][col] for col in columns]
             )
+            entire_row = request_data["entire_row"]
+            row_edits.append((table_name, sheet_name, row_id, columns, entire_row, convert(entire_row), convert))
+        except Exception as e:
+            failures.append((table_name, sheet_name, str(row_id), f"Ошибка обновления: {str(e)}"))
+
+    if row_edits:
+        created_sheets = set()
+        try:
+            async with db.transaction() as conn:
+                for table_name, sheet_name, row_id, columns, entire_row, row_data, convert in row_edits:
+                    await conn.execute("SAVEPOINT sheet_edit")
+                    try:
+                        audit_id = await db.last_audit_id(conn, table_name)
+                        if await _apply_row_edit(conn, table_name, row_id, columns, row_data):
+                            created_sheets.add(sheet_name)
+                        # Лист уже показывает записанное - изменение не отправляется обратно
+                        if await _sheet_shows_row(conn, table_name, sheet_name, row_id, entire_row, convert):
+                            await db.mark_sheet_origin(conn, table_name, audit_id)
+                    except Exception as e:
+                        await conn.execute("ROLLBACK TO sheet_edit")
+                        error_msg = f"Ошибка обновления: {str(e)}"
+                        logger.error(error_msg)
+                        failures.append((table_name, sheet_name, str(row_id), error_msg))
+                    await conn.execute("RELEASE sheet_edit")
+        except Exception as e:
+            # Транзакция не прошла целиком - все правки пачки возвращаются к состоянию БД
+            logger.error(f"Не удалось применить {len(row_edits)} правок из Google Sheets: {str(e)}")
+            created_sheets.clear()
+            failures.extend(
+                (table_name, sheet_name, str(row_id), f"Ошибка обновления: {str(e)}")
+                for table_name, sheet_name, row_id, *_ in row_edits
+            )
+        # Созданные строки уже есть в листе, но не в индексе строк
+        for sheet_name in created_sheets:
+            db.sheets.invalidate_row_index(sheet_name)
+
+    for table_name, error_msg in mass_edits:
+        await _handle_mass_edit_attempt(table_name=table_name, error_msg=error_msg)
+    # Ошибки правки диапазона - одно сообщение и одно задание отката на лист
+    grouped = {}
+    for table_name, sheet_name, record_id, error_msg in failures:
+        grouped.setdefault((table_name, sheet_name), []).append((record_id, error_msg))
+    for (table_name, sheet_name), sheet_failures in grouped.items():
+        await _handle_update_failures(table_name, sheet_name, sheet_failures)
+
+
+async def _sheet_shows_row(conn, table_name: str, sheet_name: str, row_id, entire_row: list, convert) -> bool:
+    """Совпадает ли запись БД после правки с тем, что уже стоит в строке листа.
+
+    Запись переводится в формат листа и сравнивается с пришедшей строкой;
+    если значения по умолчанию или нормализация изменили данные, либо запись
+    должна переехать в лист другого месяца, строку нужно переписать.
+    """
+    id_column = next(iter(COLUMN_TRANSLATIONS[table_name]))
+    cursor = await conn.execute(f"SELECT * FROM {table_name} WHERE {id_column} = ?", (row_id,))
+    row = await cursor.fetchone()
+    if row is None:
+        return False
+    row = dict(row)
+    if db.sheets.sheet_name_for_row(table_name, row) != sheet_name:
+        return False
+    try:
+        return convert.matches(entire_row, await db.sheets.format_row(table_name, row))
+    except ValueError:
+        return False
 
-    except StopIteration:
-        error_msg = f"Не найдено соответствие для листа: {sheet_name}"
-        logger.error(error_msg)
-        await _handle_update_failure(
-            table_name=sheet_name,
-            record_id=str(row_id),
-            sheet_name=sheet_name,
-            columns=[],
-            error_msg=error_msg
-        )
-    # ... existing code ...
+
+async def _apply_row_edit(conn, table_name: str, row_id, columns: list, row_data: dict) -> bool:
+    """Обновление записи значениями строки листа; если записи нет - создание.
+
+    Возвращает True, если запись создана.
+    """
+    id_column = columns[0]  # Первый ключ как имя колонки ID
+    # Формируем SQL-запрос, исключаем id_column из обновляемых полей
+    set_clause = ", ".join([f"{col} = ?" for col in columns[1:]])
+    # Пустые ячейки преобразователь уже заменил на None (NULL в БД)
+    values = [row_data[col] for col in columns[1:]]
+    cursor = await conn.execute(
+        f"UPDATE {table_name} SET {set_clause} WHERE {id_column} = ?",
+        (*values, row_id)
+    )
+    if cursor.rowcount:
+        logger.info(f"Успешно обновлена запись {row_id} в таблице {table_name}")
+        return False
+
+    logger.warning(f"Запись {row_id} не найдена в таблице {table_name} \n создаем новую запись")
+    await conn.execute(
+        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})",
+        (row_id, *values)
+    )
+    logger.info(f"Успешно создана новая запись {row_id} в таблице {table_name}")
+    return True
 
 async def _handle_mass_edit_attempt(table_name: str, error_msg: str):
     """Обработка попытки массового редактирования"""
@@ -149,124 +180,134 @@ async def _handle_mass_edit_attempt(table_name: str, error_msg: str):
             except Exception as e:
                 logger.error(f"Не удалось отправить сообщение менеджеру {manager_id}: {str(e)}")
 
-async def _handle_update_failure(table_name: str, record_id: str, sheet_name: str, columns: list, error_msg: str = None):
-    """Обработка неудачного обновления"""
+async def _handle_update_failures(table_name: str, sheet_name: str, failures: List[tuple]):
+    """Обработка неудачных правок одного листа: (ID записи, ошибка) для каждой"""
+    record_ids = list(dict.fromkeys(record_id for record_id, _ in failures))
+    errors = list(dict.fromkeys(error_msg or 'Неизвестная ошибка' for _, error_msg in failures))
 
     if MANAGERS_ID:
+        if len(record_ids) == 1:
+            records = f"• ID записи: {record_ids[0]}\n"
+        else:
+            shown = ', '.join(record_ids[:FAILURE_IDS_SHOWN])
+            more = f" и ещё {len(record_ids) - FAILURE_IDS_SHOWN}" if len(record_ids) > FAILURE_IDS_SHOWN else ""
+            records = f"• Записей: {len(record_ids)} (ID: {shown}{more})\n"
+        other = f" (и ещё видов ошибок: {len(errors) - 1})" if len(errors) > 1 else ""
         message = (f"⚠️ Ошибка синхронизации с Google Sheets\n\n"
                   f"• Таблица: {table_name}\n"
-                  f"• ID записи: {record_id}\n"
+                  f"{records}"
                   f"• Лист: {sheet_name}\n"
-                  f"• Ошибка: {error_msg or 'Неизвестная ошибка'}")
-        
+                  f"• Ошибка: {errors[0]}{other}")
+
         for manager_id in MANAGERS_ID:
             try:
                 await bot.send_message(chat_id=manager_id, text=message)
             except Exception as e:
                 logger.error(f"Не удалось отправить сообщение менеджеру {manager_id}: {str(e)}")
 
-    # 2. Синхронизируем данные из БД в Google Sheets
+    # 2. Возвращаем лист к состоянию БД через очередь синхронизации:
+    # при недоступности Google задание будет повторено, а не потеряно
+    if table_name not in COLUMN_TRANSLATIONS:
+        return
     try:
-        logger.info(f"Откат изменений для таблицы {table_name}")
-        async with db.execute(
-            f"SELECT * FROM {table_name} WHERE {columns[0]} = ?", 
-            (record_id,)
-        ) as cursor:
-            db_row = await cursor.fetchone()
-
-        if db_row:
-            columns = [desc[0] for desc in cursor.description]
-            row_data = dict(zip(columns, db_row))
-            
-            # Синхронизация с повторными попытками
-            await safe_db_operation(
-                db.sheets.sync_single_row,
-                table_name=table_name,
-                row_data=row_data,
-                action_type='UPDATE'
-            )
-        else:
-            logger.warning(f"Запись {record_id} не найдена в БД, удаляем из таблицы")
-            await safe_db_operation(
-                db.sheets.delete_row,
-                sheet_name,
-                {'id': record_id}
-            )
-
+        logger.info(f"Откат изменений для таблицы {table_name}: {len(record_ids)} записей")
+        id_column = next(iter(COLUMN_TRANSLATIONS[table_name]))
+        # Если записи уже нет в БД, задание превратится в удаление строки
+        await db.outbox.enqueue_changes(
+            table_name,
+            [{id_column: int(record_id), 'action_type': 'UPDATE'} for record_id in record_ids]
+        )
     except Exception as sync_error:
         logger.error(f"Ошибка при синхронизации после неудачного обновления: {str(sync_error)}")
 
-async def sync_db_to_sheets(table_name: str):
-    """Полная синхронизация таблицы БД с Google Sheets"""
+async def _apply_in_chunks(conn, report: dict, counter: str, query: str, rows: list) -> None:
+    """Выполнение запроса для строк порциями внутри транзакции conn.
+
+    rows - пары (ID записи, параметры запроса). Каждая порция выполняется
+    одним executemany под своей точкой сохранения; если порция не прошла,
+    она откатывается и повторяется построчно, чтобы найти и записать
+    в report['failed'] только ошибочные строки.
+    """
+    for start in range(0, len(rows), SYNC_APPLY_CHUNK_SIZE):
+        chunk = rows[start:start + SYNC_APPLY_CHUNK_SIZE]
+        await conn.execute("SAVEPOINT apply_chunk")
+        try:
+            await conn.executemany(query, [params for _, params in chunk])
+        except Exception:
+            await conn.execute("ROLLBACK TO apply_chunk")
+        else:
+            await conn.execute("RELEASE apply_chunk")
+            report[counter] += len(chunk)
+            continue
+
+        for record_id, params in chunk:
+            await conn.execute("SAVEPOINT apply_row")
+            try:
+                await conn.execute(query, params)
+            except Exception as e:
+                await conn.execute("ROLLBACK TO apply_row")
+                logger.error(f"Ошибка при обработке записи {record_id} ({counter}): {str(e)}")
+                report['failed'].append({'record_id': record_id, 'operation': counter, 'error': str(e)})
+            else:
+                report[counter] += 1
+            await conn.execute("RELEASE apply_row")
+        await conn.execute("RELEASE apply_chunk")
+
+
+async def sync_db_to_sheets(table_name: str, sheet_name: str = None) -> dict:
+    """Полная синхронизация таблицы БД с Google Sheets.
+
+    Для помесячной таблицы переносится один лист (по умолчанию - текущего
+    месяца) и сравнивается только со строками своего месяца. Различия
+    применяются одной транзакцией. Возвращает отчёт: количество
+    добавленных, обновлённых и удалённых записей и список ошибочных строк.
+    """
     try:
         # 1. Получаем русское название листа
-        sheet_name = TABLE_TRANSLATIONS.get(table_name)
-        if not sheet_name:
+        if table_name not in TABLE_TRANSLATIONS:
             raise ValueError(f"Нет конфигурации для таблицы {table_name}")
+        sheet_name = sheet_name or db.sheets.default_sheet_name(table_name)
+        partition = parse_partition_sheet(sheet_name)
+        if partition and is_closed_partition(partition[1]):
+            raise ValueError(f"Лист {sheet_name} закрыт, перенос из него в БД запрещён")
 
-        # 2. Загружаем данные из Google Sheets с повторными попытками
+        # 2. Загружаем данные из Google Sheets (повторы и предохранитель - в менеджере листов)
         try:
-            sheet_data = await safe_db_operation(
-                db.sheets.get_sheet_data,
-                sheet_name=sheet_name
-            )
+            sheet_data = await db.sheets.get_sheet_data(sheet_name=sheet_name, unformatted=True)
+        except SheetsUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при загрузке данных из Google Sheets: {str(e)}")
             raise ValueError(f"Не удалось загрузить данные из таблицы: {str(e)}")
-        
-        # Преобразуем данные из списка списков в список словарей
-        if len(sheet_data) > 1:  # Проверяем, есть ли данные, кроме заголовков
-            headers = sheet_data[0]
-            sheet_records = []
-            for row in sheet_data[1:]:
-                if row:  # Проверяем, что строка не пустая
-                    # Заполняем пустые значения в конце строки
-                    if len(row) < len(headers):
-                        row.extend([''] * (len(headers) - len(row)))
-                    record = {headers[i]: value.strip() if isinstance(value, str) else value for i, value in enumerate(row) if i < len(headers)}
-                    for key, value in record.items():
-                        if isinstance(value, str) and re.match(r'^\d{2}\.\d{2}\.\d{4}(\s\d{1,2}:\d{2}(:\d{2})?)?$', value):
-                            try:
-                                # Разделяем дату и время
-                                date_part, *time_part = value.split()
-                                dt = datetime.strptime(date_part, "%d.%m.%Y")
-                                
-                                # Устанавливаем время
-                                if time_part:
-                                    time_str = time_part[0]
-                                    dt = datetime.strptime(f"{date_part} {time_str}", "%d.%m.%Y %H:%M:%S" if len(time_part[0]) > 5 else "%d.%m.%Y %H:%M")
-                                else:
-                                    dt = dt.replace(hour=0, minute=0, second=0)  # Устанавливаем нули, если время не указано
-                                
-                                record[key] = dt.strftime("%Y-%m-%d %H:%M:%S")  # Преобразуем в нужный формат
-                            except ValueError:
-                                record[key] = None  # Или любое другое значение по умолчанию
-                    sheet_records.append(record)
-        else:
-            sheet_records = []
 
-        # 3. Преобразуем данные
+        # Лист загружен целиком - заодно обновляем индекс строк
+        await db.sheets.index_sheet_rows(sheet_name, sheet_data)
+        
+        # 3. Преобразуем строки листа: разбор ячеек собран по заголовкам один раз
         columns = list(COLUMN_TRANSLATIONS[table_name].keys())
         id_column = columns[0]
-        
+
         transformed_data = {}
-        for row in sheet_records:
-            # Получаем значение ID-колонки из заголовка в Google Sheets
-            sheet_id_column = COLUMN_TRANSLATIONS[table_name][id_column]
-            record_id = row.get(sheet_id_column, '')
-            if record_id:  # Игнорируем строки без ID
-                # Заполняем словарь, преобразуя имена полей из русских в английские
-                record_data = {}
-                for col in columns:
-                    sheet_column = COLUMN_TRANSLATIONS[table_name][col]
-                    value = row.get(sheet_column, '')
-                    # Преобразуем пустые строки в None
-                    record_data[col] = value if value != '' else None
-                transformed_data[str(record_id)] = record_data
+        sheet_rows = {}
+        convert = None
+        if len(sheet_data) > 1:  # Проверяем, есть ли данные, кроме заголовков
+            convert = await db.sheets.row_converter(table_name, sheet_data[0])
+            for row in sheet_data[1:]:
+                if not row:
+                    continue
+                record_data = convert(row)
+                record_id = record_data[id_column]
+                if record_id is not None:  # Игнорируем строки без ID
+                    transformed_data[str(record_id)] = record_data
+                    sheet_rows[str(record_id)] = row
 
         # 4. Получаем текущие данные из БД с повторными попытками
         try:
-            async with db.execute(f"SELECT * FROM {table_name}") as cursor:
+            where, params = db.sheets.partition_filter(table_name, sheet_name)
+            async with db.execute(
+                f"SELECT * FROM {table_name} {'WHERE ' + where if where else ''}",
+                params
+            ) as cursor:
                 db_rows = await cursor.fetchall()
                 db_columns = [desc[0] for desc in cursor.description]
         except Exception as e:
@@ -285,61 +326,57 @@ async def sync_db_to_sheets(table_name: str):
         for record_id, row in transformed_data.items():
             if record_id not in db_data:
                 to_insert.append(row)
-            elif row != db_data[record_id]:
+            elif any(value != db_data[record_id].get(col) for col, value in row.items()):
                 to_update.append(row)
 
         to_delete = [id_ for id_ in db_data if id_ not in transformed_data]
 
-        # 6. Выполняем синхронизацию последовательно с обработкой ошибок
-        success_inserts = 0
-        success_updates = 0
-        success_deletes = 0
-
-        # Вставка новых записей
-        for item in to_insert:
-            try:
-                placeholders = ', '.join(['?'] * len(columns))
-                async with db.execute(
-                    f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})",
-                    [item.get(col) for col in columns]  # None будет автоматически подставлен для пустых значений
-                ) as cursor:
-                    await cursor.fetchall()
-                success_inserts += 1
-            except Exception as e:
-                logger.error(f"Ошибка при вставке записи {item.get(id_column)}: {str(e)}")
-
-        # Обновление существующих
-        for item in to_update:
-            try:
-                set_clause = ", ".join([f"{col} = ?" for col in columns[1:]])
-                values = [item.get(col) for col in columns[1:]]  # None для пустых значений
-                values.append(item.get(id_column))
-                async with db.execute(
-                    f"UPDATE {table_name} SET {set_clause} WHERE {id_column} = ?",
-                    values
-                ) as cursor:
-                    await cursor.fetchall()
-                success_updates += 1
-            except Exception as e:
-                logger.error(f"Ошибка при обновлении записи {item.get(id_column)}: {str(e)}")
-
-        # Удаление отсутствующих
-        for id_ in to_delete:
-            try:
-                async with db.execute(
-                    f"DELETE FROM {table_name} WHERE {id_column} = ?",
-                    [id_]
-                ) as cursor:
-                    await cursor.fetchall()
-                success_deletes += 1
-            except Exception as e:
-                logger.error(f"Ошибка при удалении записи {id_}: {str(e)}")
+        # 6. Применяем различия одной транзакцией: один commit вместо commit на каждую строку
+        report = {'inserted': 0, 'updated': 0, 'deleted': 0, 'failed': []}
+        placeholders = ', '.join(['?'] * len(columns))
+        set_clause = ", ".join([f"{col} = ?" for col in columns[1:]])
+        async with db.transaction() as conn:
+            # Вставка новых записей (None будет автоматически подставлен для пустых значений)
+            await _apply_in_chunks(
+                conn, report, 'inserted',
+                f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})",
+                [(item.get(id_column), [item.get(col) for col in columns]) for item in to_insert]
+            )
+            # Обновление существующих. Строки, которые нужно переписать в листе
+            # (нормализованные значения, переезд в лист другого месяца),
+            # обновляются первыми; остальные обновления и удаления лист уже содержит
+            update_query = f"UPDATE {table_name} SET {set_clause} WHERE {id_column} = ?"
+            shown, rewrite = [], []
+            for item in to_update:
+                record_id = str(item[id_column])
+                params = [item.get(col) for col in columns[1:]] + [item.get(id_column)]
+                in_place = (
+                    db.sheets.sheet_name_for_row(table_name, item) == sheet_name
+                    and convert.matches(sheet_rows[record_id], await db.sheets.format_row(table_name, item))
+                )
+                (shown if in_place else rewrite).append((item.get(id_column), params))
+            await _apply_in_chunks(conn, report, 'updated', update_query, rewrite)
+            audit_id = await db.last_audit_id(conn, table_name)
+            await _apply_in_chunks(conn, report, 'updated', update_query, shown)
+            # Удаление отсутствующих
+            await _apply_in_chunks(
+                conn, report, 'deleted',
+                f"DELETE FROM {table_name} WHERE {id_column} = ?",
+                [(id_, [id_]) for id_ in to_delete]
+            )
+            await db.mark_sheet_origin(conn, table_name, audit_id)
 
         logger.info(f"Синхронизация {table_name} завершена. "
-                  f"Добавлено: {success_inserts}/{len(to_insert)}, "
-                  f"Обновлено: {success_updates}/{len(to_update)}, "
-                  f"Удалено: {success_deletes}/{len(to_delete)}")
+                  f"Добавлено: {report['inserted']}/{len(to_insert)}, "
+                  f"Обновлено: {report['updated']}/{len(to_update)}, "
+                  f"Удалено: {report['deleted']}/{len(to_delete)}, "
+                  f"Ошибок: {len(report['failed'])}")
+        return report
 
     except Exception as e:
         logger.error(f"Ошибка синхронизации {table_name}: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+# Очередь правок из вебхука: запрос подтверждается сразу, правки применяются пачками
+edit_queue = SheetsEditQueue(apply_sheet_edits)
@@ -0,0 +1,291 @@
+"""Бенчмарк синхронизации с Google Sheets на локальной замене API.
+
+Для каждого размера набора данных создаётся временная БД с синтетическими
+batches и payments и пустая FakeSheetsService, после чего по очереди
+замеряются пути синхронизации: выгрузка таблицы, full_sync без изменений
+и после изменения части строк, пачка sync_single_row и sync_db_to_sheets.
+По каждому замеру записываются время, число вызовов API по методам,
+переданные байты и пиковая память (tracemalloc).
+
+Запуск из корня репозитория (нужен app/credentials.py):
+
+    python -m benchmarks.sheets_sync --sizes 1000,10000 --output bench.json
+
+Результат - JSON, пригодный для сравнения между коммитами.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Бенчмарк никогда не обращается к настоящему Google Sheets
+os.environ.setdefault('SHEETS_BACKEND', 'fake')
+
+from app.database.migrator import migrate
+from app.database.models import Database
+from app.services import update_from_sheets
+from app.services.dictionary import TABLE_TRANSLATIONS
+from app.services.fake_sheets import FakeSheetsService
+from app.services.rate_limiter import SheetsRateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_TABLES = ['batches', 'payments']
+SCENARIOS = ['sync_data_to_sheet', 'full_sync_unchanged', 'full_sync_changed',
+             'sync_single_row', 'sync_db_to_sheets']
+
+BATCH_STATUSES = ['создана', 'шьется', 'пошита', 'готово']
+PAYMENT_TYPES = ['зарплата', 'премия', 'штраф']
+EMPLOYEES_COUNT = 50
+
+
+def generate_batches(count: int, rnd: random.Random):
+    started = datetime(2024, 1, 1)
+    for _ in range(count):
+        created = started + timedelta(minutes=rnd.randrange(0, 60 * 24 * 365))
+        yield (
+            f"Проект {rnd.randrange(200)}", f"Изделие {rnd.randrange(50)}",
+            rnd.choice(['чёрный', 'белый', 'синий']), rnd.choice(['S', 'M', 'L', 'XL']),
+            rnd.randrange(1, 200), rnd.randrange(1, 20),
+            rnd.randrange(1, EMPLOYEES_COUNT + 1), rnd.randrange(1, EMPLOYEES_COUNT + 1),
+            rnd.randrange(10, 100), rnd.randrange(10, 100),
+            rnd.choice(BATCH_STATUSES), 'обычная', created.strftime('%Y-%m-%d %H:%M:%S'),
+        )
+
+
+def generate_payments(count: int, rnd: random.Random):
+    started = datetime(2024, 1, 1)
+    for _ in range(count):
+        paid = started + timedelta(minutes=rnd.randrange(0, 60 * 24 * 365))
+        yield (
+            rnd.randrange(1, EMPLOYEES_COUNT + 1), rnd.randrange(100, 50000),
+            rnd.choice(PAYMENT_TYPES), paid.strftime('%Y-%m-%d %H:%M:%S'),
+        )
+
+
+async def seed(db: Database, size: int, tables, rnd: random.Random) -> None:
+    """Заполнение БД синтетическими данными (аудит после заполнения очищается)"""
+    await migrate(db)
+    async with db.get_connection() as conn:
+        await conn.executemany(
+            "INSERT INTO employees (name, job, status) VALUES (?, 'швея', 'одобрено')",
+            [(f"Сотрудник {i}",) for i in range(EMPLOYEES_COUNT)]
+        )
+        if 'batches' in tables:
+            await conn.executemany(
+                "INSERT INTO batches (project_nm, product_nm, color, size, quantity, parts_count, "
+                "cutter_id, seamstress_id, cutter_pay, seamstress_pay, status, type, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                generate_batches(size, rnd)
+            )
+        if 'payments' in tables:
+            await conn.executemany(
+                "INSERT INTO payments (employee_id, amount, type, payment_date) VALUES (?, ?, ?, ?)",
+                generate_payments(size, rnd)
+            )
+        for table in TABLE_TRANSLATIONS:
+            await conn.execute(f"DELETE FROM {table}_audit")
+        await conn.commit()
+
+
+async def touch_rows(db: Database, table: str, count: int, rnd: random.Random) -> list:
+    """Изменение count случайных строк таблицы, возвращает их ID"""
+    async with db.execute(f"SELECT MAX(rowid) FROM {table}") as cursor:
+        max_id = (await cursor.fetchone())[0] or 0
+    ids = rnd.sample(range(1, max_id + 1), min(count, max_id))
+    column = 'quantity' if table == 'batches' else 'amount'
+    async with db.executemany(
+        f"UPDATE {table} SET {column} = {column} + 1 WHERE rowid = ?",
+        [(record_id,) for record_id in ids]
+    ):
+        pass
+    async with db.execute(f"DELETE FROM {table}_audit"):
+        pass
+    return ids
+
+
+async def measure(service: FakeSheetsService, name: str, table, size: int, coro) -> dict:
+    """Замер одного сценария: время, вызовы API, байты и пиковая память"""
+    service.reset_stats()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    error = None
+    details = None
+    try:
+        details = await coro
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall_time = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    stats = service.stats()
+    result = {
+        'scenario': name,
+        'table': table,
+        'rows': size,
+        'wall_time': round(wall_time, 4),
+        'api_calls': stats['total_calls'],
+        'calls_by_method': stats['calls'],
+        'api_errors': stats['errors'],
+        'bytes_sent': stats['bytes_sent'],
+        'bytes_received': stats['bytes_received'],
+        'peak_memory': peak,
+    }
+    if details is not None:
+        result['details'] = details
+    if error:
+        result['error'] = error
+    logger.info(f"{name} {table or ''} rows={size}: {wall_time:.2f} s, {stats['total_calls']} calls")
+    return result
+
+
+async def run_size(size: int, args) -> list:
+    rnd = random.Random(args.seed)
+    service = FakeSheetsService(latency=args.latency, jitter=args.jitter, seed=args.seed)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_path=os.path.join(tmp, 'bench.sqlite'), sheets_service=service)
+        # sync_db_to_sheets работает с общим экземпляром БД модуля
+        update_from_sheets.db = db
+        if not args.respect_quotas:
+            db.sheets.rate_limiter = SheetsRateLimiter(10 ** 9, 10 ** 9)
+        try:
+            await seed(db, size, args.tables, rnd)
+            await db.sheets.load_metadata()
+            for table in TABLE_TRANSLATIONS:
+                await db.sheets.initialize_sheet(table)
+
+            scenarios = args.scenarios
+            # Выгрузка нужна всем сценариям: они работают с заполненными листами
+            for table in TABLE_TRANSLATIONS:
+                result = await measure(
+                    service, 'sync_data_to_sheet', table, size,
+                    db.sheets.sync_data_to_sheet(table)
+                )
+                if 'sync_data_to_sheet' in scenarios and table in args.tables:
+                    results.append(result)
+
+            if 'full_sync_unchanged' in scenarios or 'full_sync_changed' in scenarios:
+                # Прогревочный прогон: первый full_sync создаёт лист контрольных
+                # сумм и формулы блоков, это разовая стоимость, а не сверка
+                await db.sheets.full_sync()
+
+            if 'full_sync_unchanged' in scenarios:
+                results.append(await measure(service, 'full_sync_unchanged', None, size, db.sheets.full_sync()))
+
+            if 'full_sync_changed' in scenarios:
+                changed = max(1, int(size * args.change_rate))
+                for table in args.tables:
+                    await touch_rows(db, table, changed, rnd)
+                result = await measure(service, 'full_sync_changed', None, size, db.sheets.full_sync())
+                result['changed_rows_per_table'] = changed
+                results.append(result)
+
+            if 'sync_single_row' in scenarios:
+                for table in args.tables:
+                    ids = await touch_rows(db, table, args.single_rows, rnd)
+                    id_column = 'batch_id' if table == 'batches' else 'payment_id'
+                    async with db.execute(
+                        f"SELECT * FROM {table} WHERE {id_column} IN ({','.join(['?'] * len(ids))})", ids
+                    ) as cursor:
+                        rows = await db.fetchall(cursor)
+                    # Одновременный поток изменений, как при выгрузке аудита
+                    result = await measure(
+                        service, 'sync_single_row', table, size,
+                        asyncio.gather(*(db.sheets.sync_single_row(table, row, 'UPDATE') for row in rows))
+                    )
+                    result['synced_rows'] = len(rows)
+                    result['mean_row_latency'] = round(result['wall_time'] / max(len(rows), 1), 4)
+                    results.append(result)
+
+            if 'sync_db_to_sheets' in scenarios:
+                for table in args.tables:
+                    results.append(await measure(
+                        service, 'sync_db_to_sheets', table, size,
+                        update_from_sheets.sync_db_to_sheets(table)
+                    ))
+        finally:
+            await db.close()
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк синхронизации с Google Sheets")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="размеры таблиц через запятую (например 1000,10000,500000)")
+    parser.add_argument('--tables', default=','.join(DEFAULT_TABLES),
+                        help="таблицы с синтетическими данными")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help="сценарии через запятую: " + ', '.join(SCENARIOS))
+    parser.add_argument('--change-rate', type=float, default=0.01,
+                        help="доля изменяемых строк для full_sync_changed")
+    parser.add_argument('--single-rows', type=int, default=100,
+                        help="число строк для сценария sync_single_row")
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка ответа API, сек")
+    parser.add_argument('--jitter', type=float, default=0.0, help="случайная добавка к задержке, сек")
+    parser.add_argument('--respect-quotas', action='store_true',
+                        help="не отключать ограничитель запросов (замеры будут включать ожидание квот)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="файл для JSON-результатов (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(',') if size]
+    args.tables = [table for table in args.tables.split(',') if table]
+    args.scenarios = [scenario for scenario in args.scenarios.split(',') if scenario]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(sorted(unknown))}")
+    return args
+
+
+async def main(argv=None) -> dict:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    logger.setLevel(logging.INFO)
+
+    tracemalloc.start()
+    results = []
+    for size in args.sizes:
+        results.extend(await run_size(size, args))
+    tracemalloc.stop()
+
+    report = {
+        'meta': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': {
+                'sizes': args.sizes, 'tables': args.tables, 'change_rate': args.change_rate,
+                'single_rows': args.single_rows, 'latency': args.latency, 'jitter': args.jitter,
+                'respect_quotas': args.respect_quotas, 'seed': args.seed,
+            },
+        },
+        'results': results,
+    }
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return report
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
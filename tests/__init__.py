@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+import types
+
+# Тесты работают только с локальной заменой Google Sheets (FakeSheetsService)
+os.environ['SHEETS_BACKEND'] = 'fake'
+
+# Без app/credentials.py (он не хранится в репозитории) подставляем тестовые настройки
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if not os.path.exists(os.path.join(_ROOT, 'app', 'credentials.py')):
+    _credentials = types.ModuleType('app.credentials')
+    _credentials.DB_PATH = os.path.join(tempfile.gettempdir(), 'sewing_industry_tests.sqlite')
+    _credentials.GOOGLE_CREDS = ''
+    _credentials.SPREADSHEET_ID = 'test-spreadsheet'
+    _credentials.BOT_TOKEN = '123456:TEST'
+    _credentials.WEBHOOK_URL = 'http://localhost'
+    _credentials.MANAGERS_ID = []
+    sys.modules['app.credentials'] = _credentials
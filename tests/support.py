@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from app.database.migrator import migrate
+from app.database.models import Database
+from app.services.fake_sheets import FakeSheetsService
+
+
+class DatabaseTestCase(unittest.IsolatedAsyncioTestCase):
+    """Временная БД со всеми миграциями и FakeSheetsService вместо Google Sheets.
+
+    Фоновые обработчики аудита и очереди не запускаются: тесты вызывают
+    drain_audit_table и process_due сами.
+    """
+
+    async def asyncSetUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.service = FakeSheetsService(seed=1)
+        self.db = Database(db_path=os.path.join(self._tmp.name, 'test.sqlite'), sheets_service=self.service)
+        # Окно накопителя записей сокращено, чтобы тесты не ждали пакетов
+        self.db.sheets.writer.window = 0.01
+        await migrate(self.db)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        self._tmp.cleanup()
+
+    async def init_sheet(self, table_name: str) -> str:
+        """Лист таблицы с заголовками, возвращает его название"""
+        await self.db.sheets.load_metadata()
+        await self.db.sheets.initialize_sheet(table_name)
+        return self.db.sheets.default_sheet_name(table_name)
+
+    async def insert_batches(self, count: int) -> list:
+        """Пачки p0, p1, ... со статусом 'создана', возвращает их ID"""
+        async with self.db.executemany(
+            "INSERT INTO batches (project_nm, status, type, created_at, quantity) "
+            "VALUES (?, 'создана', 'обычная', '2026-10-05 10:00:00', 3)",
+            [(f"p{i}",) for i in range(count)]
+        ):
+            pass
+        async with self.db.execute("SELECT batch_id FROM batches ORDER BY batch_id") as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def outbox_jobs(self) -> list:
+        """Задания очереди синхронизации: (ID записи, действие, статус, попытки)"""
+        async with self.db.execute(
+            "SELECT record_id, action_type, status, attempts FROM sheets_outbox ORDER BY job_id"
+        ) as cursor:
+            return [tuple(row) for row in await cursor.fetchall()]
@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+
+from app.services.circuit_breaker import CircuitBreaker, SheetsUnavailableError
+
+
+class CircuitBreakerTest(unittest.IsolatedAsyncioTestCase):
+    """Размыкание после сбоев подряд, проверка связи и отложенные операции"""
+
+    async def asyncSetUp(self):
+        self.probe_results = []
+        self.probe_calls = 0
+        self.breaker = CircuitBreaker(self._probe, failure_threshold=3, probe_interval=0.01,
+                                      max_probe_interval=0.02)
+
+    async def _probe(self):
+        self.probe_calls += 1
+        if self.probe_results and self.probe_results.pop(0):
+            raise ConnectionError('нет связи')
+
+    async def asyncTearDown(self):
+        if self.breaker._probe_task:
+            self.breaker._probe_task.cancel()
+
+    async def wait_closed(self):
+        await asyncio.wait_for(self.breaker.wait_closed(), timeout=1)
+
+    async def test_opens_after_threshold_consecutive_failures(self):
+        for _ in range(2):
+            self.breaker.record_failure(ConnectionError())
+        self.assertFalse(self.breaker.is_open)
+        self.breaker.check()
+
+        self.breaker.record_failure(ConnectionError())
+        self.assertTrue(self.breaker.is_open)
+        with self.assertRaises(SheetsUnavailableError):
+            self.breaker.check()
+
+    async def test_success_resets_failure_count(self):
+        for _ in range(2):
+            self.breaker.record_failure(ConnectionError())
+        self.breaker.record_success()
+        for _ in range(2):
+            self.breaker.record_failure(ConnectionError())
+        self.assertFalse(self.breaker.is_open)
+
+    async def test_failed_probe_keeps_circuit_open_until_probe_succeeds(self):
+        self.probe_results = [True, True]  # две проверки неудачны, третья удачна
+        for _ in range(3):
+            self.breaker.record_failure(ConnectionError())
+
+        await self.wait_closed()
+        self.assertFalse(self.breaker.is_open)
+        self.assertEqual(self.probe_calls, 3)
+        self.breaker.check()
+
+    async def test_deferred_operations_run_once_after_recovery(self):
+        runs = []
+
+        async def operation():
+            runs.append('sync')
+
+        for _ in range(3):
+            self.breaker.record_failure(ConnectionError())
+        # Повторная отсрочка с тем же ключом не создаёт дубликат
+        self.breaker.defer('full_sync', operation)
+        self.breaker.defer('full_sync', operation)
+
+        await self.wait_closed()
+        await asyncio.sleep(0.01)
+        self.assertEqual(runs, ['sync'])
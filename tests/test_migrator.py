@@ -0,0 +1,91 @@
+import os
+import tempfile
+
+from app.database.migrator import MigrationError, load_migrations, migrate, split_statements
+from tests.support import DatabaseTestCase
+
+TRIGGER_SQL = """
+-- Таблица и триггер с точками с запятой внутри тела и строки
+CREATE TABLE items (id INTEGER PRIMARY KEY, note TEXT DEFAULT 'a;b');
+CREATE TRIGGER items_note AFTER INSERT ON items
+BEGIN
+    UPDATE items SET note = note || ';' WHERE id = NEW.id;
+    UPDATE items SET note = note || '!' WHERE id = NEW.id;
+END;
+INSERT INTO items (id) VALUES (1)
+-- завершающий комментарий
+"""
+
+
+class SplitStatementsTest(DatabaseTestCase):
+    """Разбиение скрипта миграции на запросы"""
+
+    async def test_keeps_trigger_bodies_and_strings_whole(self):
+        statements = split_statements(TRIGGER_SQL)
+        self.assertEqual(len(statements), 3)
+        self.assertTrue(statements[0].endswith("DEFAULT 'a;b');"))
+        self.assertTrue(statements[1].startswith('CREATE TRIGGER'))
+        self.assertTrue(statements[1].endswith('END;'))
+        self.assertTrue(statements[2].startswith('INSERT INTO items'))
+
+    async def test_comment_only_tail_is_dropped(self):
+        self.assertEqual(split_statements("SELECT 1;\n-- конец\n"), ['SELECT 1;'])
+
+    async def test_repository_migrations_are_ordered(self):
+        versions = [version for version, *_ in load_migrations()]
+        self.assertEqual(versions, sorted(versions))
+        self.assertEqual(versions[0], 1)
+
+
+class MigrateTest(DatabaseTestCase):
+    """Применение миграций из каталога поверх схемы репозитория"""
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self._migrations = tempfile.TemporaryDirectory()
+        self.directory = self._migrations.name
+
+    async def asyncTearDown(self):
+        await super().asyncTearDown()
+        self._migrations.cleanup()
+
+    def write(self, file_name: str, sql: str) -> None:
+        with open(os.path.join(self.directory, file_name), 'w', encoding='utf-8') as f:
+            f.write(sql)
+
+    async def applied_versions(self) -> list:
+        async with self.db.execute("SELECT version FROM schema_version ORDER BY version") as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
+    async def test_applies_new_migrations_once_in_order(self):
+        self.write('0101_items.sql', TRIGGER_SQL)
+        self.write('0102_more.sql', "INSERT INTO items (id) VALUES (2);")
+        self.write('notes.txt', "не миграция")
+
+        self.assertEqual(await migrate(self.db, self.directory), [101, 102])
+        self.assertEqual(await migrate(self.db, self.directory), [])
+        async with self.db.execute("SELECT id, note FROM items ORDER BY id") as cursor:
+            self.assertEqual([tuple(row) for row in await cursor.fetchall()], [(1, 'a;b;!'), (2, 'a;b;!')])
+
+    async def test_changed_migration_stops_startup(self):
+        self.write('0101_items.sql', TRIGGER_SQL)
+        await migrate(self.db, self.directory)
+        self.write('0101_items.sql', TRIGGER_SQL + "\nINSERT INTO items (id) VALUES (3);")
+
+        with self.assertRaises(MigrationError):
+            await migrate(self.db, self.directory)
+
+    async def test_failed_migration_is_rolled_back(self):
+        self.write('0101_broken.sql', "CREATE TABLE broken (id INTEGER);\nINSERT INTO missing VALUES (1);")
+
+        with self.assertRaises(MigrationError):
+            await migrate(self.db, self.directory)
+        self.assertNotIn(101, await self.applied_versions())
+        async with self.db.execute("SELECT name FROM sqlite_master WHERE name = 'broken'") as cursor:
+            self.assertIsNone(await cursor.fetchone())
+
+    async def test_duplicate_version_is_rejected(self):
+        self.write('0101_one.sql', "SELECT 1;")
+        self.write('0101_two.sql', "SELECT 2;")
+        with self.assertRaises(MigrationError):
+            load_migrations(self.directory)
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from app.database.outbox import OUTBOX_MAX_ATTEMPTS
+from tests.support import DatabaseTestCase
+
+
+class SheetsOutboxTest(DatabaseTestCase):
+    """Очередь синхронизации: подтверждение, повторы, dead и возврат в очередь"""
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.sheet_name = await self.init_sheet('batches')
+        self.outbox = self.db.outbox
+
+    async def enqueue_batches(self, count: int) -> list:
+        ids = await self.insert_batches(count)
+        await self.db.drain_audit_table('batches')
+        return ids
+
+    def sheet_ids(self) -> list:
+        return [str(row[0]) for row in self.service.sheet_values(self.sheet_name)[1:]]
+
+    async def test_synced_jobs_are_acknowledged(self):
+        ids = await self.enqueue_batches(3)
+        self.assertEqual(await self.outbox_jobs(), [(i, 'INSERT', 'pending', 0) for i in ids])
+
+        self.assertEqual(await self.outbox.process_due(), 3)
+        self.assertEqual(await self.outbox_jobs(), [])
+        self.assertEqual(self.sheet_ids(), [str(i) for i in ids])
+
+    async def test_failed_job_is_postponed(self):
+        [batch_id] = await self.enqueue_batches(1)
+        self.service.fail_next(1, status=400)
+
+        await self.outbox.process_due()
+        self.assertEqual(await self.outbox_jobs(), [(batch_id, 'INSERT', 'pending', 1)])
+        # Следующая попытка отложена - сейчас обрабатывать нечего
+        self.assertEqual(await self.outbox.process_due(), 0)
+        self.assertEqual(self.sheet_ids(), [])
+
+    async def test_exhausted_job_goes_dead_and_replays(self):
+        [batch_id] = await self.enqueue_batches(1)
+        async with self.db.execute("UPDATE sheets_outbox SET attempts = ?", (OUTBOX_MAX_ATTEMPTS - 1,)):
+            pass
+        self.service.fail_next(1, status=400)
+
+        await self.outbox.process_due()
+        self.assertEqual(await self.outbox.stats(), {'pending': 0, 'dead': 1})
+
+        self.assertEqual(await self.outbox.replay_dead(), 1)
+        self.assertEqual(await self.outbox_jobs(), [(batch_id, 'INSERT', 'pending', 0)])
+        self.assertEqual(await self.outbox.process_due(), 1)
+        self.assertEqual(self.sheet_ids(), [str(batch_id)])
+
+    async def test_bad_row_fails_only_its_own_job(self):
+        ids = await self.enqueue_batches(5)
+        bad_id = ids[2]
+        sync_rows = self.db.sheets.sync_rows
+
+        async def reject_bad_row(table_name, rows):
+            if any(row['batch_id'] == bad_id for row in rows):
+                raise ValueError('лист отверг строку')
+            await sync_rows(table_name, rows)
+
+        with mock.patch.object(self.db.sheets, 'sync_rows', reject_bad_row):
+            await self.outbox.process_due()
+
+        self.assertEqual(await self.outbox_jobs(), [(bad_id, 'INSERT', 'pending', 1)])
+        self.assertEqual(sorted(self.sheet_ids()), sorted(str(i) for i in ids if i != bad_id))
+
+    async def test_open_breaker_does_not_burn_attempts(self):
+        ids = await self.enqueue_batches(2)
+        breaker = self.db.sheets.breaker
+        breaker.probe_interval = 0.01
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure(ConnectionError())
+
+        self.assertEqual(await self.outbox.process_due(), 0)
+        self.assertEqual(await self.outbox_jobs(), [(i, 'INSERT', 'pending', 0) for i in ids])
+
+        # После восстановления связи задания отправляются
+        await breaker.wait_closed()
+        self.assertEqual(await self.outbox.process_due(), 2)
+        self.assertEqual(self.sheet_ids(), [str(i) for i in ids])
@@ -0,0 +1,77 @@
+import unittest
+
+from app.services.sheet_converters import (
+    compile_row_converter, parse_datetime, parse_integer, parse_real, parse_text
+)
+
+HEADERS = ['ID пачки', 'Наименование проекта', 'Размер', 'Количество', 'Статус', 'Дата создания']
+COLUMN_TYPES = {
+    'batch_id': 'INTEGER', 'project_nm': 'TEXT', 'size': 'TEXT',
+    'quantity': 'INTEGER', 'status': 'TEXT', 'created_at': 'DATETIME',
+}
+CONSTRAINTS = {'status': ['создана', 'шьется', 'готово']}
+
+
+class ParsersTest(unittest.TestCase):
+    """Разбор значений ячеек в форматах UNFORMATTED_VALUE и FORMATTED_VALUE"""
+
+    def test_text(self):
+        self.assertIsNone(parse_text(''))
+        self.assertIsNone(parse_text('   '))
+        self.assertEqual(parse_text(' XL '), 'XL')
+        # Число в текстовой колонке приходит без форматирования
+        self.assertEqual(parse_text(46.0), '46')
+
+    def test_integer(self):
+        self.assertEqual(parse_integer(3.0), 3)
+        self.assertEqual(parse_integer('-12'), -12)
+        self.assertIsNone(parse_integer(''))
+        # Нераспознанное значение остаётся как есть для ограничений схемы
+        self.assertEqual(parse_integer('три'), 'три')
+
+    def test_real(self):
+        self.assertEqual(parse_real('12,5'), 12.5)
+        self.assertEqual(parse_real(7), 7.0)
+        self.assertEqual(parse_real('abc'), 'abc')
+
+    def test_datetime(self):
+        # SERIAL_NUMBER: 05.10.2026 10:00
+        self.assertEqual(parse_datetime(46300 + 10 / 24), '2026-10-05 10:00:00')
+        self.assertEqual(parse_datetime('05.10.2026 9:30'), '2026-10-05 09:30:00')
+        self.assertEqual(parse_datetime('05.10.2026'), '2026-10-05 00:00:00')
+        self.assertEqual(parse_datetime('2026-10-05T10:00:00Z'), '2026-10-05 10:00:00')
+        self.assertIsNone(parse_datetime('31.02.2026'))
+
+
+class RowConverterTest(unittest.TestCase):
+    """Преобразование строки листа в запись по заголовкам"""
+
+    def setUp(self):
+        self.convert = compile_row_converter('batches', HEADERS, COLUMN_TYPES, CONSTRAINTS)
+
+    def test_converts_by_header_positions(self):
+        record = self.convert([7, 'Проект', 46.0, '3', ' Шьется ', 46300 + 10 / 24])
+        self.assertEqual(record['batch_id'], 7)
+        self.assertEqual(record['project_nm'], 'Проект')
+        self.assertEqual(record['size'], '46')
+        self.assertEqual(record['quantity'], 3)
+        # Значение из списка допустимых приводится к написанию из схемы
+        self.assertEqual(record['status'], 'шьется')
+        self.assertEqual(record['created_at'], '2026-10-05 10:00:00')
+
+    def test_missing_columns_and_short_rows_give_none(self):
+        record = self.convert([7, 'Проект'])
+        self.assertIsNone(record['quantity'])
+        # Колонки, которой нет в заголовках листа
+        self.assertIsNone(record['seamstress_id'])
+
+    def test_header_matching_ignores_case_and_spaces(self):
+        convert = compile_row_converter('batches', [' id ПАЧКИ ', 'количество'], COLUMN_TYPES, CONSTRAINTS)
+        self.assertEqual(convert(['5', 2]), {**convert([]), 'batch_id': 5, 'quantity': 2})
+
+    def test_matches_compares_numbers_by_value_and_text_literally(self):
+        row = [7, 'Проект', '46', 3, 'создана', '05.10.2026 10:00:00']
+        self.assertTrue(self.convert.matches(row, [7.0, 'Проект', 46.0, '3', 'создана', 46300 + 10 / 24]))
+        # Лист показывает другое написание - строку нужно переписать
+        self.assertFalse(self.convert.matches(row, [7, 'Проект', '46', 3, 'Создана', '05.10.2026 10:00:00']))
+        self.assertFalse(self.convert.matches(row, [7, 'Проект', '46', 4, 'создана', '05.10.2026 10:00:00']))
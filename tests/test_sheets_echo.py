@@ -0,0 +1,65 @@
+from unittest import mock
+
+from app.services import update_from_sheets
+from tests.support import DatabaseTestCase
+
+
+class SheetEchoTest(DatabaseTestCase):
+    """Правки из Google Sheets не возвращаются в лист через очередь синхронизации"""
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.sheet_name = await self.init_sheet('batches')
+        [self.batch_id] = await self.insert_batches(1)
+        await self.db.drain_audit_table('batches')
+        await self.db.outbox.process_due()
+        patcher = mock.patch.object(update_from_sheets, 'db', self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def sheet_row(self, **changes) -> list:
+        """Строка листа, как её присылает вебхук после правки"""
+        async with self.db.execute("SELECT * FROM batches WHERE batch_id = ?", (self.batch_id,)) as cursor:
+            row = dict(await cursor.fetchone())
+        return await self.db.sheets.format_row('batches', {**row, **changes})
+
+    async def apply_edit(self, entire_row: list) -> None:
+        await update_from_sheets.apply_sheet_edits([{
+            'sheet_name': self.sheet_name, 'num_rows': 1,
+            'row_id': self.batch_id, 'entire_row': entire_row,
+        }])
+        await self.db.drain_audit_table('batches')
+
+    async def quantity(self) -> int:
+        async with self.db.execute("SELECT quantity FROM batches WHERE batch_id = ?", (self.batch_id,)) as cursor:
+            return (await cursor.fetchone())[0]
+
+    async def test_sheet_edit_is_not_sent_back(self):
+        await self.apply_edit(await self.sheet_row(quantity=7))
+
+        self.assertEqual(await self.quantity(), 7)
+        self.assertEqual(await self.outbox_jobs(), [])
+        async with self.db.execute("SELECT COUNT(*) FROM sheets_echo") as cursor:
+            self.assertEqual((await cursor.fetchone())[0], 0)
+
+    async def test_normalized_edit_is_written_back(self):
+        # Статус приводится к написанию из схемы - лист нужно поправить
+        await self.apply_edit(await self.sheet_row(status='Создана'))
+
+        self.assertEqual(await self.outbox_jobs(), [(self.batch_id, 'UPDATE', 'pending', 0)])
+
+    async def test_bot_change_after_sheet_edit_is_sent(self):
+        await update_from_sheets.apply_sheet_edits([{
+            'sheet_name': self.sheet_name, 'num_rows': 1,
+            'row_id': self.batch_id, 'entire_row': await self.sheet_row(quantity=7),
+        }])
+        # Изменение из бота в той же порции аудита, что и эхо правки
+        async with self.db.execute("UPDATE batches SET quantity = 8 WHERE batch_id = ?", (self.batch_id,)):
+            pass
+        await self.db.drain_audit_table('batches')
+
+        self.assertEqual(await self.outbox_jobs(), [(self.batch_id, 'UPDATE', 'pending', 0)])
+        await self.db.outbox.process_due()
+        headers, *rows = self.service.sheet_values(self.sheet_name)
+        convert = await self.db.sheets.row_converter('batches', headers)
+        self.assertEqual([convert(row)['quantity'] for row in rows], [8])
@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from app.services.sheets_ingest import SheetsEditQueue, expand_payload
+
+
+def edit(row_id, value, sheet_name='Пачки'):
+    return {'sheet_name': sheet_name, 'num_rows': 1, 'row_id': row_id, 'entire_row': [row_id, value]}
+
+
+class SheetsEditQueueTest(unittest.IsolatedAsyncioTestCase):
+    """Очередь правок из вебхука: схлопывание, правки диапазонов и остановка"""
+
+    async def asyncSetUp(self):
+        self.batches = []
+        self.queue = SheetsEditQueue(self._apply)
+        patcher = mock.patch('app.services.sheets_ingest.INGEST_COALESCE_WINDOW', 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _apply(self, edits):
+        self.batches.append(edits)
+
+    async def test_repeated_edits_of_row_keep_last(self):
+        await self.queue.start()
+        for payload in (edit(1, 'a'), edit(2, 'b'), edit(1, 'c'), edit(1, 'd', sheet_name='Пачки 2026-10')):
+            self.assertTrue(self.queue.submit(payload))
+        await self.queue.stop(timeout=1)
+
+        self.assertEqual(self.batches, [[edit(2, 'b'), edit(1, 'c'), edit(1, 'd', sheet_name='Пачки 2026-10')]])
+        self.assertEqual(self.queue.metrics()['coalesced'], 1)
+        self.assertEqual(self.queue.metrics()['applied'], 3)
+
+    async def test_mass_edits_are_not_coalesced(self):
+        deletion = {'sheet_name': 'Пачки', 'num_rows': 1, 'row_id': ''}
+        mass = {'sheet_name': 'Пачки', 'num_rows': 3, 'row_id': 5}
+        await self.queue.start()
+        for payload in (deletion, deletion, mass, mass):
+            self.queue.submit(payload)
+        await self.queue.stop(timeout=1)
+
+        self.assertEqual(self.batches, [[deletion, deletion, mass, mass]])
+
+    async def test_range_edit_is_expanded_into_rows(self):
+        payload = {'sheet_name': 'Пачки', 'rows': [
+            {'row_id': 1, 'entire_row': [1, 'a']},
+            {'row_id': 2, 'entire_row': [2, 'b']},
+        ]}
+        self.assertEqual(expand_payload(payload), [edit(1, 'a'), edit(2, 'b')])
+
+        await self.queue.start()
+        self.queue.submit(edit(2, 'old'))
+        self.queue.submit(payload)
+        await self.queue.stop(timeout=1)
+        self.assertEqual(self.batches, [[edit(1, 'a'), edit(2, 'b')]])
+
+    async def test_invalid_payload_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.queue.submit({'sheet_name': 'Пачки'})
+        with self.assertRaises(ValueError):
+            self.queue.submit({'sheet_name': 'Пачки', 'rows': [{'row_id': 1}]})
+
+    async def test_stop_drains_accepted_edits_and_closes_intake(self):
+        await self.queue.start()
+        self.queue.submit(edit(1, 'a'))
+        # Окно накопления не ждём: остановка применяет принятое сразу
+        with mock.patch('app.services.sheets_ingest.INGEST_COALESCE_WINDOW', 60):
+            await asyncio.wait_for(self.queue.stop(timeout=5), timeout=1)
+
+        self.assertEqual(self.batches, [[edit(1, 'a')]])
+        self.assertFalse(self.queue.submit(edit(2, 'b')))
+        self.assertEqual(self.queue.metrics()['rejected'], 1)
+
+    async def test_failed_batch_is_counted_and_queue_keeps_working(self):
+        calls = []
+
+        async def apply(edits):
+            calls.append(edits)
+            if len(calls) == 1:
+                raise RuntimeError('БД недоступна')
+
+        queue = SheetsEditQueue(apply)
+        await queue.start()
+        queue.submit(edit(1, 'a'))
+        await asyncio.sleep(0.2)
+        queue.submit(edit(2, 'b'))
+        await queue.stop(timeout=1)
+
+        self.assertEqual(calls, [[edit(1, 'a')], [edit(2, 'b')]])
+        self.assertEqual(queue.metrics()['failed_batches'], 1)
+        self.assertEqual(queue.metrics()['applied'], 1)
@@ -0,0 +1,87 @@
+import asyncio
+
+from app.services.google_sheets import SheetsWriteBatcher, StaleRowPositionError
+from tests.support import DatabaseTestCase
+
+SHEET = 'Тест'
+
+
+class SheetsWriteBatcherTest(DatabaseTestCase):
+    """Пакетная отправка записей, слияние удалений и сдвиг индекса строк"""
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.manager = self.db.sheets
+        self.writer = self.manager.writer
+        # Строка 1 - заголовок, записи 1..9 в строках 2..10
+        self.service.add_sheet(SHEET, [['ID']] + [[str(i)] for i in range(1, 10)])
+        await self.manager.load_metadata()
+        await self.manager.index_sheet_rows(SHEET, self.service.sheet_values(SHEET))
+        self.service.reset_stats()
+
+    async def row_index(self) -> dict:
+        async with self.db.execute(
+            "SELECT record_id, row_number FROM sheet_row_index WHERE sheet_name = ?", (SHEET,)
+        ) as cursor:
+            return {row[0]: row[1] for row in await cursor.fetchall()}
+
+    def calls(self, method: str) -> int:
+        return self.service.stats()['calls'].get(f'sheets.spreadsheets.{method}', 0)
+
+    async def test_merge_spans(self):
+        self.assertEqual(SheetsWriteBatcher._merge_spans({9, 4, 6, 5, 2}), [(2, 2), (4, 6), (9, 9)])
+        self.assertEqual(SheetsWriteBatcher._merge_spans([]), [])
+
+    async def test_concurrent_deletes_are_one_request_and_shift_index(self):
+        deleted = await asyncio.gather(*(
+            self.manager.delete_rows('batches', [record_id], SHEET) for record_id in ('3', '4', '5', '8')
+        ))
+
+        self.assertEqual(sum(deleted), 4)
+        # Проверка позиций - один batchGet, удаление строк 4-6 и 9 - один batchUpdate
+        self.assertEqual(self.calls('values.batchGet'), 1)
+        self.assertEqual(self.calls('batchUpdate'), 1)
+        self.assertEqual(self.service.sheet_values(SHEET), [['ID'], ['1'], ['2'], ['6'], ['7'], ['9']])
+        self.assertEqual(await self.row_index(), {'1': 2, '2': 3, '6': 4, '7': 5, '9': 6})
+        self.assertEqual(self.writer.layout_version(SHEET), 1)
+
+    async def test_append_in_same_batch_as_delete_gets_shifted_row(self):
+        version = self.writer.layout_version(SHEET)
+        row_number, _ = await asyncio.gather(
+            self.writer.append(SHEET, ['новая']),
+            self.writer.delete(SHEET, 4, version)
+        )
+
+        # Строка добавлена в 11-ю, после удаления 4-й она стала 10-й
+        self.assertEqual(row_number, 10)
+        self.assertEqual(self.service.sheet_values(SHEET)[row_number - 1], ['новая'])
+
+    async def test_stale_version_is_rejected(self):
+        version = self.writer.layout_version(SHEET)
+        await self.writer.delete(SHEET, 2, version)
+
+        with self.assertRaises(StaleRowPositionError):
+            await self.writer.update(SHEET, 2, ['x'], version)
+        with self.assertRaises(StaleRowPositionError):
+            await self.writer.delete(SHEET, 2, version)
+        self.assertEqual(self.service.sheet_values(SHEET)[1], ['2'])
+
+    async def test_concurrent_reads_are_one_batch_get(self):
+        first, second = await asyncio.gather(
+            self.writer.read([f"'{SHEET}'!A2", f"'{SHEET}'!A3"]),
+            self.writer.read([f"'{SHEET}'!A10"])
+        )
+
+        self.assertEqual(first, [[['1']], [['2']]])
+        self.assertEqual(second, [[['9']]])
+        self.assertEqual(self.calls('values.batchGet'), 1)
+
+    async def test_api_error_is_delivered_to_every_caller(self):
+        self.service.fail_next(1, status=400)
+        results = await asyncio.gather(
+            self.writer.update(SHEET, 2, ['a']),
+            self.writer.update(SHEET, 3, ['b']),
+            return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, Exception) for result in results))
+        self.assertEqual(self.calls('values.batchUpdate'), 1)